@@ -6,29 +6,70 @@ __version__ = "0.0.1"
 
 patches_loaded = False
 
+# apps whose monkey patches were imported by this process
+loaded_apps = set()
+
+MONKEY_PATCH_MANIFEST = "monkey_patches"
+
 
 def console(*data):
     frappe.publish_realtime("out_to_console", data, user=frappe.session.user)
 
 
-def load_monkey_patches():
+def discover_monkey_patches(app):
+    """Modules in `[app]/monkey_patches`, found by listing the folder"""
+    folder = frappe.get_app_path(app, "monkey_patches")
+    if not os.path.exists(folder):
+        return []
 
-    global patches_loaded
+    return [
+        f"{app}.monkey_patches.{module_name[:-3]}"
+        for module_name in sorted(os.listdir(folder))
+        if module_name.endswith(".py") and module_name != "__init__.py"
+    ]
+
+
+def write_monkey_patch_manifest():
+    """Store the monkey patch modules of every installed app for the site, called by migrate-x"""
+    from frappe_migrate_x.overrides.customization.migrate_state import save_state
+
+    save_state(
+        MONKEY_PATCH_MANIFEST,
+        {app: discover_monkey_patches(app) for app in frappe.get_installed_apps() if app not in ["frappe", "erpnext"]},
+    )
 
-    for app in frappe.get_installed_apps():
 
-        if app in ["frappe", "erpnext"]:
-            continue
+def get_monkey_patch_manifest():
+    # in developer mode new patch files are picked up without a migration
+    if frappe.conf.developer_mode:
+        return {}
+
+    from frappe_migrate_x.overrides.customization.migrate_state import load_state
+
+    return load_state(MONKEY_PATCH_MANIFEST)
+
+
+def load_monkey_patches():
+    """Import the monkey patches of the installed apps.
+
+    Every app is only handled once per process, so once the patches are
+    loaded a connection does no filesystem work. The folders are read from
+    the manifest written by the last migration when there is one.
+    """
+    global patches_loaded
 
-        folder = frappe.get_app_path(app, "monkey_patches")
-        if not os.path.exists(folder):
-            continue
+    pending_apps = [
+        app for app in frappe.get_installed_apps() if app not in loaded_apps and app not in ["frappe", "erpnext"]
+    ]
+    if pending_apps:
+        manifest = get_monkey_patch_manifest()
 
-        for module_name in os.listdir(folder):
-            if not module_name.endswith(".py") or module_name == "__init__.py":
-                continue
+        for app in pending_apps:
+            modules = manifest[app] if app in manifest else discover_monkey_patches(app)
+            for module in modules:
+                importlib.import_module(module)
 
-            importlib.import_module(f"{app}.monkey_patches.{module_name[:-3]}")
+            loaded_apps.add(app)
 
     patches_loaded = True
 
@@ -46,4 +87,4 @@ def custom_connect(*args, **kwargs):
     return out
 
 
-frappe.connect = custom_connect
\ No newline at end of file
+frappe.connect = custom_connect
@@ -0,0 +1,70 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Microbenchmark of `frappe.connect` with the monkey patch loader of
+	frappe_migrate_x: rescanning every app on each connection (the previous
+	behaviour) against the per process cache.
+"""
+import importlib
+import os
+import time
+
+import click
+import frappe
+
+import frappe_migrate_x
+
+
+def rescan_monkey_patches():
+	"""Previous loader, lists the monkey_patches folder of every app on every connect"""
+	for app in frappe.get_installed_apps():
+		if app in ["frappe", "erpnext"]:
+			continue
+
+		folder = frappe.get_app_path(app, "monkey_patches")
+		if not os.path.exists(folder):
+			continue
+
+		for module_name in os.listdir(folder):
+			if not module_name.endswith(".py") or module_name == "__init__.py":
+				continue
+
+			importlib.import_module(f"{app}.monkey_patches.{module_name[:-3]}")
+
+
+def time_connections(site, iterations):
+	timings = []
+	for _ in range(iterations):
+		frappe.init(site=site)
+		start = time.perf_counter()
+		frappe.connect()
+		timings.append(time.perf_counter() - start)
+		frappe.destroy()
+
+	timings.sort()
+	return dict(
+		mean_ms=round(sum(timings) / len(timings) * 1000, 3),
+		median_ms=round(timings[len(timings) // 2] * 1000, 3),
+		p95_ms=round(timings[int(len(timings) * 0.95) - 1] * 1000, 3),
+	)
+
+
+def run_connect_benchmark(site, iterations=200):
+	cached_loader = frappe_migrate_x.load_monkey_patches
+
+	frappe_migrate_x.load_monkey_patches = rescan_monkey_patches
+	try:
+		# warm up imports and redis caches once
+		time_connections(site, 1)
+		before = time_connections(site, iterations)
+	finally:
+		frappe_migrate_x.load_monkey_patches = cached_loader
+
+	time_connections(site, 1)
+	after = time_connections(site, iterations)
+
+	click.secho(f"frappe.connect over {iterations} connections", fg="cyan")
+	for metric in before:
+		click.echo(f"  {metric:<10}rescan {before[metric]:>9.3f}  cached {after[metric]:>9.3f}")
+
+	return dict(rescan=before, cached=after)
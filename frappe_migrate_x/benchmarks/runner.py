@@ -0,0 +1,185 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Benchmark of `SiteMigrationX.run` against a synthetic app.
+
+	The app is generated in a temporary folder, installed on the (test) site,
+	migrated once cold (every DocType file, patch and fixture is pending) and
+	once warm (nothing changed). Wall time, query count and peak Python memory
+	of both runs plus the time spent in sync_for, run_all and sync_fixtures
+	are stored in `sites/[site]/migrate_x/benchmarks.json` and compared with
+	the previous run of the same size.
+
+	Only use it on a local test site, the app is installed and removed again.
+"""
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import click
+import frappe
+from frappe.database.database import Database
+from frappe.utils import now
+
+from frappe_migrate_x import __version__
+from frappe_migrate_x.benchmarks.synthetic_app import generate_app
+from frappe_migrate_x.overrides.customization.custom_migrate import SiteMigrationX
+from frappe_migrate_x.overrides.customization.custom_sync import DOCTYPE_MANIFEST
+from frappe_migrate_x.overrides.customization.migrate_state import ContentManifest, load_state, save_state
+
+BENCHMARK_APP = "migrate_x_bench_app"
+BENCHMARK_STATE = "benchmarks"
+TRACKED_PHASES = ("sync_for", "run_all", "sync_fixtures")
+
+
+def run_benchmark(site, keep_app=False, **sizes):
+	path = tempfile.mkdtemp(prefix="migrate_x_bench_")
+	installed = False
+	try:
+		install_benchmark_app(site, path, **sizes)
+		installed = True
+		reset_benchmark_app(site)
+		runs = [measure(site, "cold"), measure(site, "warm")]
+	finally:
+		# a half installed app is always removed, apps.txt and sys.path restored
+		if not keep_app or not installed:
+			remove_benchmark_app(site, path)
+
+	results = dict(version=__version__, at=now(), sizes=sizes, runs=runs)
+
+	frappe.init(site=site)
+	try:
+		history = load_state(BENCHMARK_STATE, [])
+		previous = next((r for r in reversed(history) if r["sizes"] == sizes), None)
+		save_state(BENCHMARK_STATE, (history + [results])[-50:])
+	finally:
+		frappe.destroy()
+
+	print_results(results, previous)
+	return results
+
+
+def measure(site, label):
+	migration = SiteMigrationX(specific_apps=[BENCHMARK_APP])
+
+	tracemalloc.start()
+	start = time.perf_counter()
+	with count_queries() as counter:
+		migration.run(site=site)
+	seconds = time.perf_counter() - start
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	phases = {}
+	for phase in migration.report.phases:
+		if phase["name"] in TRACKED_PHASES and phase.get("app") == BENCHMARK_APP:
+			phases[phase["name"]] = round(phases.get(phase["name"], 0) + phase["seconds"], 4)
+
+	return dict(
+		run=label,
+		seconds=round(seconds, 4),
+		queries=counter.queries,
+		peak_memory_mb=round(peak / 1024 / 1024, 2),
+		phases=phases,
+	)
+
+
+@contextlib.contextmanager
+def count_queries():
+	counter = frappe._dict(queries=0)
+	sql = Database.sql
+
+	def counting_sql(self, *args, **kwargs):
+		counter.queries += 1
+		return sql(self, *args, **kwargs)
+
+	Database.sql = counting_sql
+	try:
+		yield counter
+	finally:
+		Database.sql = sql
+
+
+def install_benchmark_app(site, path, **sizes):
+	from frappe.installer import install_app
+
+	sys.path.insert(0, generate_app(path, BENCHMARK_APP, **sizes))
+
+	frappe.init(site=site)
+	with open(os.path.join(frappe.local.sites_path, "apps.txt"), "a") as f:
+		f.write(f"\n{BENCHMARK_APP}\n")
+	frappe.destroy()
+
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		frappe.clear_cache()
+		install_app(BENCHMARK_APP, set_as_patched=True)
+		frappe.db.commit()
+	finally:
+		frappe.destroy()
+
+
+def reset_benchmark_app(site):
+	"""Make every DocType file, patch and fixture of the app pending again"""
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		modules = frappe.get_all("Module Def", filters={"app_name": BENCHMARK_APP}, pluck="name")
+		frappe.db.delete("Patch Log", {"patch": ("like", f"{BENCHMARK_APP}.%")})
+		frappe.db.set_value("DocType", {"module": ("in", modules)}, "migration_hash", None)
+
+		manifest = ContentManifest(DOCTYPE_MANIFEST)
+		manifest.forget_app(BENCHMARK_APP)
+		manifest.save()
+
+		frappe.db.commit()
+	finally:
+		frappe.destroy()
+
+
+def remove_benchmark_app(site, path):
+	from frappe.installer import remove_app
+
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		if BENCHMARK_APP in frappe.get_installed_apps():
+			remove_app(BENCHMARK_APP, yes=True, no_backup=True, force=True)
+		frappe.db.delete("Role", {"name": ("like", "%Bench Role%")})
+		frappe.db.commit()
+	finally:
+		apps_txt = os.path.join(frappe.local.sites_path, "apps.txt")
+		with open(apps_txt) as f:
+			apps = [app.strip() for app in f.read().splitlines() if app.strip() and app.strip() != BENCHMARK_APP]
+		with open(apps_txt, "w") as f:
+			f.write("\n".join(apps) + "\n")
+		frappe.destroy()
+
+		shutil.rmtree(path, ignore_errors=True)
+		app_path = os.path.join(path, BENCHMARK_APP)
+		if app_path in sys.path:
+			sys.path.remove(app_path)
+
+
+def print_results(results, previous=None):
+	previous_runs = {run["run"]: run for run in (previous or {}).get("runs", [])}
+	click.secho(f"\nmigrate-x {results['version']} benchmark {results['sizes']}", fg="cyan")
+
+	for run in results["runs"]:
+		metrics = dict(seconds=run["seconds"], queries=run["queries"], peak_memory_mb=run["peak_memory_mb"])
+		metrics.update(run["phases"])
+		before = previous_runs.get(run["run"])
+
+		click.secho(f"{run['run']}", fg="yellow")
+		for metric, value in metrics.items():
+			line = f"  {metric:<16}{value:>12}"
+			if before:
+				old = before["phases"].get(metric) if metric in TRACKED_PHASES else before.get(metric)
+				if old:
+					line += f"  ({(value - old) / old:+.1%} vs {previous['version']})"
+			click.echo(line)
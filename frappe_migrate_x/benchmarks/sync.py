@@ -0,0 +1,55 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Benchmark of `sync_for` with and without the parse pool.
+
+	The synthetic app is installed, so every DocType file is in sync with the
+	database. `sync_for` then runs with `full_sync` (the manifest is ignored
+	and every file is parsed and compared) once serially and once with
+	`parse_jobs` worker processes.
+"""
+import tempfile
+import time
+
+import click
+import frappe
+
+from frappe_migrate_x.benchmarks.runner import BENCHMARK_APP, install_benchmark_app, remove_benchmark_app
+from frappe_migrate_x.overrides.customization.custom_sync import sync_for
+
+
+def time_sync(site, parse_jobs):
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		start = time.perf_counter()
+		sync_for(BENCHMARK_APP, full_sync=True, parse_jobs=parse_jobs)
+		seconds = time.perf_counter() - start
+		frappe.db.commit()
+	finally:
+		frappe.destroy()
+
+	return round(seconds, 4)
+
+
+def run_sync_benchmark(site, doctypes=2000, fields=20, parse_jobs=4, keep_app=False):
+	path = tempfile.mkdtemp(prefix="migrate_x_bench_")
+	installed = False
+	try:
+		install_benchmark_app(
+			site, path, doctypes=doctypes, fields=fields, patches=0, fixture_records=0, custom_fields=0
+		)
+		installed = True
+		# warm up the OS file cache and imports
+		time_sync(site, 0)
+		serial = time_sync(site, 0)
+		pooled = time_sync(site, parse_jobs)
+	finally:
+		if not keep_app or not installed:
+			remove_benchmark_app(site, path)
+
+	click.secho(f"\nsync_for of {doctypes} DocType files", fg="cyan")
+	click.echo(f"  serial          {serial:>10.3f}s")
+	click.echo(f"  {parse_jobs} parse jobs    {pooled:>10.3f}s  ({serial / pooled:.2f}x)")
+
+	return dict(doctypes=doctypes, serial=serial, parse_jobs=parse_jobs, pooled=pooled)
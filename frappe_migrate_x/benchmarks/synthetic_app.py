@@ -0,0 +1,138 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Generates a throwaway Frappe app with a configurable number of DocTypes,
+	fields, patches, fixture records and custom fields, used to benchmark the
+	migrate-x pipeline.
+"""
+import json
+import os
+
+from frappe.utils import scrub
+
+MODIFIED = "2024-01-01 00:00:00.000000"
+
+
+def generate_app(
+	path, app_name, doctypes=50, fields=20, patches=20, fixture_records=500, custom_fields=100
+):
+	"""Write the app to `path/app_name/app_name` and return the folder to put on sys.path"""
+	app_title = app_name.replace("_", " ").title()
+	module = f"{app_title} Bench"
+
+	root = os.path.join(path, app_name)
+	app_path = os.path.join(root, app_name)
+	module_path = os.path.join(app_path, scrub(module))
+
+	write(os.path.join(app_path, "__init__.py"), '__version__ = "0.0.1"\n')
+	write(
+		os.path.join(app_path, "hooks.py"),
+		f'app_name = "{app_name}"\napp_title = "{app_title}"\napp_publisher = "benchmark"\n'
+		f'app_description = "migrate-x benchmark app"\napp_email = "benchmark@example.com"\napp_license = "MIT"\n',
+	)
+	write(os.path.join(app_path, "modules.txt"), module + "\n")
+	write(os.path.join(module_path, "__init__.py"), "")
+	write(os.path.join(module_path, "doctype", "__init__.py"), "")
+
+	doctype_names = [f"{app_title} Bench DocType {i}" for i in range(doctypes)]
+	for name in doctype_names:
+		write_doctype(module_path, module, name, fields)
+
+	write_patches(app_path, app_name, doctype_names, patches)
+	write_fixtures(app_path, app_title, doctype_names, fixture_records, custom_fields)
+
+	return root
+
+
+def write_doctype(module_path, module, name, fields):
+	folder = os.path.join(module_path, "doctype", scrub(name))
+	write(os.path.join(folder, "__init__.py"), "")
+	write(
+		os.path.join(folder, f"{scrub(name)}.py"),
+		"from frappe.model.document import Document\n\n\n"
+		f"class {name.replace(' ', '')}(Document):\n\tpass\n",
+	)
+
+	doctype = {
+		"doctype": "DocType",
+		"name": name,
+		"module": module,
+		"autoname": "hash",
+		"engine": "InnoDB",
+		"creation": MODIFIED,
+		"modified": MODIFIED,
+		"modified_by": "Administrator",
+		"owner": "Administrator",
+		"field_order": [f"field_{i}" for i in range(fields)],
+		"fields": [
+			{
+				"doctype": "DocField",
+				"fieldname": f"field_{i}",
+				"fieldtype": ("Data", "Int", "Date", "Small Text")[i % 4],
+				"label": f"Field {i}",
+				"in_list_view": 1 if i < 3 else 0,
+				"search_index": 1 if i % 10 == 0 else 0,
+			}
+			for i in range(fields)
+		],
+		"permissions": [
+			{"doctype": "DocPerm", "role": "System Manager", "read": 1, "write": 1, "create": 1, "delete": 1}
+		],
+		"sort_field": "modified",
+		"sort_order": "DESC",
+		"states": [],
+	}
+	write(os.path.join(folder, f"{scrub(name)}.json"), json.dumps(doctype, indent=1))
+
+
+def write_patches(app_path, app_name, doctype_names, patches):
+	write(os.path.join(app_path, "patches", "__init__.py"), "")
+
+	lines = ["[pre_model_sync]"]
+	for i in range(patches):
+		if i == patches // 2:
+			lines.append("\n[post_model_sync]")
+
+		doctype = doctype_names[i % len(doctype_names)] if doctype_names else "ToDo"
+		write(
+			os.path.join(app_path, "patches", f"bench_patch_{i}.py"),
+			"import frappe\n\n\n"
+			"def execute():\n"
+			f'\tif frappe.db.table_exists("{doctype}"):\n'
+			f'\t\tfrappe.db.sql("update `tab{doctype}` set modified = modified")\n',
+		)
+		lines.append(f"{app_name}.patches.bench_patch_{i}")
+
+	write(os.path.join(app_path, "patches.txt"), "\n".join(lines) + "\n")
+
+
+def write_fixtures(app_path, app_title, doctype_names, fixture_records, custom_fields):
+	roles = [
+		{"doctype": "Role", "name": f"{app_title} Bench Role {i}", "role_name": f"{app_title} Bench Role {i}",
+		 "desk_access": 1, "modified": MODIFIED}
+		for i in range(fixture_records)
+	]
+	write(os.path.join(app_path, "fixtures", "role.json"), json.dumps(roles, indent=1))
+
+	fields = []
+	for i in range(custom_fields):
+		dt = doctype_names[i % len(doctype_names)] if doctype_names else "ToDo"
+		fields.append(
+			{
+				"doctype": "Custom Field",
+				"name": f"{dt}-bench_custom_{i}",
+				"dt": dt,
+				"fieldname": f"bench_custom_{i}",
+				"fieldtype": "Data",
+				"label": f"Bench Custom {i}",
+				"insert_after": "field_0",
+				"modified": MODIFIED,
+			}
+		)
+	write(os.path.join(app_path, "fixtures", "custom_field.json"), json.dumps(fields, indent=1))
+
+
+def write(path, content):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, "w") as f:
+		f.write(content)
@@ -1,8 +1,12 @@
 from __future__ import unicode_literals, absolute_import, print_function
+import json
+import os
 import click
 import frappe
 from frappe.commands import pass_context, get_site
 from frappe_migrate_x.overrides.customization.custom_migrate import SiteMigrationX
+from frappe_migrate_x.commands.site_pool import migrate_sites
+from frappe_migrate_x.overrides.customization.migration_plan import print_plan
 from frappe.exceptions import SiteNotSpecifiedError
 
 def get_available_apps(site):
@@ -66,23 +70,87 @@ def interactive_app_selection(site):
 @click.command('migrate-x')
 @click.option("--skip-failing", is_flag=True, help="Skip patches that fail to run")
 @click.option("--skip-search-index", is_flag=True, help="Skip search indexing for web documents")
+@click.option("--incremental-search-index", is_flag=True,
+              help="Only index the web routes changed by the migration, in a background job")
 @click.option("--app", help="Migrate for specific application (use --app myapp or --multi-app for multiple apps)")
 @click.option("--multi-app", is_flag=True, help="Interactive multiple app selection mode")
+@click.option("--changed", is_flag=True, help="Migrate the apps whose code changed since the last migration")
 @click.option("--skip-fixtures", is_flag=True, help="Skip sync fixtures during migration")
+@click.option("--incremental-fixtures", is_flag=True,
+              help="Only import fixture records whose file and content changed since the last sync")
+@click.option("--bulk-fixtures", is_flag=True,
+              help="Upsert Custom Field, Property Setter, Translation and Role fixtures with multi row queries")
+@click.option("--full-sync", is_flag=True, help="Import every DocType file, ignoring the manifest of unchanged files")
+@click.option("--full-clear-cache", is_flag=True,
+              help="Clear the whole site cache after each app sync instead of only the synced doctypes")
+@click.option("--prewarm-cache", is_flag=True,
+              help="Rebuild the cached meta of the synced doctypes before the site leaves maintenance mode")
+@click.option("--prewarm-workers", type=int, default=4, help="Worker threads used by --prewarm-cache")
+@click.option("--app-jobs", type=int, default=1,
+              help="Run patches and DocType sync of up to N independent, parallel safe apps concurrently")
+@click.option("--parse-jobs", type=int, default=0,
+              help="Parse and compare DocType files in N worker processes while importing")
+@click.option("--batch-alter", is_flag=True,
+              help="Combine the table changes of consecutive DocType imports into one ALTER TABLE per table")
+@click.option("--online-alter-rows", type=int, default=0,
+              help="Alter tables with at least N rows online through a shadow table copy instead of ALTER TABLE")
+@click.option("--online-alter-sleep", type=float, default=0,
+              help="Seconds to sleep between the copied chunks of an online ALTER")
+@click.option("--online-alter-max-replica-lag", type=float,
+              help="Wait between the copied chunks of an online ALTER until the replica is at most N seconds behind")
+@click.option("--phase", type=click.Choice(["offline", "online"]),
+              help="Only run the offline window of the migration, or the online safe rest of it with the site up")
+@click.option("--profile-sql", is_flag=True,
+              help="Profile the queries of every patch and DocType import, with N+1 patterns, in the migration report")
+@click.option("--resume", is_flag=True, help="Continue the last migration of the site from its checkpoint")
+@click.option("--commit-every", type=int, default=1, help="Commit DocType imports in batches of N files")
+@click.option("--commit-interval", type=float, help="Commit DocType imports at least every N seconds")
+@click.option("--jobs", type=int, default=1, help="Migrate up to N sites in parallel worker processes")
+@click.option("--fail-fast", is_flag=True, help="With --jobs, stop starting new sites after the first failure")
+@click.option("--plan", is_flag=True, help="Show the pending work of the migration without running it")
+@click.option("--plan-format", type=click.Choice(["table", "json"]), default="table", help="Output format of --plan")
 @pass_context
-def migrate_x(context, skip_failing=False, skip_search_index=False, app=None, multi_app=False, skip_fixtures=False):
+def migrate_x(context, skip_failing=False, skip_search_index=False, app=None, multi_app=False, skip_fixtures=False,
+              full_sync=False, commit_every=1, commit_interval=None, jobs=1, fail_fast=False, plan=False,
+              plan_format="table", incremental_fixtures=False, bulk_fixtures=False,
+              full_clear_cache=False, prewarm_cache=False, prewarm_workers=4, resume=False,
+              app_jobs=1, parse_jobs=0, changed=False, batch_alter=False, online_alter_rows=0,
+              online_alter_sleep=0, online_alter_max_replica_lag=None, phase=None, incremental_search_index=False, profile_sql=False):
     """Migrate apps with enhanced options.
     
     This single command handles all migration scenarios:
     - Single app: --app myapp
     - Multiple apps: --multi-app  
+    - Apps changed since the last migration: --changed
     - Skip fixtures: --skip-fixtures (works with both modes)
+    - Only import changed fixture records: --incremental-fixtures
+    - Bulk upsert simple fixture records: --bulk-fixtures
     - Skip failing patches: --skip-failing
     - Skip search indexing: --skip-search-index
+    - Only index the changed web routes: --incremental-search-index
+    - Re-import unchanged DocType files: --full-sync
+    - Clear the whole cache after each app sync: --full-clear-cache
+    - Warm the cache of the synced doctypes: --prewarm-cache (--prewarm-workers 8)
+    - Continue a migration that died: --resume
+    - Profile the queries of patches and DocType imports: --profile-sql
+    - Short maintenance window: --phase offline, then --phase online with the site up
+    - Sync independent apps concurrently: --app-jobs 4
+    - Parse DocType files in worker processes: --parse-jobs 4
+    - One ALTER TABLE per table: --batch-alter
+    - Alter large tables without blocking writes: --online-alter-rows 1000000
+      (throttled with --online-alter-sleep 0.5 and/or --online-alter-max-replica-lag 10)
+    - Batch DocType import commits: --commit-every 50 and/or --commit-interval 5
+    - Migrate several sites in parallel: --jobs 4 (add --fail-fast to stop on the first failure)
+    - Dry run: --plan (--plan-format json for machine readable output)
     
     Examples:
     bench --site mysite migrate-x --app erpnext --skip-fixtures
     bench --site mysite migrate-x --multi-app --skip-fixtures --skip-failing
+    bench --site all migrate-x --app myapp --jobs 4
+    bench --site mysite migrate-x --app myapp --plan
+    bench --site all migrate-x --changed --jobs 4
+    bench --site mysite migrate-x --app myapp --phase offline
+    bench --site mysite migrate-x --phase online
     """
 
     if not context.sites:
@@ -104,15 +172,59 @@ def migrate_x(context, skip_failing=False, skip_search_index=False, app=None, mu
             
     elif app:
         selected_apps = [app]
-    else:
-        click.secho("Please provide specific app to migrate using --app or use --multi-app mode", fg="red")
+    elif not changed and phase != "online":
+        click.secho("Please provide specific app to migrate using --app, --changed or use --multi-app mode", fg="red")
         return
     
+    migration_options = dict(
+        skip_failing=skip_failing,
+        skip_search_index=skip_search_index,
+        incremental_search_index=incremental_search_index,
+        skip_fixtures=skip_fixtures,
+        incremental_fixtures=incremental_fixtures,
+        bulk_fixtures=bulk_fixtures,
+        full_sync=full_sync,
+        full_clear_cache=full_clear_cache,
+        prewarm_cache=prewarm_cache,
+        prewarm_workers=prewarm_workers,
+        resume=resume,
+        app_jobs=app_jobs,
+        parse_jobs=parse_jobs,
+        changed=changed,
+        batch_alter=batch_alter,
+        online_alter_rows=online_alter_rows,
+        online_alter_sleep=online_alter_sleep,
+        online_alter_max_replica_lag=online_alter_max_replica_lag,
+        phase=phase,
+        profile_sql=profile_sql,
+        commit_every=commit_every,
+        commit_interval=commit_interval
+    )
+
+    if plan:
+        plans = [SiteMigrationX(specific_apps=selected_apps, **migration_options).plan(site=site)
+                 for site in context.sites]
+        if plan_format == "json":
+            click.echo(json.dumps(plans, indent=1, default=str))
+        else:
+            for site_plan in plans:
+                print_plan(site_plan)
+        return
+
     confirm = click.confirm("Are you sure you want to continue?")
     if not confirm:
         return
     
-    click.secho(f"Initializing migration for apps: {', '.join(selected_apps)}", fg="yellow")
+    click.secho(f"Initializing migration for apps: {', '.join(selected_apps)}"
+                + (" and the apps changed since the last migration" if changed else ""), fg="yellow")
+
+    if jobs > 1 and len(context.sites) > 1:
+        click.secho(f"Migrating {len(context.sites)} sites with {jobs} jobs, logs in [site]/logs/migrate_x.log",
+                    fg="yellow")
+        results = migrate_sites(context.sites, selected_apps, migration_options, jobs=jobs, fail_fast=fail_fast)
+        if not all(result.passed for result in results):
+            raise SystemExit(1)
+        return
     
     for site in context.sites:
         click.secho(f"Current site: {site}", fg="yellow")
@@ -126,16 +238,104 @@ def migrate_x(context, skip_failing=False, skip_search_index=False, app=None, mu
                 return
         
         try:
-            SiteMigrationX(
-                skip_failing=skip_failing,
-                skip_search_index=skip_search_index,
-                specific_apps=selected_apps,
-                skip_fixtures=skip_fixtures
-            ).run(site=site)
+            SiteMigrationX(specific_apps=selected_apps, **migration_options).run(site=site)
         finally:
             print()
 	
 
+@click.command('migrate-x-benchmark')
+@click.option("--doctypes", type=int, default=50, help="Number of DocTypes of the synthetic app")
+@click.option("--fields", type=int, default=20, help="Number of fields per DocType")
+@click.option("--patches", type=int, default=20, help="Number of patches, half pre and half post model sync")
+@click.option("--fixture-records", type=int, default=500, help="Number of Role fixture records")
+@click.option("--custom-fields", type=int, default=100, help="Number of Custom Field fixture records")
+@click.option("--keep-app", is_flag=True, help="Do not remove the synthetic app after the benchmark")
+@pass_context
+def migrate_x_benchmark(context, doctypes=50, fields=20, patches=20, fixture_records=500, custom_fields=100,
+                        keep_app=False):
+    """Benchmark migrate-x with a generated app on a local test site.
+
+    The synthetic app is installed on the site, migrated cold and warm, and
+    removed again. Results are compared with the previous run of the same size.
+
+    Example:
+    bench --site test_site migrate-x-benchmark --doctypes 600 --patches 100
+    """
+    from frappe_migrate_x.benchmarks.runner import run_benchmark
+
+    site = get_site(context)
+    run_benchmark(
+        site,
+        keep_app=keep_app,
+        doctypes=doctypes,
+        fields=fields,
+        patches=patches,
+        fixture_records=fixture_records,
+        custom_fields=custom_fields
+    )
+
+
+@click.command('migrate-x-benchmark-connect')
+@click.option("--iterations", type=int, default=200, help="Number of connections per measurement")
+@pass_context
+def migrate_x_benchmark_connect(context, iterations=200):
+    """Compare frappe.connect latency with and without the monkey patch cache.
+
+    Example:
+    bench --site test_site migrate-x-benchmark-connect --iterations 500
+    """
+    from frappe_migrate_x.benchmarks.connect import run_connect_benchmark
+
+    run_connect_benchmark(get_site(context), iterations=iterations)
+
+
+@click.command('migrate-x-benchmark-sync')
+@click.option("--doctypes", type=int, default=2000, help="Number of DocTypes of the synthetic app")
+@click.option("--fields", type=int, default=20, help="Number of fields per DocType")
+@click.option("--parse-jobs", type=int, default=4, help="Worker processes of the pipelined run")
+@click.option("--keep-app", is_flag=True, help="Do not remove the synthetic app after the benchmark")
+@pass_context
+def migrate_x_benchmark_sync(context, doctypes=2000, fields=20, parse_jobs=4, keep_app=False):
+    """Compare sync_for of a generated app serially and with --parse-jobs.
+
+    Example:
+    bench --site test_site migrate-x-benchmark-sync --doctypes 3000 --parse-jobs 8
+    """
+    from frappe_migrate_x.benchmarks.sync import run_sync_benchmark
+
+    run_sync_benchmark(get_site(context), doctypes=doctypes, fields=fields, parse_jobs=parse_jobs, keep_app=keep_app)
+
+
+@click.command('migrate-x-patch-history')
+@click.option("--format", "output_format", type=click.Choice(["csv", "json"]), default="csv", help="Export format")
+@click.option("--output", help="Write the export to this file instead of stdout")
+@pass_context
+def migrate_x_patch_history(context, output_format="csv", output=None):
+    """Export the recorded patch runs (duration, rows written, largest table) of every site of the bench.
+
+    Example:
+    bench migrate-x-patch-history --output patches.csv
+    """
+    from frappe_migrate_x.overrides.customization.custom_patch_handler import PATCH_HISTORY
+    from frappe_migrate_x.overrides.customization.migrate_state import load_bench_state
+    from frappe_migrate_x.overrides.customization.patch_stats import export_patch_history
+
+    # bench runs its commands from the sites folder, no site has to be initialized
+    history = load_bench_state(PATCH_HISTORY, sites_path=os.path.abspath("."))
+    export = export_patch_history(history, output_format=output_format)
+
+    if output:
+        with open(output, "w") as f:
+            f.write(export)
+        click.secho(f"Patch history written to {output}", fg="green")
+    else:
+        click.echo(export)
+
+
 commands = [
-    migrate_x
+    migrate_x,
+    migrate_x_patch_history,
+    migrate_x_benchmark,
+    migrate_x_benchmark_connect,
+    migrate_x_benchmark_sync
 ]
\ No newline at end of file
@@ -0,0 +1,158 @@
+import collections
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import click
+import frappe
+from frappe_migrate_x.overrides.customization.custom_migrate import SiteMigrationX
+
+
+def get_log_path(site):
+    """Per site log file used when sites are migrated in parallel"""
+    return os.path.abspath(os.path.join(site, "logs", "migrate_x.log"))
+
+
+def migrate_site(site, selected_apps, migration_options):
+    """Migrate one site inside a worker process, all output goes to the site's own log"""
+    log_path = get_log_path(site)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    stdout, stderr = os.dup(1), os.dup(2)
+
+    start = time.monotonic()
+    error = None
+
+    with open(log_path, "a") as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            print(f"\n===== migrate-x {site} {time.strftime('%Y-%m-%d %H:%M:%S')} =====")
+            frappe.init(site=site)
+            frappe.connect()
+            installed_apps = frappe.get_installed_apps()
+            missing_apps = [app for app in selected_apps if app not in installed_apps]
+            frappe.destroy()
+
+            if missing_apps:
+                raise Exception(f"{', '.join(missing_apps)} not installed on site {site}")
+
+            SiteMigrationX(specific_apps=selected_apps, **migration_options).run(site=site)
+        except (Exception, SystemExit) as e:
+            traceback.print_exc()
+            error = str(e) or e.__class__.__name__
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(stdout, 1)
+            os.dup2(stderr, 2)
+            os.close(stdout)
+            os.close(stderr)
+
+    return frappe._dict(
+        site=site,
+        passed=error is None,
+        duration=time.monotonic() - start,
+        error=error,
+        log=log_path,
+    )
+
+
+def migrate_sites(sites, selected_apps, migration_options, jobs, fail_fast=False):
+    """Migrate `sites` in up to `jobs` worker processes.
+
+    Every site has its own database and redis namespace so they do not share
+    any state. A failing site does not stop the others unless `fail_fast` is
+    set, in which case sites that did not start yet are cancelled.
+    """
+    # workers are forked, do not let them inherit an open connection
+    frappe.destroy()
+
+    results = []
+    queued = collections.deque(sites)
+    stopped = False
+
+    def add_result(result):
+        nonlocal stopped
+        results.append(result)
+        status = "passed" if result.passed else f"failed: {result.error}"
+        click.secho(f"{result.site}: {status} ({format_duration(result.duration)})",
+                    fg="green" if result.passed else "red")
+
+        if not result.passed and fail_fast:
+            stopped = True
+
+    while queued and not stopped:
+        # a pool whose worker died (OOM, killed ...) is broken, the rest runs in a new one
+        broken = False
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("fork")) as executor:
+            futures = {}
+
+            def submit_next():
+                nonlocal broken
+                site = queued.popleft()
+                try:
+                    futures[executor.submit(migrate_site, site, selected_apps, migration_options)] = site
+                except BrokenProcessPool:
+                    queued.appendleft(site)
+                    broken = True
+
+            # the pool queues submitted work ahead of its workers, where it cannot be
+            # cancelled anymore, so a site is only submitted once a worker is free
+            while queued and len(futures) < jobs and not broken:
+                submit_next()
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    site = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        # every site running in the pool when a worker died fails with it
+                        broken = True
+                        result = failed_result(site, "worker process died")
+                    except Exception as e:
+                        result = failed_result(site, str(e))
+
+                    add_result(result)
+
+                while queued and len(futures) < jobs and not (broken or stopped):
+                    submit_next()
+
+    for site in sites:
+        if site not in {result.site for result in results}:
+            results.append(frappe._dict(site=site, passed=None, duration=0, error="cancelled", log=""))
+
+    print_summary(results, order=sites)
+    return results
+
+
+def failed_result(site, error):
+    return frappe._dict(site=site, passed=False, duration=0, error=error, log=get_log_path(site))
+
+
+def print_summary(results, order):
+    width = max(len(site) for site in order) + 2
+    click.secho(f"\n{'Site':<{width}}{'Status':<11}{'Duration':<12}Log", fg="cyan")
+
+    for result in sorted(results, key=lambda r: order.index(r.site)):
+        if result.passed:
+            status, color = "passed", "green"
+        elif result.passed is None:
+            status, color = "cancelled", "yellow"
+        else:
+            status, color = "failed", "red"
+
+        click.secho(f"{result.site:<{width}}{status:<11}{format_duration(result.duration):<12}{result.log}", fg=color)
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
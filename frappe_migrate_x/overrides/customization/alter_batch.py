@@ -0,0 +1,184 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	One ALTER TABLE per table for the DocTypes imported by `sync_for`.
+
+	Frappe alters a table with up to four statements per DocType import (added
+	columns, modified columns, added and dropped indexes), and `on_doctype_update`
+	hooks can add more. On a large InnoDB table each of them may rebuild it.
+
+	While an `AlterBatch` collects, ALTER TABLE statements sent through
+	`frappe.db.sql_ddl` are kept per table instead of executed, CREATE TABLE
+	and everything else runs immediately. `flush` then runs a single ALTER per
+	table, asking for ALGORITHM=INSTANT, then INPLACE, then letting MariaDB
+	pick (COPY) when the cheaper one is not possible for that change.
+
+	`on_doctype_update` hooks run while the DocType is imported and add their
+	indexes through `frappe.db.add_index` / `add_unique`, which do not go
+	through `sql_ddl`. The pending changes of that table are run first, the
+	index may be on a column they add.
+
+	With `online_rows`, tables keyed on `name` holding at least that many rows
+	are altered through a shadow table copy instead, see `online_alter`. The
+	copy sleeps `online_sleep` seconds between chunks and waits for the replica
+	to be at most `online_max_replica_lag` seconds behind.
+"""
+import re
+
+import click
+import frappe
+
+from frappe_migrate_x.overrides.customization.online_alter import OnlineSchemaChange, has_name_key
+from frappe_migrate_x.overrides.customization.patch_stats import get_table_rows
+
+ALTER_PATTERN = re.compile(r"^\s*alter\s+table\s+`([^`]+)`\s+(.*)$", re.IGNORECASE | re.DOTALL)
+ALGORITHMS = ("INSTANT", "INPLACE", "COPY")
+# ER_ALTER_OPERATION_NOT_SUPPORTED, ER_ALTER_OPERATION_NOT_SUPPORTED_REASON
+ALGORITHM_NOT_SUPPORTED = (1845, 1846)
+
+
+def get_expected_algorithm(bodies):
+	"""Cheapest algorithm MariaDB can use for all changes of `bodies`, a guess
+	from the kind of change: added columns are instant, new indexes are built
+	in place, a modified column type usually copies the table"""
+	expected = "INSTANT"
+	for body in bodies:
+		for part in re.split(r",\s*(?=(?:add|modify|drop|change)\s)", body, flags=re.IGNORECASE):
+			part = part.strip().lower()
+			if part.startswith(("modify", "change")):
+				algorithm = "COPY"
+			elif part.startswith(("add index", "add unique", "add key", "add fulltext")):
+				algorithm = "INPLACE"
+			else:
+				algorithm = "INSTANT"
+
+			if ALGORITHMS.index(algorithm) > ALGORITHMS.index(expected):
+				expected = algorithm
+
+	return expected
+
+
+class AlterBatch:
+	def __init__(
+		self,
+		execute: bool = True,
+		online_rows: int = 0,
+		online_sleep: float = 0,
+		online_max_replica_lag: float = None,
+	) -> None:
+		# without `execute` statements are only collected, used by the planner
+		self.execute = execute
+		self.online_rows = online_rows
+		self.online_sleep = online_sleep
+		self.online_max_replica_lag = online_max_replica_lag
+		self.pending = {}
+		self.source = None
+		self.sources = {}
+		self.on_flush = []
+		self.sql_ddl = None
+		self.add_index = None
+		self.add_unique = None
+
+	def __enter__(self):
+		self.sql_ddl = frappe.db.sql_ddl
+		frappe.db.sql_ddl = self.collect
+		if self.execute:
+			self.add_index, self.add_unique = frappe.db.add_index, frappe.db.add_unique
+			frappe.db.add_index = self.before_index(self.add_index)
+			frappe.db.add_unique = self.before_index(self.add_unique)
+		return self
+
+	def __exit__(self, *args):
+		frappe.db.sql_ddl = self.sql_ddl
+		if self.execute:
+			frappe.db.add_index, frappe.db.add_unique = self.add_index, self.add_unique
+
+	def before_index(self, add):
+		def add_after_pending(doctype, *args, **kwargs):
+			self.flush_table(f"tab{doctype}")
+			return add(doctype, *args, **kwargs)
+
+		return add_after_pending
+
+	def flush_table(self, table):
+		"""Run the pending changes of `table` only, its sources are still
+		confirmed by the next `flush`"""
+		bodies = self.pending.pop(table, None)
+		if not bodies:
+			return
+
+		try:
+			self.alter(table, bodies)
+		except Exception:
+			# the next flush fails on it again and resets its sources
+			self.pending[table] = bodies
+			raise
+		frappe.cache.delete_value("table_columns")
+
+	def collect(self, query, *args, **kwargs):
+		match = ALTER_PATTERN.match(query)
+		if not match:
+			if self.execute:
+				return self.sql_ddl(query, *args, **kwargs)
+			return
+
+		table, body = match.groups()
+		self.pending.setdefault(table, []).append(body.strip().rstrip(";"))
+		if self.source:
+			self.sources.setdefault(table, set()).add(self.source)
+
+	def flush(self, on_failure=None):
+		"""Run the collected changes, one statement per table, then the `on_flush`
+		callbacks. `on_failure(sources)` is called with the sources (see
+		`source`) of a table that could not be altered"""
+		pending, self.pending = self.pending, {}
+		sources, self.sources = self.sources, {}
+		callbacks, self.on_flush = self.on_flush, []
+
+		tables = list(pending)
+		for i, table in enumerate(tables):
+			try:
+				self.alter(table, pending[table])
+			except Exception:
+				if on_failure:
+					# the failing table and the ones after it were not altered
+					on_failure(set().union(*(sources.get(other) or set() for other in tables[i:])))
+				raise
+
+		if pending:
+			frappe.cache.delete_value("table_columns")
+
+		for callback in callbacks:
+			callback()
+
+	def alter(self, table, bodies):
+		body = ", ".join(bodies)
+		if self.is_online(table):
+			OnlineSchemaChange(
+				table,
+				body,
+				sleep=self.online_sleep,
+				max_replica_lag=self.online_max_replica_lag,
+				sql_ddl=self.sql_ddl,
+			).run()
+			return
+
+		for algorithm in ALGORITHMS[:-1]:
+			try:
+				self.sql_ddl(f"ALTER TABLE `{table}` {body}, ALGORITHM={algorithm}")
+				break
+			except Exception as e:
+				if not e.args or e.args[0] not in ALGORITHM_NOT_SUPPORTED:
+					raise
+		else:
+			algorithm = "COPY"
+			self.sql_ddl(f"ALTER TABLE `{table}` {body}")
+
+		click.secho(f"altered {table} with {len(bodies)} changes ({algorithm})", fg="blue")
+
+	def is_online(self, table):
+		if not self.online_rows or frappe.db.db_type != "mariadb":
+			return False
+
+		rows = get_table_rows([table]).get(table) or 0
+		return rows >= self.online_rows and has_name_key(table)
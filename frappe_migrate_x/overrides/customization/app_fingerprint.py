@@ -0,0 +1,96 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Detect the apps whose migration inputs changed since the last migration.
+
+	The fingerprint of an app combines the git commit checked out in its
+	repository with the size and mtime of everything a migration reads from
+	it: patches.txt, hooks.py, the fixtures and the DocType JSON files. It is
+	stored for every migrated app after a successful migration, `--changed`
+	then only migrates the apps whose fingerprint differs.
+"""
+import hashlib
+import json
+import os
+
+import frappe
+
+from frappe_migrate_x.overrides.customization.custom_sync import get_app_doc_files
+from frappe_migrate_x.overrides.customization.file_index import DocFileIndex
+from frappe_migrate_x.overrides.customization.migrate_state import load_state, save_state
+
+APP_FINGERPRINTS = "app_fingerprints"
+
+
+def get_git_commit(app):
+	"""Commit checked out in the repository of `app`, read without running git"""
+	git_path = os.path.join(frappe.get_app_path(app), "..", ".git")
+	head_path = os.path.join(git_path, "HEAD")
+	if not os.path.exists(head_path):
+		return None
+
+	with open(head_path) as f:
+		head = f.read().strip()
+	if not head.startswith("ref: "):
+		return head
+
+	ref = head[5:]
+	ref_path = os.path.join(git_path, ref)
+	if os.path.exists(ref_path):
+		with open(ref_path) as f:
+			return f.read().strip()
+
+	packed_refs = os.path.join(git_path, "packed-refs")
+	if os.path.exists(packed_refs):
+		with open(packed_refs) as f:
+			for line in f:
+				commit, _, name = line.strip().partition(" ")
+				if name == ref:
+					return commit
+
+	return head
+
+
+def get_input_files(app, index):
+	app_path = frappe.get_app_path(app)
+	files = [os.path.join(app_path, "patches.txt"), os.path.join(app_path, "hooks.py")]
+
+	fixtures_path = os.path.join(app_path, "fixtures")
+	for root, _, names in os.walk(fixtures_path):
+		files.extend(os.path.join(root, name) for name in names)
+
+	return files + get_app_doc_files(app, index=index)
+
+
+def get_app_fingerprint(app, index=None):
+	app_path = frappe.get_app_path(app)
+	stats = []
+	for path in get_input_files(app, index if index is not None else DocFileIndex()):
+		try:
+			stat = os.stat(path)
+		except FileNotFoundError:
+			continue
+		stats.append((os.path.relpath(path, app_path), stat.st_size, stat.st_mtime_ns))
+
+	data = json.dumps(dict(commit=get_git_commit(app), files=sorted(stats)))
+	return hashlib.md5(data.encode()).hexdigest()
+
+
+def get_app_fingerprints(apps):
+	index = DocFileIndex()
+	fingerprints = {app: get_app_fingerprint(app, index) for app in apps}
+	index.save()
+	return fingerprints
+
+
+def get_changed_apps(fingerprints):
+	"""Apps whose fingerprint differs from the one of their last migration"""
+	stored = load_state(APP_FINGERPRINTS)
+	return [app for app, fingerprint in fingerprints.items() if stored.get(app) != fingerprint]
+
+
+def record_app_fingerprints(fingerprints):
+	"""Call once the apps were migrated successfully, with their fingerprints from before the migration"""
+	stored = load_state(APP_FINGERPRINTS)
+	stored.update(fingerprints)
+	save_state(APP_FINGERPRINTS, stored)
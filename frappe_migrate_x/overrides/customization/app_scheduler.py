@@ -0,0 +1,127 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Concurrent schema updates of independent apps.
+
+	An app depends on the apps it lists in its `required_apps` hook and on the
+	apps owning a doctype that one of its doctypes links to, embeds as a child
+	table or adds a custom field to. Dependencies only point to apps installed
+	before it, so the graph can never have a cycle.
+
+	Apps without dependencies between them run their patches and DocType sync
+	concurrently, each in a worker thread with its own database connection.
+	An app is only run concurrently when it declares
+
+		migrate_x_parallel_safe = True
+
+	in its hooks, any other app (and always frappe and erpnext) waits for every
+	app before it and every app after it waits for it.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import click
+import frappe
+from frappe.model import table_fields
+from frappe.modules import scrub
+from frappe.utils import cint
+
+from frappe_migrate_x.overrides.customization.cache_prewarm import site_connection
+from frappe_migrate_x.overrides.customization.sync_cache import get_touched
+
+ALWAYS_SERIAL_APPS = ("frappe", "erpnext")
+# flags set by the migration that the worker connections need as well
+SHARED_FLAGS = ("in_migrate", "touched_tables", "migrate_x_report", "migrate_x_touched")
+
+
+def is_parallel_safe(app):
+	return app not in ALWAYS_SERIAL_APPS and any(
+		cint(value) for value in frappe.get_hooks("migrate_x_parallel_safe", app_name=app)
+	)
+
+
+def get_app_dependencies(apps):
+	"""Return `{app: {apps it has to wait for}}` for `apps` in installation order"""
+	order = {app: i for i, app in enumerate(apps)}
+	dependencies = {app: set() for app in apps}
+
+	def add(app, required):
+		if app in order and required in order and order[required] < order[app]:
+			dependencies[app].add(required)
+
+	for app in apps:
+		for required in frappe.get_hooks("required_apps", app_name=app):
+			# entries may be given as `org/app`
+			add(app, required.split("/")[-1])
+
+	owner = {
+		doctype.name: frappe.local.module_app.get(scrub(doctype.module))
+		for doctype in frappe.get_all("DocType", fields=["name", "module"])
+	}
+	link_types = ["Link", *table_fields]
+	for field in frappe.get_all(
+		"DocField", filters={"fieldtype": ("in", link_types)}, fields=["parent", "options"], distinct=True
+	):
+		add(owner.get(field.parent), owner.get(field.options))
+
+	for field in frappe.get_all("Custom Field", fields=["dt", "module"], distinct=True):
+		if field.module:
+			add(frappe.local.module_app.get(scrub(field.module)), owner.get(field.dt))
+
+	for i, app in enumerate(apps):
+		if not is_parallel_safe(app):
+			dependencies[app].update(apps[:i])
+			for later in apps[i + 1 :]:
+				dependencies[later].add(app)
+
+	return dependencies
+
+
+def run_app_graph(apps, dependencies, jobs, migrate_app):
+	"""Call `migrate_app(app)` for every app in worker threads, an app starts
+	once all its dependencies finished. Stops starting apps after a failure."""
+	site, sites_path = frappe.local.site, frappe.local.sites_path
+	# created here so every worker tracks its synced doctypes in the same scope
+	get_touched()
+	flags = {flag: frappe.flags.get(flag) for flag in SHARED_FLAGS}
+
+	def run(app):
+		with site_connection(site, sites_path):
+			frappe.flags.update(flags)
+			report = flags.get("migrate_x_report")
+			if report and report.sql_profiler:
+				report.sql_profiler.install(frappe.db)
+			try:
+				migrate_app(app)
+				frappe.db.commit()
+			except Exception:
+				frappe.db.rollback()
+				raise
+
+	done = set()
+	pending = list(apps)
+	running = {}
+	error = None
+
+	with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="migrate_x_app") as executor:
+		while pending or running:
+			if not error:
+				for app in list(pending):
+					if len(running) < jobs and dependencies[app] <= done:
+						pending.remove(app)
+						click.secho(f"start schema updates of {app}", fg="blue")
+						running[executor.submit(run, app)] = app
+
+			if not running:
+				break
+
+			finished, _ = wait(running, return_when=FIRST_COMPLETED)
+			for future in finished:
+				app = running.pop(future)
+				if future.exception():
+					click.secho(f"schema updates of {app} failed", fg="red")
+					error = error or future.exception()
+				else:
+					done.add(app)
+
+	if error:
+		raise error
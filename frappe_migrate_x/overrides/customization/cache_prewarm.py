@@ -0,0 +1,103 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Rebuild the cache of a migrated site before it leaves maintenance mode.
+
+	The doctypes synced by the migration (see `sync_cache`), their child tables
+	and the doctypes embedding them get their meta and form meta rebuilt and
+	stored in redis by worker threads, each with its own site connection, so the
+	first users after the migration do not pay for it one request at a time.
+	Site wide boot data (hooks, global search doctypes) is warmed as well.
+"""
+import contextlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import frappe
+
+from frappe_migrate_x.overrides.customization.sync_cache import get_parent_doctypes, get_touched
+
+PREWARM_WORKERS = 4
+
+
+def get_doctypes_to_warm():
+	touched = get_touched().doctypes
+	doctypes = touched | get_parent_doctypes(touched)
+	# a synced doctype may have been deleted since
+	return sorted(frappe.get_all("DocType", filters={"name": ("in", list(doctypes))}, pluck="name")) if doctypes else []
+
+
+def prewarm_cache(workers=PREWARM_WORKERS):
+	"""Warm the cache of the current site, returns the number of warmed doctypes"""
+	start = time.perf_counter()
+	site, sites_path = frappe.local.site, frappe.local.sites_path
+	doctypes = get_doctypes_to_warm()
+
+	chunks = [doctypes[i::workers] for i in range(workers)] if doctypes else []
+	with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="migrate_x_prewarm") as executor:
+		futures = [executor.submit(warm_boot_data, site, sites_path)]
+		futures += [executor.submit(warm_doctypes, site, sites_path, chunk) for chunk in chunks if chunk]
+
+	failed = []
+	for future in futures:
+		try:
+			failed.extend(future.result())
+		except Exception as e:
+			# a worker that cannot connect leaves its doctypes cold, the migration goes on
+			failed.append(str(e))
+
+	for error in failed:
+		click.secho(f"prewarm cache: {error}", fg="red")
+
+	click.secho(
+		f"prewarmed cache of {len(doctypes)} doctypes in {time.perf_counter() - start:.2f}s"
+		f" ({len(failed)} failed)",
+		fg="blue",
+	)
+	return len(doctypes)
+
+
+def warm_doctypes(site, sites_path, doctypes):
+	from frappe.desk.form.meta import get_meta as get_form_meta
+
+	errors = []
+	with site_connection(site, sites_path):
+		for doctype in doctypes:
+			try:
+				meta = frappe.get_meta(doctype)
+				for child in {df.options for df in meta.get_table_fields()}:
+					frappe.get_meta(child)
+				if not meta.istable:
+					get_form_meta(doctype)
+			except Exception as e:
+				errors.append(f"{doctype}: {e}")
+			finally:
+				frappe.db.rollback()
+
+	return errors
+
+
+def warm_boot_data(site, sites_path):
+	from frappe.utils.global_search import get_doctypes_with_global_search
+
+	errors = []
+	with site_connection(site, sites_path):
+		for warm in (frappe.get_hooks, frappe.get_installed_apps, get_doctypes_with_global_search):
+			try:
+				warm()
+			except Exception as e:
+				errors.append(f"{warm.__name__}: {e}")
+
+	return errors
+
+
+@contextlib.contextmanager
+def site_connection(site, sites_path):
+	"""Connect the current worker thread to `site`"""
+	frappe.init(site=site, sites_path=sites_path)
+	frappe.connect()
+	try:
+		yield
+	finally:
+		frappe.destroy()
@@ -0,0 +1,83 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Durable checkpoints of a running migration.
+
+	Every completed phase step (per app), imported DocType file and executed
+	patch is appended to `sites/[site]/migrate_x/checkpoint.jsonl` right after
+	its changes are committed. When a migration dies, `--resume` skips
+	everything the log marks as done and continues with the step that was
+	running. Patches skipped by `--skip-failing` are logged as well, so a
+	resumed run still lists them. The log is removed once a migration finishes.
+"""
+import click
+from frappe.utils import now
+
+from frappe_migrate_x.overrides.customization.migrate_state import (
+	append_state,
+	clear_state,
+	load_state_log,
+	save_state,
+)
+
+CHECKPOINT = "checkpoint"
+# patches skipped by --skip-failing in the last finished migration
+SKIPPED_PATCHES = "skipped_patches"
+
+
+class Checkpoint:
+	def __init__(self, apps: list, resume: bool = False) -> None:
+		self.apps = list(apps)
+		records = load_state_log(CHECKPOINT) if resume else []
+
+		if records and records[0].get("apps") != self.apps:
+			click.secho("The checkpoint was written for other apps, starting over", fg="yellow")
+			records = []
+		elif resume and not records:
+			click.secho("No checkpoint to resume from, starting over", fg="yellow")
+
+		self.done = {record["step"] for record in records if record.get("event") == "done"}
+		self.skipped_patches = [record for record in records if record.get("event") == "skipped_patch"]
+		self.resumed_step = next(
+			(
+				record["step"]
+				for record in reversed(records)
+				if record.get("event") == "started" and record["step"] not in self.done
+			),
+			None,
+		)
+
+		if records:
+			click.secho(
+				f"Resuming migration started at {records[0]['at']}"
+				+ (f", stopped in {self.resumed_step}" if self.resumed_step else ""),
+				fg="yellow",
+			)
+		else:
+			clear_state(CHECKPOINT)
+			append_state(CHECKPOINT, dict(event="begin", apps=self.apps, at=now()))
+
+	def is_done(self, step: str) -> bool:
+		return step in self.done
+
+	def start(self, step: str) -> None:
+		append_state(CHECKPOINT, dict(event="started", step=step))
+
+	def mark_done(self, step: str) -> None:
+		"""Only call once the changes of `step` are committed"""
+		self.done.add(step)
+		append_state(CHECKPOINT, dict(event="done", step=step))
+
+	def skip_patch(self, patch: str, error: str) -> None:
+		record = dict(event="skipped_patch", patch=patch, error=error, at=now())
+		self.skipped_patches.append(record)
+		append_state(CHECKPOINT, record)
+
+	def finish(self) -> None:
+		save_state(SKIPPED_PATCHES, self.skipped_patches)
+		clear_state(CHECKPOINT)
+
+		if self.skipped_patches:
+			click.secho(f"{len(self.skipped_patches)} patches were skipped by --skip-failing:", fg="red")
+			for record in self.skipped_patches:
+				click.echo(f"  {record['patch']}: {record['error']}")
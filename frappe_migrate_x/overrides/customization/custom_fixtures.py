@@ -1,23 +1,365 @@
 # Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
 # License: MIT. See LICENSE
 
+import hashlib
+import json
 import os
+import tempfile
 
 import frappe
 from frappe.core.doctype.data_import.data_import import export_json, import_doc
+from frappe.core.doctype.role.role import desk_properties
+from frappe.modules.import_file import calculate_hash
+from frappe.translate import clear_cache as clear_translation_cache
+from frappe.utils import cint, cstr, flt, is_html, now, strip_html_tags
 from frappe.utils.deprecations import deprecation_warning
 import click
 from frappe.utils.fixtures import import_fixtures, import_custom_scripts
+from frappe_migrate_x.overrides.customization.migrate_state import load_state, save_state
 
-def sync_fixtures(app=None):
-	"""Import, overwrite fixtures from `[app]/fixtures`"""
+# per site hashes of fixture files and of every record in them
+FIXTURE_MANIFEST = "fixture_manifest"
+
+# doctypes whose fixture records can be written with multi row upserts, what
+# their controllers do is repeated by `apply_validate` and `clear_bulk_caches`
+BULK_FIXTURE_DOCTYPES = ("Custom Field", "Property Setter", "Translation", "Role")
+BULK_CHUNK_SIZE = 500
+# a Custom Field changing one of these is validated by its controller
+CUSTOM_FIELD_CONTROLLER_FIELDS = ("fieldtype", "insert_after", "fieldname")
+# not compared when deciding whether a record changed
+BULK_IGNORED_FIELDS = ("creation", "modified", "modified_by", "owner")
+
+
+def sync_fixtures(app=None, incremental=False, bulk=False):
+	"""Import, overwrite fixtures from `[app]/fixtures`
+
+	With `incremental`, only fixture files whose content changed since the
+	last sync are read, and only their new or changed records are imported.
+	With `bulk`, simple records (see `BULK_FIXTURE_DOCTYPES`) are upserted
+	with multi row queries instead of going through the document lifecycle.
+	"""
 	if app:
 		click.secho(f"sync fixtures for {app}", fg="blue")
 		frappe.flags.in_fixtures = True
 
-		click.secho(f"import fixtures {app}", fg="blue")
-		import_fixtures(app)
-		click.secho(f"import custom scripts {app}", fg="blue")
-		import_custom_scripts(app)
+		if incremental:
+			click.secho(f"import changed fixtures {app}", fg="blue")
+			import_changed_fixtures(app, bulk=bulk)
+		elif bulk:
+			click.secho(f"bulk import fixtures {app}", fg="blue")
+			import_fixtures_in_bulk(app)
+			click.secho(f"import custom scripts {app}", fg="blue")
+			import_custom_scripts(app)
+		else:
+			click.secho(f"import fixtures {app}", fg="blue")
+			import_fixtures(app)
+			click.secho(f"import custom scripts {app}", fg="blue")
+			import_custom_scripts(app)
 
 	frappe.flags.in_fixtures = False
+
+
+def import_fixtures_in_bulk(app):
+	fixtures_path = frappe.get_app_path(app, "fixtures")
+	if not os.path.exists(fixtures_path):
+		return
+
+	for fname in os.listdir(fixtures_path):
+		if not fname.endswith(".json"):
+			continue
+
+		with open(os.path.join(fixtures_path, fname)) as f:
+			docs = json.load(f)
+
+		try:
+			import_fixture_records(fname, docs if isinstance(docs, list) else [docs], bulk=True)
+		except (ImportError, frappe.DoesNotExistError) as e:
+			# fixture syncing for missing doctypes
+			print(f"Skipping fixture syncing from the file {fname}. Reason: {e}")
+
+
+def import_changed_fixtures(app, bulk=False):
+	fixtures_path = frappe.get_app_path(app, "fixtures")
+	if not os.path.exists(fixtures_path):
+		return
+
+	manifest = load_state(FIXTURE_MANIFEST)
+	app_manifest = manifest.setdefault(app, {})
+	skipped = imported = 0
+
+	try:
+		for fname in os.listdir(fixtures_path):
+			if not fname.endswith(".json"):
+				continue
+
+			entry = app_manifest.get(fname) or {}
+			file_hash, record_hashes, changed = diff_fixture_file(os.path.join(fixtures_path, fname), entry)
+			if file_hash == entry.get("hash"):
+				skipped += 1
+				continue
+
+			try:
+				import_fixture_records(fname, changed, bulk=bulk)
+			except (ImportError, frappe.DoesNotExistError) as e:
+				# fixture syncing for missing doctypes
+				print(f"Skipping fixture syncing from the file {fname}. Reason: {e}")
+				continue
+
+			imported += len(changed)
+			app_manifest[fname] = {"hash": file_hash, "records": record_hashes}
+
+		if get_changed_custom_scripts(app, app_manifest):
+			click.secho(f"import custom scripts {app}", fg="blue")
+			import_custom_scripts(app)
+			app_manifest.update(get_custom_script_hashes(app))
+	finally:
+		save_state(FIXTURE_MANIFEST, manifest)
+
+	click.secho(f"{app}: imported {imported} changed fixture records, skipped {skipped} unchanged files", fg="blue")
+
+
+def diff_fixture_file(file_path, entry=None):
+	"""Return the file hash, the hash of every record and the records that
+	are new or changed compared to the manifest `entry` of the file"""
+	file_hash = calculate_hash(file_path)
+	entry = entry or {}
+	if entry.get("hash") == file_hash:
+		return file_hash, entry.get("records") or {}, []
+
+	with open(file_path) as f:
+		docs = json.load(f)
+	if not isinstance(docs, list):
+		docs = [docs]
+
+	known = entry.get("records") or {}
+	record_hashes = {}
+	changed = []
+
+	for doc in docs:
+		record_hash = hashlib.md5(json.dumps(doc, sort_keys=True, default=str).encode()).hexdigest()
+		if not doc.get("name"):
+			# records without a name cannot be tracked, always import them
+			changed.append(doc)
+			continue
+
+		key = f"{doc.get('doctype')}::{doc['name']}"
+		record_hashes[key] = record_hash
+		if known.get(key) != record_hash:
+			changed.append(doc)
+
+	return file_hash, record_hashes, changed
+
+
+def import_fixture_records(fname, docs, bulk=False):
+	"""Import `docs` exactly like a fixture file made of only these records"""
+	if bulk:
+		docs = bulk_upsert_fixtures(docs)
+
+	if not docs:
+		return
+
+	with tempfile.TemporaryDirectory(prefix="migrate_x_fixtures_") as folder:
+		file_path = os.path.join(folder, fname)
+		with open(file_path, "w") as f:
+			json.dump(docs, f, default=str)
+
+		import_doc(file_path)
+
+
+def get_custom_script_hashes(app):
+	scripts_folder = frappe.get_app_path(app, "fixtures", "custom_scripts")
+	if not os.path.exists(scripts_folder):
+		return {}
+
+	return {
+		f"custom_scripts/{fname}": calculate_hash(os.path.join(scripts_folder, fname))
+		for fname in os.listdir(scripts_folder)
+		if fname.endswith(".js")
+	}
+
+
+def get_changed_custom_scripts(app, app_manifest):
+	return [key for key, script_hash in get_custom_script_hashes(app).items() if app_manifest.get(key) != script_hash]
+
+
+def bulk_upsert_fixtures(docs):
+	"""Upsert the records of `docs` that do not need their controller with
+	`INSERT ... ON DUPLICATE KEY UPDATE`, one diff query per doctype.
+
+	Returns the records that still have to go through the normal import.
+	"""
+	if frappe.db.db_type != "mariadb":
+		return docs
+
+	doc_events = frappe.get_hooks("doc_events") or {}
+	override_classes = frappe.get_hooks("override_doctype_class") or {}
+
+	remaining = []
+	by_doctype = {}
+	for doc in docs:
+		doctype = doc.get("doctype")
+		if (
+			doctype in BULK_FIXTURE_DOCTYPES
+			and doc.get("name")
+			# `*` doc_events are framework wide, only doctype specific hooks need the lifecycle
+			and doctype not in doc_events
+			and doctype not in override_classes
+			and not any(isinstance(value, (list, dict)) for value in doc.values())
+		):
+			by_doctype.setdefault(doctype, []).append(doc)
+		else:
+			remaining.append(doc)
+
+	for doctype, records in by_doctype.items():
+		changed, needs_controller = diff_with_database(doctype, records)
+		remaining.extend(needs_controller)
+		if doctype == "Property Setter":
+			delete_replaced_property_setters(changed)
+		upsert_records(doctype, changed)
+		clear_bulk_caches(doctype, changed)
+
+	frappe.db.commit()
+	return remaining
+
+
+def diff_with_database(doctype, records):
+	"""Return the rows to upsert and the records that must use the normal import"""
+	columns = set(frappe.db.get_table_columns(doctype))
+	existing = {
+		row.name: row
+		for row in frappe.get_all(
+			doctype, filters={"name": ("in", [record["name"] for record in records])}, fields=["*"]
+		)
+	}
+
+	changed = []
+	needs_controller = []
+	for record in records:
+		row = existing.get(record["name"])
+		values = {key: value for key, value in record.items() if key in columns}
+
+		if doctype == "Role" and (
+			values.get("disabled") or (row and cstr(row.desk_access) != cstr(values.get("desk_access", row.desk_access)))
+		):
+			# disabling a role or changing its desk access updates users
+			needs_controller.append(record)
+			continue
+
+		if doctype == "Property Setter" and values.get("property") == "fieldtype":
+			# the controller validates the fieldtype change
+			needs_controller.append(record)
+			continue
+
+		if doctype == "Custom Field" and (
+			not values.get("fieldname")
+			or (
+				row
+				and not all(
+					is_same_value(row.get(key), values.get(key, row.get(key))) for key in CUSTOM_FIELD_CONTROLLER_FIELDS
+				)
+			)
+		):
+			# the controller normalizes the fieldname, orders the field and checks the fieldtype change
+			needs_controller.append(record)
+			continue
+
+		apply_validate(doctype, values, row)
+		values = {key: value for key, value in values.items() if key in columns}
+
+		if row and all(
+			is_same_value(row.get(key), value) for key, value in values.items() if key not in BULK_IGNORED_FIELDS
+		):
+			continue
+
+		changed.append(values)
+
+	return changed, needs_controller
+
+
+def apply_validate(doctype, values, row=None):
+	"""Changes the `validate` of the bulk doctypes makes to a record"""
+	if doctype == "Role":
+		# Role.set_desk_properties
+		if values.get("name") == "Guest":
+			values["desk_access"] = 0
+
+		desk_access = values.get("desk_access", row.desk_access if row else 1)
+		if not cint(desk_access):
+			for key in desk_properties:
+				values[key] = 0
+	elif doctype == "Translation" and is_html(values.get("source_text")):
+		# Translation.remove_html_from_source
+		values["source_text"] = strip_html_tags(values["source_text"]).strip()
+
+
+def delete_replaced_property_setters(rows):
+	"""Like `PropertySetter.validate`, a property setter replaces the ones of
+	the same property saved under another name"""
+	for row in rows:
+		filters = {"doc_type": row.get("doc_type"), "property": row.get("property"), "name": ("!=", row["name"])}
+		if row.get("field_name"):
+			filters["field_name"] = row["field_name"]
+		if row.get("row_name"):
+			filters["row_name"] = row["row_name"]
+
+		frappe.db.delete("Property Setter", filters)
+
+
+def is_same_value(db_value, value):
+	if isinstance(db_value, (int, float)) or isinstance(value, (int, float)):
+		return flt(db_value) == flt(value)
+	return cstr(db_value) == cstr(value)
+
+
+def upsert_records(doctype, rows):
+	if not rows:
+		return
+
+	timestamp = now()
+	defaults = dict(
+		owner="Administrator", creation=timestamp, modified=timestamp, modified_by="Administrator", docstatus=0
+	)
+	columns = sorted(set(defaults).union(*rows))
+	# the row is replaced like the normal import does, except its creation and owner
+	update = ", ".join(f"`{column}` = VALUES(`{column}`)" for column in columns if column not in ("name", "creation", "owner"))
+
+	for start in range(0, len(rows), BULK_CHUNK_SIZE):
+		chunk = rows[start : start + BULK_CHUNK_SIZE]
+		placeholders = []
+		values = []
+		for row in chunk:
+			row = {**defaults, **row}
+			placeholders.append(
+				"(" + ", ".join("%s" if column in row else "DEFAULT" for column in columns) + ")"
+			)
+			values.extend(
+				int(row[column]) if isinstance(row[column], bool) else row[column]
+				for column in columns
+				if column in row
+			)
+
+		frappe.db.sql(
+			f"""insert into `tab{doctype}` ({", ".join(f"`{column}`" for column in columns)})
+			values {", ".join(placeholders)}
+			on duplicate key update {update}""",
+			values,
+		)
+
+
+def clear_bulk_caches(doctype, rows):
+	"""What the controllers of the bulk doctypes do on update, once per upsert"""
+	if not rows:
+		return
+
+	if doctype == "Custom Field":
+		for dt in {row.get("dt") for row in rows if row.get("dt")}:
+			frappe.clear_cache(doctype=dt)
+			# adds the new columns, like `create_custom_fields` does once per doctype
+			frappe.db.updatedb(dt)
+	elif doctype == "Property Setter":
+		for dt in {row.get("doc_type") for row in rows if row.get("doc_type")}:
+			frappe.clear_cache(doctype=dt)
+	elif doctype == "Translation":
+		clear_translation_cache()
+	elif doctype == "Role":
+		frappe.clear_cache(doctype="Role")
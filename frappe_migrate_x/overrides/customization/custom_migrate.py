@@ -5,6 +5,7 @@ import contextlib
 import functools
 import json
 import os
+import time
 from textwrap import dedent
 
 import frappe
@@ -19,7 +20,7 @@ from frappe.database.schema import add_column
 from frappe.deferred_insert import save_to_db as flush_deferred_inserts
 from frappe.desk.notifications import clear_notifications
 # from frappe.modules.patch_handler import PatchType
-from  frappe_migrate_x.overrides.customization.custom_patch_handler import PatchType
+from  frappe_migrate_x.overrides.customization.custom_patch_handler import PatchRegistry, PatchType
 from frappe.modules.utils import sync_customizations
 from frappe.search.website_search import build_index_for_all_routes
 from frappe.utils.connections import check_connection
@@ -28,6 +29,28 @@ from frappe.utils.dashboard import sync_dashboards
 from frappe_migrate_x.overrides.customization.custom_fixtures import sync_fixtures
 from frappe.website.utils import clear_website_cache
 import frappe_migrate_x.overrides.customization.custom_sync
+from frappe_migrate_x import write_monkey_patch_manifest
+from frappe_migrate_x.overrides.customization.app_fingerprint import (
+	get_app_fingerprints,
+	get_changed_apps,
+	record_app_fingerprints,
+)
+from frappe_migrate_x.overrides.customization.app_scheduler import get_app_dependencies, run_app_graph
+from frappe_migrate_x.overrides.customization.checkpoint import Checkpoint
+from frappe_migrate_x.overrides.customization.cache_prewarm import PREWARM_WORKERS, prewarm_cache
+from frappe_migrate_x.overrides.customization.migration_plan import MigrationPlanner
+from frappe_migrate_x.overrides.customization.migration_report import MigrationReport, phase_timer
+from frappe_migrate_x.overrides.customization.online_phase import (
+	defer_online_phase,
+	finish_online_phase,
+	get_deferred_online_phase,
+	get_online_steps,
+	is_online_step,
+)
+from frappe_migrate_x.overrides.customization.search_index import queue_search_index_update
+from frappe_migrate_x.overrides.customization.sql_profiler import SQLProfiler
+from frappe_migrate_x.overrides.customization.step_fingerprints import StepFingerprints
+from frappe_migrate_x.overrides.customization.sync_cache import clear_code_cache
 import click
 from frappe.migrate import SiteMigration
 
@@ -75,10 +98,39 @@ class SiteMigrationX(SiteMigration):
 	"""
 
 	def __init__(self, skip_failing: bool = False, skip_search_index: bool = False, 
-			  specific_apps: list = None, specific_app: str = None, skip_fixtures: bool = False) -> None:
+			  specific_apps: list = None, specific_app: str = None, skip_fixtures: bool = False,
+			  full_sync: bool = False, commit_every: int = 1, commit_interval: float = None,
+			  incremental_fixtures: bool = False, bulk_fixtures: bool = False,
+			  full_clear_cache: bool = False, prewarm_cache: bool = False,
+			  prewarm_workers: int = PREWARM_WORKERS, resume: bool = False,
+			  app_jobs: int = 1, parse_jobs: int = 0, changed: bool = False,
+			  batch_alter: bool = False, online_alter_rows: int = 0, online_alter_sleep: float = 0,
+			  online_alter_max_replica_lag: float = None, phase: str = None,
+			  incremental_search_index: bool = False, profile_sql: bool = False) -> None:
 		self.skip_failing = skip_failing
 		self.skip_search_index = skip_search_index
+		self.incremental_search_index = incremental_search_index
+		self.profile_sql = profile_sql
 		self.skip_fixtures = skip_fixtures
+		self.full_sync = full_sync
+		self.incremental_fixtures = incremental_fixtures
+		self.bulk_fixtures = bulk_fixtures
+		self.full_clear_cache = full_clear_cache
+		self.prewarm_cache = prewarm_cache
+		self.prewarm_workers = prewarm_workers
+		self.resume = resume
+		self.app_jobs = app_jobs
+		self.parse_jobs = parse_jobs
+		self.changed = changed
+		self.batch_alter = batch_alter
+		self.online_alter_rows = online_alter_rows
+		self.online_alter_sleep = online_alter_sleep
+		self.online_alter_max_replica_lag = online_alter_max_replica_lag
+		# "offline" or "online" to split the migration, see `online_phase`
+		self.phase = phase
+		self.online_steps = set()
+		self.commit_every = commit_every
+		self.commit_interval = commit_interval
 		self.default_apps = ["frappe", "erpnext"]
 		
 		# Handle backward compatibility with specific_app parameter
@@ -101,25 +153,70 @@ class SiteMigrationX(SiteMigration):
 			for app in frappe.get_installed_apps():
 				if app in self.default_apps:
 					for fn in frappe.get_hooks("before_migrate", app_name=app):
-						frappe.get_attr(fn)()
+						with phase_timer("before_migrate", hook=fn):
+							self.checkpointed(f"before_migrate:{fn}", frappe.get_attr(fn))
 
 
 	@atomic
 	def run_schema_updates(self):
 		"""Run patches as defined in patches.txt, sync schema changes as defined in the {doctype}.json files"""
 		if len(self.default_apps) > 0:
-			for app in frappe.get_installed_apps():
-				if app in self.default_apps:
-					frappe_migrate_x.overrides.customization.custom_patch_handler.run_all(
-						skip_failing=self.skip_failing, patch_type=PatchType.pre_model_sync,specific_app=app
-					)
-					frappe_migrate_x.overrides.customization.custom_sync.sync_all(specific_app=app)
-					frappe_migrate_x.overrides.customization.custom_patch_handler.run_all(
-						skip_failing=self.skip_failing, patch_type=PatchType.post_model_sync,specific_app=app
-					)
+			# Patch Log is read once and shared by every app and patch type
+			patch_registry = PatchRegistry()
+
+			apps = [app for app in frappe.get_installed_apps() if app in self.default_apps]
+
+			if self.app_jobs > 1 and len(apps) > 1:
+				dependencies = get_app_dependencies(apps)
+				# the worker connections must not wait on locks held by this one
+				frappe.db.commit()
+				run_app_graph(
+					apps,
+					dependencies,
+					self.app_jobs,
+					functools.partial(self.migrate_app_schema, patch_registry=patch_registry),
+				)
+			else:
+				for app in apps:
+					self.migrate_app_schema(app, patch_registry)
 
 			click.secho(f"finish run_schema_updates", fg="yellow")
 
+	def migrate_app_schema(self, app, patch_registry):
+		"""Pre model sync patches, DocType sync and post model sync patches of `app`"""
+		with phase_timer("run_all", app=app, patch_type=PatchType.pre_model_sync.value):
+			self.checkpointed(
+				f"run_all:{app}:{PatchType.pre_model_sync.value}",
+				frappe_migrate_x.overrides.customization.custom_patch_handler.run_all,
+				skip_failing=self.skip_failing, patch_type=PatchType.pre_model_sync,specific_app=app,
+				registry=patch_registry, checkpoint=self.checkpoint
+			)
+		with phase_timer("sync_for", app=app):
+			self.checkpointed(
+				f"sync_for:{app}",
+				frappe_migrate_x.overrides.customization.custom_sync.sync_all,
+				specific_app=app,
+				full_sync=self.full_sync,
+				commit_every=self.commit_every,
+				commit_interval=self.commit_interval,
+				full_clear_cache=self.full_clear_cache,
+				checkpoint=self.checkpoint,
+				parse_jobs=self.parse_jobs,
+				batch_alter=self.batch_alter,
+				online_alter_rows=self.online_alter_rows,
+				online_alter_sleep=self.online_alter_sleep,
+				online_alter_max_replica_lag=self.online_alter_max_replica_lag,
+			)
+		with phase_timer("run_all", app=app, patch_type=PatchType.post_model_sync.value):
+			self.checkpointed(
+				f"run_all:{app}:{PatchType.post_model_sync.value}",
+				frappe_migrate_x.overrides.customization.custom_patch_handler.run_all,
+				skip_failing=self.skip_failing, patch_type=PatchType.post_model_sync,specific_app=app,
+				registry=patch_registry, checkpoint=self.checkpoint,
+				online=False if self.phase == "offline" else None
+			)
+
+
 	@atomic
 	def post_schema_updates(self):
 		"""Execute pending migration tasks post patches execution & schema sync
@@ -134,35 +231,156 @@ class SiteMigrationX(SiteMigration):
 		* Sync Installed Applications Version History
 		* Execute `after_migrate` hooks
 		"""
-		click.secho(f"sync jobs", fg="blue")
-		sync_jobs()
+		self.step_fingerprints = StepFingerprints()
+
+		if self.in_phase("sync_jobs"):
+			click.secho(f"sync jobs", fg="blue")
+			self.run_step("sync_jobs", sync_jobs)
 
 		if len(self.default_apps) > 0:
 			for app in frappe.get_installed_apps():
 				if app in self.default_apps:
-					if not self.skip_fixtures:
+					if not self.skip_fixtures and self.in_phase("sync_fixtures"):
 						click.secho(f"sync {app} fixtures", fg="blue")
-						sync_fixtures(app)
+						with phase_timer("sync_fixtures", app=app):
+							self.checkpointed(
+								f"sync_fixtures:{app}",
+								sync_fixtures,
+								app,
+								incremental=self.incremental_fixtures,
+								bulk=self.bulk_fixtures,
+							)
 
-					click.secho(f"sync {app} dashboards", fg="blue")
-					sync_dashboards(app)
-					click.secho(f"sync {app} customizations ", fg="blue")
-					sync_customizations(app)
+					if self.in_phase("sync_dashboards"):
+						click.secho(f"sync {app} dashboards", fg="blue")
+						with phase_timer("sync_dashboards", app=app):
+							self.checkpointed(f"sync_dashboards:{app}", sync_dashboards, app)
+					if self.in_phase("sync_customizations"):
+						click.secho(f"sync {app} customizations ", fg="blue")
+						with phase_timer("sync_customizations", app=app):
+							self.checkpointed(f"sync_customizations:{app}", sync_customizations, app)
 
-		click.secho(f"sync languages", fg="blue")
-		sync_languages()		
-		flush_deferred_inserts()
+		if self.in_phase("sync_languages"):
+			click.secho(f"sync languages", fg="blue")
+			self.run_step("sync_languages", sync_languages)
+		if self.in_phase("flush_deferred_inserts"):
+			with phase_timer("flush_deferred_inserts"):
+				self.checkpointed("flush_deferred_inserts", flush_deferred_inserts)
 
-		frappe.get_single("Portal Settings").sync_menu()
-		frappe.get_single("Installed Applications").update_versions()
+		if self.in_phase("sync_portal_menu"):
+			self.run_step("sync_portal_menu", lambda: frappe.get_single("Portal Settings").sync_menu())
+		if self.in_phase("update_versions"):
+			self.run_step(
+				"update_versions", lambda: frappe.get_single("Installed Applications").update_versions()
+			)
 
 
 		if len(self.default_apps) > 0:
 			for app in frappe.get_installed_apps():
 				if app in self.default_apps:
 					for fn in frappe.get_hooks("after_migrate", app_name=app):
+						if not self.in_phase(f"after_migrate:{fn}"):
+							continue
 						click.secho(f"{fn}", fg="red")
-						frappe.get_attr(fn)()
+						with phase_timer("after_migrate", hook=fn):
+							self.checkpointed(f"after_migrate:{fn}", frappe.get_attr(fn))
+
+	def setUp(self):
+		"""Same as frappe's, but the whole cache is only cleared with
+		`full_clear_cache`, otherwise every app sync clears what it imported"""
+		frappe.flags.touched_tables = set()
+		self.touched_tables_file = frappe.get_site_path("touched_tables.json")
+		if self.full_clear_cache:
+			frappe.clear_cache()
+		else:
+			clear_code_cache()
+		add_column(doctype="DocType", column_name="migration_hash", fieldtype="Data")
+		if self.full_clear_cache:
+			clear_global_cache()
+
+		if os.path.exists(self.touched_tables_file):
+			os.remove(self.touched_tables_file)
+
+		frappe.flags.in_migrate = True
+
+	def tearDown(self):
+		if not self.incremental_search_index:
+			return super().tearDown()
+
+		# the parent queues a rebuild of every route unless the index is skipped
+		skip_search_index, self.skip_search_index = self.skip_search_index, True
+		try:
+			super().tearDown()
+		finally:
+			self.skip_search_index = skip_search_index
+
+		if not self.skip_search_index:
+			self.update_search_index()
+
+	def update_search_index(self):
+		with phase_timer("queue_search_index"):
+			queue_search_index_update(self.default_apps, since=self.report.started_at)
+
+	def in_phase(self, step):
+		"""Whether `step` belongs to the phase being run, every step does without `phase`"""
+		if not self.phase:
+			return True
+		return is_online_step(step, self.online_steps) == (self.phase == "online")
+
+	def run_step(self, step, fn):
+		"""Run a site wide step unless its inputs did not change since the last migration"""
+		# the fingerprint is always computed so a forced run still stores it
+		if self.step_fingerprints.is_unchanged(step) and not self.full_sync:
+			click.secho(f"skip {step}, inputs unchanged", fg="blue")
+			with phase_timer(step, decision="skipped"):
+				return
+
+		with phase_timer(step, decision="ran"):
+			self.checkpointed(step, fn)
+
+	def checkpointed(self, step, fn, *args, **kwargs):
+		"""Run `fn` unless the migration being resumed completed `step`, commit and log it as done"""
+		if self.checkpoint.is_done(step):
+			click.secho(f"skip {step}, completed before the migration was resumed", fg="blue")
+			return
+
+		self.checkpoint.start(step)
+		fn(*args, **kwargs)
+		frappe.db.commit()
+		self.checkpoint.mark_done(step)
+
+	def select_changed_apps(self):
+		"""Add the installed apps that changed since their last migration to the
+		migrated apps, returns the fingerprints of all installed apps"""
+		fingerprints = get_app_fingerprints(frappe.get_installed_apps())
+		changed = get_changed_apps(fingerprints)
+		click.secho(f"Apps changed since the last migration: {', '.join(changed) or 'none'}", fg="yellow")
+
+		for app in changed:
+			if app not in self.default_apps:
+				self.default_apps.append(app)
+
+		return fingerprints, changed
+
+	def plan(self, site: str):
+		"""Return the pending work of a migration on `site` without running it"""
+		if site:
+			frappe.init(site=site)
+			frappe.connect()
+
+		try:
+			if self.changed:
+				self.select_changed_apps()
+
+			return MigrationPlanner(
+				self.default_apps,
+				skip_fixtures=self.skip_fixtures,
+				full_sync=self.full_sync,
+				incremental_fixtures=self.incremental_fixtures,
+			).get_plan()
+		finally:
+			frappe.db.rollback()
+			frappe.destroy()
 
 	def run(self, site: str):
 		"""Run Migrate operation on site specified. This method initializes
@@ -176,11 +394,118 @@ class SiteMigrationX(SiteMigration):
 		if not self.required_services_running():
 			raise SystemExit(1)
 
+		if self.phase:
+			self.online_steps = get_online_steps()
+		if self.phase == "online":
+			return self.run_online_phase()
+
+		if self.changed:
+			fingerprints, changed = self.select_changed_apps()
+			# apps given with --app are migrated whether they changed or not
+			if not changed and not self.specific_apps:
+				frappe.destroy()
+				return
+		else:
+			fingerprints = get_app_fingerprints(frappe.get_installed_apps())
+
+		self.create_report()
+		self.checkpoint = Checkpoint(self.default_apps, resume=self.resume)
+
+		start = time.monotonic()
 		self.setUp()
 		try:
-			self.pre_schema_updates()
-			self.run_schema_updates()
-			self.post_schema_updates()
+			with phase_timer("pre_schema_updates"):
+				self.pre_schema_updates()
+			with phase_timer("run_schema_updates"):
+				self.run_schema_updates()
+			with phase_timer("post_schema_updates"):
+				self.post_schema_updates()
+			# only once the steps that ran are committed
+			self.step_fingerprints.save()
+
+			if self.prewarm_cache:
+				# while the site is still in maintenance mode
+				with phase_timer("prewarm_cache", workers=self.prewarm_workers):
+					prewarm_cache(workers=self.prewarm_workers)
+
+			# connections skip scanning the monkey_patches folders from now on
+			write_monkey_patch_manifest()
+			self.checkpoint.finish()
+			record_app_fingerprints(
+				{app: fingerprint for app, fingerprint in fingerprints.items() if app in self.default_apps}
+			)
+			if self.phase == "offline":
+				defer_online_phase(self.default_apps, time.monotonic() - start)
+		finally:
+			with phase_timer("tear_down"):
+				self.tearDown()
+			self.write_report()
+			frappe.destroy()
+
+	def run_online_phase(self):
+		"""Run the online safe patches and steps deferred by `--phase offline`
+		with the site up"""
+		pending = get_deferred_online_phase()
+		if not pending:
+			click.secho("No online phase pending, run migrate-x --phase offline first", fg="yellow")
+			frappe.destroy()
+			return
+
+		self.default_apps = pending["apps"]
+		self.create_report()
+		self.checkpoint = Checkpoint(self.default_apps, resume=self.resume)
+
+		start = time.monotonic()
+		frappe.flags.in_migrate = True
+		try:
+			with phase_timer("online_patches"):
+				self.run_online_patches()
+			with phase_timer("post_schema_updates"):
+				self.post_schema_updates()
+			self.step_fingerprints.save()
+			self.checkpoint.finish()
+			# cached meta, translations and fixtures of a site that is serving requests
+			frappe.clear_cache()
+			if self.incremental_search_index and not self.skip_search_index:
+				# fixtures and after_migrate hooks may have changed web pages
+				self.update_search_index()
+			finish_online_phase(pending, time.monotonic() - start)
 		finally:
-			self.tearDown()
+			frappe.flags.in_migrate = False
+			self.write_report()
 			frappe.destroy()
+
+	@atomic
+	def run_online_patches(self):
+		patch_registry = PatchRegistry()
+		for app in frappe.get_installed_apps():
+			if app in self.default_apps:
+				with phase_timer("run_all", app=app, patch_type="online"):
+					self.checkpointed(
+						f"run_all:{app}:online",
+						frappe_migrate_x.overrides.customization.custom_patch_handler.run_all,
+						skip_failing=self.skip_failing, patch_type=PatchType.post_model_sync, specific_app=app,
+						registry=patch_registry, checkpoint=self.checkpoint, online=True
+					)
+
+	def create_report(self):
+		self.report = frappe.flags.migrate_x_report = MigrationReport(
+			frappe.local.site, self.default_apps, phase=self.phase
+		)
+		if self.profile_sql:
+			self.report.sql_profiler = SQLProfiler()
+			self.report.sql_profiler.install(frappe.db)
+
+	def write_report(self):
+		frappe.flags.migrate_x_report = None
+		if self.report.sql_profiler:
+			self.report.sql_profiler.uninstall()
+		try:
+			path = self.report.write()
+		except Exception:
+			# the report must never hide the outcome of the migration
+			click.secho("Could not write the migration report", fg="red")
+			return
+
+		self.report.print_summary()
+		click.secho(f"Migration report: {path}", fg="yellow")
@@ -41,6 +41,15 @@ from textwrap import dedent, indent
 
 import frappe
 from frappe.modules.patch_handler import run_single,get_patches_from_app
+from frappe.utils import now
+from frappe_migrate_x.overrides.customization.migrate_state import load_bench_state, load_state, update_state
+from frappe_migrate_x.overrides.customization.migration_report import item_timer
+from frappe_migrate_x.overrides.customization.online_phase import get_online_patches, is_online_patch
+from frappe_migrate_x.overrides.customization.patch_stats import PatchETA, measure_patch
+
+# wall time of the last runs of every patch, used to estimate pending work
+PATCH_HISTORY = "patch_history"
+PATCH_HISTORY_RUNS = 10
 
 class PatchError(Exception):
 	pass
@@ -51,33 +60,119 @@ class PatchType(Enum):
 	post_model_sync = "post_model_sync"
 
 
-def run_all(skip_failing: bool = False, patch_type: PatchType | None = None, specific_app=None) -> None:
-	"""run all pending patches"""
-	executed = set(frappe.get_all("Patch Log", fields="patch", pluck="patch"))
+class PatchRegistry:
+	"""Patches executed on the site, read from `Patch Log` once per migration.
+
+	Share one registry between every `run_all` call of a migration instead of
+	scanning `Patch Log` for each app and patch type.
+	"""
+
+	def __init__(self) -> None:
+		self.executed = set(frappe.get_all("Patch Log", fields="patch", pluck="patch"))
+
+	def __contains__(self, patch: str) -> bool:
+		return patch in self.executed
+
+	def add(self, patch: str) -> None:
+		self.executed.add(patch)
+
+
+def run_all(
+	skip_failing: bool = False,
+	patch_type: PatchType | None = None,
+	specific_app=None,
+	registry: PatchRegistry | None = None,
+	checkpoint=None,
+	online: bool | None = None,
+) -> None:
+	"""run all pending patches
+
+	With a `checkpoint`, every executed patch and every patch skipped by
+	`skip_failing` is logged to it, patches it marks as done are skipped.
+	`online` only runs the patches marked
+	online safe (True) or all the others (False), see `online_phase`."""
+	executed = registry if registry is not None else PatchRegistry()
+	online_patches = get_online_patches() if online is not None else set()
+	history = load_state(PATCH_HISTORY)
+	# the history of other apps may be saved by other threads meanwhile
+	ran = set()
 
 	frappe.flags.final_patches = []
 
 	def run_patch(patch):
+		eta.start(patch)
+		start = time.monotonic()
 		try:
-			if not run_single(patchmodule=patch):
-				print(patch + ": failed: STOPPED")
-				raise PatchError(patch)
-		except Exception:
+			with item_timer("patch", patch), measure_patch() as stats:
+				if not run_single(patchmodule=patch):
+					print(patch + ": failed: STOPPED")
+					raise PatchError(patch)
+
+			# `finally:` patches are only queued here, they are logged when they run at the end
+			if not patch.startswith("finally:"):
+				executed.add(patch)
+				record_patch_run(history, patch, time.monotonic() - start, **stats)
+				ran.add(patch)
+				if checkpoint:
+					checkpoint.mark_done(f"patch:{patch}")
+		except Exception as e:
 			if not skip_failing:
 				raise
 			else:
 				print("Failed to execute patch")
+				if checkpoint:
+					checkpoint.skip_patch(patch, repr(e))
+
+	patches = [
+		patch
+		for patch in get_all_patches(patch_type=patch_type,specific_app=specific_app)
+		if patch and (patch not in executed)
+		and (online is None or is_online_patch(patch, online_patches) == online)
+		# completed by the migration being resumed
+		and not (checkpoint and checkpoint.is_done(f"patch:{patch}"))
+	]
+
+	bench_history = get_bench_patch_history()
+	eta = PatchETA({patch: estimate_patch_seconds(bench_history, patch) for patch in patches})
+
+	try:
+		for patch in patches:
+			if patch not in executed:
+				run_patch(patch)
+
+		# patches to be run in the end
+		for patch in frappe.flags.final_patches:
+			patch = patch.replace("finally:", "")
+			run_patch(patch)
+	finally:
+		if ran:
+			update_state(PATCH_HISTORY, lambda stored: {**stored, **{patch: history[patch] for patch in ran}})
 
-	patches = get_all_patches(patch_type=patch_type,specific_app=specific_app)
 
-	for patch in patches:
-		if patch and (patch not in executed):
-			run_patch(patch)
+def record_patch_run(history: dict, patch: str, seconds: float, **stats) -> None:
+	"""Keep the wall time of a run with the `rows` it wrote and its largest `table`"""
+	runs = history.setdefault(patch, [])
+	runs.append({"seconds": round(seconds, 3), "at": now(), **stats})
+	del runs[:-PATCH_HISTORY_RUNS]
+
+
+def get_bench_patch_history() -> dict:
+	"""Runs of every patch on all sites of the bench, a patch pending on one
+	site has usually already run on another one"""
+	history = {}
+	for site_history in load_bench_state(PATCH_HISTORY).values():
+		for patch, runs in site_history.items():
+			history.setdefault(patch, []).extend(runs)
+
+	return history
+
 
-	# patches to be run in the end
-	for patch in frappe.flags.final_patches:
-		patch = patch.replace("finally:", "")
-		run_patch(patch)
+def estimate_patch_seconds(history: dict, patch: str) -> float | None:
+	"""Median wall time of the recorded runs of `patch`, None without history"""
+	runs = sorted(run["seconds"] for run in history.get(patch) or [])
+	if not runs:
+		return None
+	return runs[len(runs) // 2]
 
 
 def get_all_patches(patch_type: PatchType | None = None, specific_app = None) -> list[str]:
@@ -4,13 +4,25 @@
 	Sync's doctype and docfields from txt files to database
 	perms will get synced only if none exist
 """
+import contextlib
+import functools
 import os
 
+import click
 import frappe
-from frappe.modules.import_file import import_file_by_path
+from frappe.modules.import_file import import_file_by_path, read_doc_from_file
 from frappe.modules.patch_handler import _patch_mode
 from frappe.utils import update_progress_bar
-from frappe.model.sync import get_doc_files
+from frappe_migrate_x.overrides.customization.alter_batch import AlterBatch
+from frappe_migrate_x.overrides.customization.file_index import DocFileIndex
+from frappe_migrate_x.overrides.customization.import_batch import ImportBatch
+from frappe_migrate_x.overrides.customization.migrate_state import ContentManifest
+from frappe_migrate_x.overrides.customization.migration_report import item_timer
+from frappe_migrate_x.overrides.customization.parse_pool import diff_doc_files, parse_pool
+from frappe_migrate_x.overrides.customization.sync_cache import SyncScope, clear_scoped_cache, merge_touched
+
+# per site manifest of DocType JSON files that are already in sync with the database
+DOCTYPE_MANIFEST = "doctype_manifest"
 
 IMPORTABLE_DOCTYPES = [
 	("core", "doctype"),
@@ -35,18 +47,48 @@ IMPORTABLE_DOCTYPES = [
 ]
 
 
-def sync_all(force=0, reset_permissions=False, specific_app=None):
+def sync_all(force=0, reset_permissions=False, specific_app=None, full_sync=False, commit_every=1,
+		commit_interval=None, full_clear_cache=False, checkpoint=None, parse_jobs=0, batch_alter=False,
+		online_alter_rows=0, online_alter_sleep=0, online_alter_max_replica_lag=None):
+	"""Sync the DocTypes of `specific_app` and clear the cache of what was imported.
+
+	Only the cache entries of the synced doctypes and documents are dropped,
+	`full_clear_cache` falls back to `frappe.clear_cache()`.
+	"""
 	_patch_mode(True)
 
+	scope = SyncScope()
 	if specific_app:
-		sync_for(specific_app, force, reset_permissions=reset_permissions)
+		sync_for(
+			specific_app,
+			force,
+			reset_permissions=reset_permissions,
+			full_sync=full_sync,
+			commit_every=commit_every,
+			commit_interval=commit_interval,
+			scope=scope,
+			checkpoint=checkpoint,
+			parse_jobs=parse_jobs,
+			batch_alter=batch_alter,
+			online_alter_rows=online_alter_rows,
+			online_alter_sleep=online_alter_sleep,
+			online_alter_max_replica_lag=online_alter_max_replica_lag,
+		)
 		
 	_patch_mode(False)
 
-	frappe.clear_cache()
+	if full_clear_cache:
+		frappe.clear_cache()
+	else:
+		clear_scoped_cache(scope)
+
 
+def get_app_doc_files(app_name, index=None):
+	"""Return paths of the DocType, Page, Report ... JSON files of `app_name` in import order.
 
-def sync_for(app_name, force=0, reset_permissions=False):
+	Module folders are read through the persistent `DocFileIndex`, pass an
+	`index` to share it between apps, it is saved by the caller then.
+	"""
 	files = []
 
 	if app_name == "frappe":
@@ -95,26 +137,175 @@ def sync_for(app_name, force=0, reset_permissions=False):
 			files.append(os.path.join(FRAPPE_PATH, "desk", "doctype", desk_module, f"{desk_module}.json"))
 
 		for module_name, document_type in IMPORTABLE_DOCTYPES:
-			file = os.path.join(FRAPPE_PATH, module_name, "doctype", document_type, f"{document_type}.json")
-			if file not in files:
-				files.append(file)
+			files.append(os.path.join(FRAPPE_PATH, module_name, "doctype", document_type, f"{document_type}.json"))
+
+	save_index = index is None
+	index = index if index is not None else DocFileIndex()
 
 	for module_name in frappe.local.app_modules.get(app_name) or []:
 		folder = os.path.dirname(frappe.get_module(app_name + "." + module_name).__file__)
-		files = get_doc_files(files=files, start_path=folder)
+		for _, document_type in IMPORTABLE_DOCTYPES:
+			files.extend(index.get_doc_files(os.path.join(folder, document_type)))
 
-	l = len(files)
+	if save_index:
+		index.save()
 
-	if l:
-		for i, doc_path in enumerate(files):
-			import_file_by_path(
-				doc_path, force=force, ignore_version=True, reset_permissions=reset_permissions
-			)
+	# same order as `get_doc_files`, the first occurrence of a file wins
+	seen = set()
+	return [path for path in files if not (path in seen or seen.add(path))]
+
+
+def sync_for(app_name, force=0, reset_permissions=False, full_sync=False, commit_every=1,
+		commit_interval=None, scope=None, checkpoint=None, parse_jobs=0, batch_alter=False,
+		online_alter_rows=0, online_alter_sleep=0, online_alter_max_replica_lag=None):
+	"""Import the DocType JSON files of `app_name`.
+
+	Files whose content hash matches the site manifest are skipped before
+	being parsed, unless `force` or `full_sync` is set. Imports are committed
+	every `commit_every` files or `commit_interval` seconds (see `ImportBatch`).
+	The files that were actually imported are tracked in `scope`, committed
+	files are logged to `checkpoint` and skipped when resuming. With
+	`parse_jobs`, files are parsed and compared with the database in worker
+	processes while this one imports (see `parse_pool`). With `batch_alter`,
+	the ALTER TABLE statements of consecutive DocType files are combined into
+	one per table (see `AlterBatch`), a file only counts as synced once its
+	table was altered. Tables of at least `online_alter_rows` rows are altered
+	online through a shadow table copy (see `online_alter`), without
+	`batch_alter` right after the file that changed them.
+	"""
+	scope = scope if scope is not None else SyncScope()
+	files = get_app_doc_files(app_name)
+
+	manifest = ContentManifest(DOCTYPE_MANIFEST)
+	if force or full_sync:
+		pending = files
+	else:
+		pending = [doc_path for doc_path in files if not manifest.is_unchanged(app_name, doc_path)]
+
+	if checkpoint:
+		pending = [
+			doc_path for doc_path in pending if not checkpoint.is_done(get_checkpoint_step(app_name, doc_path))
+		]
+
+	l = len(pending)
+	batch = ImportBatch(commit_every=commit_every, commit_interval=commit_interval)
+	in_sync = 0
+	# frappe's own meta tables must have their new columns before the next file is imported
+	combine_alters = batch_alter and app_name != "frappe"
+	if combine_alters or online_alter_rows:
+		alter_batch = AlterBatch(
+			online_rows=online_alter_rows,
+			online_sleep=online_alter_sleep,
+			online_max_replica_lag=online_alter_max_replica_lag,
+		)
+	else:
+		alter_batch = None
+
+	with contextlib.ExitStack() as stack:
+		if alter_batch:
+			stack.enter_context(alter_batch)
+
+		if parse_jobs > 1 and l and not force:
+			diffs = diff_doc_files(stack.enter_context(parse_pool(parse_jobs)), pending)
+		else:
+			diffs = ((doc_path, None, None) for doc_path in pending)
+
+		try:
+			for i, (doc_path, file_hash, needs_import) in enumerate(diffs):
+				if file_hash:
+					manifest.hashes[doc_path] = file_hash
+
+				if needs_import is False:
+					# nothing to write, no need to wait for a commit
+					in_sync += 1
+					on_doc_file_commit(manifest, checkpoint, app_name, doc_path)
+					update_progress_bar(f"Updating DocTypes for {app_name}", i, l)
+					continue
+
+				on_commit = functools.partial(on_doc_file_commit, manifest, checkpoint, app_name, doc_path)
+				if alter_batch:
+					if not is_doctype_file(doc_path):
+						# Report, Page ... documents may be stored in the tables altered so far
+						flush_alters(batch, alter_batch)
+					alter_batch.source = doc_path
+					on_commit = functools.partial(alter_batch.on_flush.append, on_commit)
+
+				batch.add(
+					functools.partial(
+						import_doc_file,
+						app_name,
+						doc_path,
+						force=force,
+						reset_permissions=reset_permissions,
+						scope=scope,
+					),
+					on_commit=on_commit,
+				)
+				if alter_batch and not combine_alters and alter_batch.pending:
+					flush_alters(batch, alter_batch)
+
+				# show progress bar
+				update_progress_bar(f"Updating DocTypes for {app_name}", i, l)
+
+			batch.commit()
+			if alter_batch:
+				flush_alters(batch, alter_batch)
+
+			# print each progress bar on new line
+			if l:
+				print()
+		finally:
+			if alter_batch and (alter_batch.pending or alter_batch.on_flush):
+				# the files imported before a failing one still need their tables altered
+				flush_alters(batch, alter_batch)
+			# keep what was imported so far, a rerun continues from the failing file
+			manifest.save()
+			merge_touched(scope)
+
+	batch.print_timings(f"Updating DocTypes for {app_name}")
+
+	skipped = len(files) - l + in_sync
+	click.secho(f"{app_name}: imported {l - in_sync} DocType files, skipped {skipped} unchanged", fg="blue")
+
+	return frappe._dict(imported=l - in_sync, skipped=skipped)
+
+
+def is_doctype_file(doc_path):
+	"""`[module]/doctype/[name]/[name].json`"""
+	return os.path.basename(os.path.dirname(os.path.dirname(doc_path))) == "doctype"
+
+
+def flush_alters(batch, alter_batch):
+	batch.commit()
+	alter_batch.flush(on_failure=reset_doc_files)
+
+
+def reset_doc_files(paths):
+	"""Make the next migration import the DocType files at `paths` again, their table could not be altered"""
+	for path in paths:
+		doc = read_doc_from_file(path)
+		if isinstance(doc, dict) and doc.get("doctype") == "DocType":
+			frappe.db.set_value("DocType", doc["name"], "migration_hash", None, update_modified=False)
+
+	frappe.db.commit()
+
+
+def get_checkpoint_step(app_name, doc_path):
+	return f"doctype_file:{app_name}:{os.path.relpath(doc_path, frappe.get_app_path(app_name))}"
+
+
+def on_doc_file_commit(manifest, checkpoint, app_name, doc_path):
+	manifest.record(app_name, doc_path)
+	if checkpoint:
+		checkpoint.mark_done(get_checkpoint_step(app_name, doc_path))
 
-			frappe.db.commit()
 
-			# show progress bar
-			update_progress_bar(f"Updating DocTypes for {app_name}", i, l)
+def import_doc_file(app_name, doc_path, force=0, reset_permissions=False, scope=None):
+	with item_timer("doctype_file", os.path.relpath(doc_path, frappe.get_app_path(app_name)), app=app_name):
+		imported = import_file_by_path(
+			doc_path, force=force, ignore_version=True, reset_permissions=reset_permissions
+		)
 
-		# print each progress bar on new line
-		print()
+	# files already in sync with the database are not imported and keep their cache
+	if imported and scope is not None:
+		scope.track(doc_path)
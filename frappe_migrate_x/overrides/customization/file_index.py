@@ -0,0 +1,90 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Persistent index of the DocType JSON files of every module.
+
+	Finding the files of an app means listing every `[module]/[document type]`
+	folder and checking each of its sub folders for a `[name]/[name].json`.
+	The index keeps the result per folder together with the folder's mtime,
+	so on the next run a folder is only listed again when an entry was added,
+	removed or renamed in it. Sub folders that had no JSON file yet are
+	remembered with their own mtime and checked again when it changes.
+"""
+import os
+
+from frappe_migrate_x.overrides.customization.migrate_state import load_state, update_state
+
+DOC_FILE_INDEX = "doc_file_index"
+
+
+class DocFileIndex:
+	def __init__(self) -> None:
+		self.folders = load_state(DOC_FILE_INDEX)
+		# folders scanned again, merged into the stored index by `save`
+		self.changed = set()
+
+	def get_doc_files(self, folder):
+		"""Paths of `[folder]/[name]/[name].json` in listing order, `folder` being
+		a document type folder like `[module]/doctype`"""
+		try:
+			mtime = os.stat(folder).st_mtime_ns
+		except FileNotFoundError:
+			if self.folders.pop(folder, None) is not None:
+				self.changed.add(folder)
+			return []
+
+		entry = self.folders.get(folder)
+		if not entry or entry["mtime"] != mtime:
+			entry = self.scan(folder, mtime)
+		elif entry["incomplete"]:
+			self.rescan_incomplete(folder, entry)
+
+		return [os.path.join(folder, name, f"{name}.json") for name in entry["names"]]
+
+	def scan(self, folder, mtime):
+		entry = {"mtime": mtime, "names": [], "incomplete": {}}
+		for name in os.listdir(folder):
+			self.add_name(folder, entry, name)
+
+		self.folders[folder] = entry
+		self.changed.add(folder)
+		return entry
+
+	def rescan_incomplete(self, folder, entry):
+		for name, mtime in list(entry["incomplete"].items()):
+			try:
+				changed = os.stat(os.path.join(folder, name)).st_mtime_ns != mtime
+			except FileNotFoundError:
+				changed = True
+
+			if changed:
+				entry["incomplete"].pop(name)
+				self.add_name(folder, entry, name)
+				self.changed.add(folder)
+
+	def add_name(self, folder, entry, name):
+		path = os.path.join(folder, name)
+		if not os.path.isdir(path):
+			return
+
+		if os.path.exists(os.path.join(path, f"{name}.json")):
+			entry["names"].append(name)
+		else:
+			# e.g. a folder with only python files, its JSON may be added later
+			entry["incomplete"][name] = os.stat(path).st_mtime_ns
+
+	def save(self):
+		if not self.changed:
+			return
+
+		changed, self.changed = self.changed, set()
+
+		def merge(stored):
+			for folder in changed:
+				if folder in self.folders:
+					stored[folder] = self.folders[folder]
+				else:
+					stored.pop(folder, None)
+			return stored
+
+		update_state(DOC_FILE_INDEX, merge)
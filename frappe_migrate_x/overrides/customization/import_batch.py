@@ -0,0 +1,119 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Groups DocType file imports into one transaction instead of committing
+	after every file. Each file runs inside its own savepoint so a failing
+	file only rolls back its own changes.
+
+	DDL (ALTER/CREATE TABLE) commits implicitly on MariaDB and destroys the
+	savepoints of the open transaction. A file that caused an implicit commit
+	is detected when its savepoint can no longer be released and always ends
+	the current batch.
+"""
+import time
+
+import click
+import frappe
+
+
+class ImportBatch:
+	def __init__(self, commit_every: int = 1, commit_interval: float | None = None) -> None:
+		# the default of 1 file only caps the batch when no interval is given
+		self.commit_every = commit_every if commit_every and commit_every > 1 else None
+		self.commit_interval = commit_interval or None
+		self.enabled = bool(self.commit_every or self.commit_interval)
+
+		self.on_commit = []
+		self.size = 0
+		self.started = None
+		self.timings = []
+
+	def add(self, method, on_commit=None):
+		"""Run `method` inside the current batch, `on_commit` is called once its changes are durable"""
+		if not self.enabled:
+			method()
+			frappe.db.commit()
+			if on_commit:
+				on_commit()
+			return
+
+		if self.started is None:
+			self.started = time.monotonic()
+
+		save_point = f"migrate_x_{self.size}"
+		frappe.db.savepoint(save_point)
+
+		try:
+			method()
+		except Exception:
+			self.rollback_to(save_point)
+			# files imported before the failing one are kept
+			self.commit()
+			raise
+
+		self.size += 1
+		if on_commit:
+			self.on_commit.append(on_commit)
+
+		implicit_commit = not self.release(save_point)
+		if implicit_commit or self.is_full():
+			self.commit(implicit=implicit_commit)
+
+	def is_full(self):
+		if self.commit_every and self.size >= self.commit_every:
+			return True
+		return bool(self.commit_interval) and time.monotonic() - self.started >= self.commit_interval
+
+	def release(self, save_point):
+		try:
+			frappe.db.release_savepoint(save_point)
+			return True
+		except Exception:
+			# savepoint was dropped by an implicit commit
+			return False
+
+	def rollback_to(self, save_point):
+		try:
+			frappe.db.rollback(save_point=save_point)
+		except Exception:
+			# an implicit commit inside the failing file already made the
+			# earlier files durable, only its own trailing writes are discarded
+			frappe.db.rollback()
+			self.flush_callbacks()
+
+	def commit(self, implicit=False):
+		if self.started is None:
+			return
+
+		commit_start = time.monotonic()
+		frappe.db.commit()
+		end = time.monotonic()
+
+		self.timings.append(
+			frappe._dict(
+				files=self.size,
+				seconds=end - self.started,
+				commit_seconds=end - commit_start,
+				implicit=implicit,
+			)
+		)
+		self.flush_callbacks()
+		self.size = 0
+		self.started = None
+
+	def flush_callbacks(self):
+		for callback in self.on_commit:
+			callback()
+		self.on_commit = []
+
+	def print_timings(self, label):
+		if not self.timings:
+			return
+
+		for i, batch in enumerate(self.timings, 1):
+			reason = " (ended by DDL)" if batch.implicit else ""
+			click.secho(
+				f"{label} batch {i}: {batch.files} files in {batch.seconds:.3f}s,"
+				f" commit {batch.commit_seconds:.3f}s{reason}",
+				fg="cyan",
+			)
@@ -0,0 +1,191 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Site level state that migrate-x keeps between runs.
+
+	Everything is stored as JSON in `sites/[site]/migrate_x/` so the state
+	follows the site and not the bench. Deleting the folder (or running with
+	`--full-sync`) makes the next migration behave like a plain `bench migrate`.
+
+	State written by several threads of one migration (`--app-jobs`) goes
+	through `update_state`, which merges the changes of a writer into what is
+	stored under a lock instead of replacing the whole file.
+"""
+import json
+import os
+import threading
+
+import frappe
+from frappe.modules.import_file import calculate_hash
+from frappe.utils import get_sites
+
+STATE_FOLDER = "migrate_x"
+
+_state_locks = {}
+_state_locks_lock = threading.Lock()
+
+
+def get_state_path(*path):
+	return frappe.get_site_path(STATE_FOLDER, *path)
+
+
+def load_state(name, default=None):
+	"""Return the stored state `name`, or `default` when nothing was saved yet"""
+	path = get_state_path(f"{name}.json")
+	if default is None:
+		default = {}
+
+	if not os.path.exists(path):
+		return default
+
+	try:
+		with open(path) as f:
+			return json.load(f)
+	except ValueError:
+		# half written or hand edited file, behave as if nothing was stored
+		return default
+
+
+def save_state(name, data):
+	"""Atomically replace the stored state `name` with `data`"""
+	path = get_state_path(f"{name}.json")
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+
+	tmp_path = f"{path}.tmp"
+	with open(tmp_path, "w") as f:
+		json.dump(data, f, indent=1, sort_keys=True, default=str)
+	os.replace(tmp_path, path)
+
+
+def get_state_lock(name):
+	path = get_state_path(f"{name}.json")
+	with _state_locks_lock:
+		return _state_locks.setdefault(path, threading.Lock())
+
+
+def update_state(name, merge):
+	"""Save `merge(stored)` as the state `name`, no other `update_state` of
+	`name` runs in between. Returns the saved state"""
+	with get_state_lock(name):
+		data = merge(load_state(name))
+		save_state(name, data)
+		return data
+
+
+def load_bench_state(name, sites_path=None):
+	"""Return `{site: state}` for every site of the bench that has state `name`,
+	`sites_path` defaults to the one of the initialized site"""
+	sites_path = sites_path or frappe.local.sites_path
+	states = {}
+	for site in get_sites(sites_path):
+		path = os.path.join(sites_path, site, STATE_FOLDER, f"{name}.json")
+		if not os.path.exists(path):
+			continue
+
+		try:
+			with open(path) as f:
+				states[site] = json.load(f)
+		except ValueError:
+			continue
+
+	return states
+
+
+def append_state(name, record):
+	"""Append `record` as a JSON line to the log `name`, on disk before returning"""
+	path = get_state_path(f"{name}.jsonl")
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+
+	with open(path, "a") as f:
+		f.write(json.dumps(record, sort_keys=True, default=str) + "\n")
+		f.flush()
+		os.fsync(f.fileno())
+
+
+def load_state_log(name):
+	"""Return the records appended to the log `name`"""
+	path = get_state_path(f"{name}.jsonl")
+	if not os.path.exists(path):
+		return []
+
+	records = []
+	with open(path) as f:
+		for line in f:
+			try:
+				records.append(json.loads(line))
+			except ValueError:
+				# last line cut short by a crash
+				break
+
+	return records
+
+
+def clear_state(name):
+	for path in (get_state_path(f"{name}.json"), get_state_path(f"{name}.jsonl")):
+		if os.path.exists(path):
+			os.remove(path)
+
+
+class ContentManifest:
+	"""Content hashes of files that were synced successfully, grouped by app.
+
+	A file whose hash matches the recorded one can be skipped without being
+	parsed or compared with the database.
+	"""
+
+	def __init__(self, name):
+		self.name = name
+		self.entries = load_state(name)
+		self.hashes = {}
+		# {app: {key: hash, None once forgotten}} to merge into the stored manifest
+		self.changes = {}
+
+	def get_key(self, app, path):
+		return os.path.relpath(path, frappe.get_app_path(app))
+
+	def get_hash(self, path):
+		if path not in self.hashes:
+			self.hashes[path] = calculate_hash(path)
+		return self.hashes[path]
+
+	def is_unchanged(self, app, path):
+		if not os.path.exists(path):
+			return False
+
+		recorded = self.entries.get(app, {}).get(self.get_key(app, path))
+		return bool(recorded) and recorded == self.get_hash(path)
+
+	def record(self, app, path):
+		if os.path.exists(path):
+			key, file_hash = self.get_key(app, path), self.get_hash(path)
+			self.entries.setdefault(app, {})[key] = file_hash
+			self.changes.setdefault(app, {})[key] = file_hash
+
+	def forget(self, app, path):
+		key = self.get_key(app, path)
+		self.entries.get(app, {}).pop(key, None)
+		self.changes.setdefault(app, {})[key] = None
+
+	def forget_app(self, app):
+		for key in list(self.entries.get(app, {})):
+			self.changes.setdefault(app, {})[key] = None
+		self.entries.pop(app, None)
+
+	def save(self):
+		"""Merge the recorded and forgotten files into the stored manifest,
+		the manifest of other apps may be saved by other threads meanwhile"""
+		changes, self.changes = self.changes, {}
+
+		def merge(stored):
+			for app, keys in changes.items():
+				entries = stored.setdefault(app, {})
+				for key, file_hash in keys.items():
+					if file_hash is None:
+						entries.pop(key, None)
+					else:
+						entries[key] = file_hash
+				if not entries:
+					stored.pop(app)
+			return stored
+
+		self.entries = update_state(self.name, merge)
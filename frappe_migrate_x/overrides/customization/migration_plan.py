@@ -0,0 +1,245 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Read only migration planner.
+
+	Computes the work `SiteMigrationX.run` would do on the current site:
+	pending patches, DocType files that differ from the database, fixtures
+	that would be imported and the migrate hooks that would fire. Nothing is
+	executed, imported or committed.
+"""
+import json
+import os
+
+import click
+import frappe
+from frappe.database.mariadb.schema import MariaDBTable
+from frappe.model.meta import Meta
+from frappe.modules.import_file import read_doc_from_file
+from frappe.utils import get_datetime
+
+from frappe_migrate_x.overrides.customization.alter_batch import AlterBatch, get_expected_algorithm
+from frappe_migrate_x.overrides.customization.custom_fixtures import (
+	FIXTURE_MANIFEST,
+	diff_fixture_file,
+	get_changed_custom_scripts,
+)
+from frappe_migrate_x.overrides.customization.custom_patch_handler import (
+	PatchRegistry,
+	PatchType,
+	estimate_patch_seconds,
+	get_all_patches,
+	get_bench_patch_history,
+)
+from frappe_migrate_x.overrides.customization.custom_sync import DOCTYPE_MANIFEST, get_app_doc_files
+from frappe_migrate_x.overrides.customization.file_index import DocFileIndex
+from frappe_migrate_x.overrides.customization.migrate_state import ContentManifest, load_state
+from frappe_migrate_x.overrides.customization.patch_stats import get_table_rows
+
+
+class MigrationPlanner:
+	def __init__(
+		self, apps: list, skip_fixtures: bool = False, full_sync: bool = False, incremental_fixtures: bool = False
+	) -> None:
+		# same order as SiteMigrationX uses to migrate them
+		self.apps = [app for app in frappe.get_installed_apps() if app in apps]
+		self.skip_fixtures = skip_fixtures
+		self.full_sync = full_sync
+		self.incremental_fixtures = incremental_fixtures
+
+	def get_plan(self):
+		self.registry = PatchRegistry()
+		self.history = get_bench_patch_history()
+		self.manifest = ContentManifest(DOCTYPE_MANIFEST)
+		self.fixture_manifest = load_state(FIXTURE_MANIFEST)
+		self.file_index = DocFileIndex()
+		self.doctypes = {
+			d.name: d for d in frappe.get_all("DocType", fields=["name", "modified", "migration_hash"])
+		}
+
+		plan = frappe._dict(
+			site=frappe.local.site,
+			before_migrate=[fn for app in self.apps for fn in frappe.get_hooks("before_migrate", app_name=app)],
+			apps=[self.get_app_plan(app) for app in self.apps],
+			after_migrate=[fn for app in self.apps for fn in frappe.get_hooks("after_migrate", app_name=app)],
+		)
+		self.file_index.save()
+
+		patches = [patch for app_plan in plan.apps for patch in app_plan.patches]
+		plan.estimated_seconds = round(sum(patch.estimated_seconds or 0 for patch in patches), 3)
+		plan.patches_without_history = len([patch for patch in patches if patch.estimated_seconds is None])
+
+		return plan
+
+	def get_app_plan(self, app):
+		patches = []
+		for patch_type in (PatchType.pre_model_sync, PatchType.post_model_sync):
+			for patch in get_all_patches(patch_type=patch_type, specific_app=app):
+				if patch and patch not in self.registry:
+					patches.append(
+						frappe._dict(
+							patch=patch,
+							patch_type=patch_type.value,
+							estimated_seconds=estimate_patch_seconds(self.history, patch),
+						)
+					)
+
+		doc_files = get_app_doc_files(app, index=self.file_index)
+		pending_doc_files = self.get_pending_doc_files(app, doc_files)
+		return frappe._dict(
+			app=app,
+			patches=patches,
+			doc_files=len(doc_files),
+			pending_doc_files=pending_doc_files,
+			alters=self.get_alters(app, pending_doc_files),
+			fixtures=self.get_fixture_files(app),
+		)
+
+	def get_pending_doc_files(self, app, doc_files):
+		app_path = frappe.get_app_path(app)
+		pending = []
+
+		for path in doc_files:
+			if not os.path.exists(path):
+				continue
+			if not self.full_sync and self.manifest.is_unchanged(app, path):
+				continue
+			if self.differs_from_db(path, self.manifest.get_hash(path)):
+				pending.append(os.path.relpath(path, app_path))
+
+		return pending
+
+	def get_alters(self, app, pending_doc_files):
+		"""Table changes of the pending DocType files, combined per table like `--batch-alter` does"""
+		app_path = frappe.get_app_path(app)
+		errors = {}
+		with AlterBatch(execute=False) as alter_batch:
+			for path in pending_doc_files:
+				doc = read_doc_from_file(os.path.join(app_path, path))
+				if not isinstance(doc, dict) or doc.get("doctype") != "DocType" or doc.get("issingle"):
+					continue
+
+				try:
+					table = MariaDBTable(doc["name"], Meta(doc))
+					table.validate()
+					table.sync()
+				except Exception as e:
+					errors[f"tab{doc['name']}"] = str(e)
+
+		table_rows = get_table_rows(set(alter_batch.pending) | set(errors))
+		alters = [
+			frappe._dict(
+				table=table,
+				changes=len(bodies),
+				algorithm=get_expected_algorithm(bodies),
+				rows=table_rows.get(table),
+			)
+			for table, bodies in alter_batch.pending.items()
+		]
+		alters.extend(
+			frappe._dict(table=table, changes=0, algorithm="unknown", rows=table_rows.get(table), error=error)
+			for table, error in errors.items()
+		)
+		return alters
+
+	def differs_from_db(self, path, file_hash):
+		"""Same checks as `import_file_by_path` uses to decide if a file is imported"""
+		docs = read_doc_from_file(path)
+		if not isinstance(docs, list):
+			docs = [docs]
+
+		for doc in docs:
+			if doc.get("doctype") == "DocType":
+				stored = self.doctypes.get(doc.get("name"))
+				if not stored or stored.migration_hash != file_hash:
+					return True
+				continue
+
+			try:
+				db_modified = frappe.db.get_value(doc.get("doctype"), doc.get("name"), "modified")
+			except Exception:
+				# table of a DocType that is created by this migration
+				return True
+
+			if not db_modified or get_datetime(doc.get("modified")) > get_datetime(db_modified):
+				return True
+
+		return False
+
+	def get_fixture_files(self, app):
+		"""Fixture files that would be imported with the number of records read from them.
+
+		Without `incremental_fixtures` every file is imported in full.
+		"""
+		fixtures_path = frappe.get_app_path(app, "fixtures")
+		if self.skip_fixtures or not os.path.exists(fixtures_path):
+			return []
+
+		app_manifest = self.fixture_manifest.get(app) or {}
+		fixtures = []
+		for fname in sorted(os.listdir(fixtures_path)):
+			if not fname.endswith(".json"):
+				continue
+
+			file_path = os.path.join(fixtures_path, fname)
+			if self.incremental_fixtures:
+				entry = app_manifest.get(fname) or {}
+				file_hash, _, changed = diff_fixture_file(file_path, entry)
+				if file_hash != entry.get("hash"):
+					fixtures.append(frappe._dict(file=fname, records=len(changed)))
+				continue
+
+			with open(file_path) as f:
+				records = json.load(f)
+			fixtures.append(frappe._dict(file=fname, records=len(records) if isinstance(records, list) else 1))
+
+		if self.incremental_fixtures:
+			scripts = get_changed_custom_scripts(app, app_manifest)
+			if scripts:
+				fixtures.append(frappe._dict(file="custom_scripts", records=len(scripts)))
+
+		return fixtures
+
+
+def print_plan(plan):
+	click.secho(f"\nMigration plan for {plan.site}", fg="cyan")
+
+	click.secho(f"{'App':<30}{'Patches':>9}{'DocTypes':>12}{'Fixtures':>10}{'Est.':>10}", fg="yellow")
+	for app_plan in plan.apps:
+		estimate = sum(patch.estimated_seconds or 0 for patch in app_plan.patches)
+		doctypes = f"{len(app_plan.pending_doc_files)}/{app_plan.doc_files}"
+		click.echo(
+			f"{app_plan.app:<30}{len(app_plan.patches):>9}{doctypes:>12}{len(app_plan.fixtures):>10}"
+			f"{estimate:>9.1f}s"
+		)
+
+	for app_plan in plan.apps:
+		if not (app_plan.patches or app_plan.pending_doc_files or app_plan.fixtures):
+			continue
+
+		click.secho(f"\n{app_plan.app}", fg="cyan")
+		for patch in app_plan.patches:
+			estimate = "no history" if patch.estimated_seconds is None else f"~{patch.estimated_seconds:.1f}s"
+			click.echo(f"  patch ({patch.patch_type}): {patch.patch} [{estimate}]")
+		for path in app_plan.pending_doc_files:
+			click.echo(f"  import: {path}")
+		for alter in app_plan.alters:
+			rows = "new table" if alter.rows is None else f"~{alter.rows} rows"
+			click.echo(
+				f"  alter: {alter.table} ({alter.changes} changes, {alter.algorithm}, {rows})"
+				+ (f" cannot diff: {alter.error}" if alter.get("error") else "")
+			)
+		for fixture in app_plan.fixtures:
+			click.echo(f"  fixture: {fixture.file} ({fixture.records} records)")
+
+	for hook_type in ("before_migrate", "after_migrate"):
+		if plan[hook_type]:
+			click.secho(f"\n{hook_type} hooks", fg="cyan")
+			for fn in plan[hook_type]:
+				click.echo(f"  {fn}")
+
+	click.secho(
+		f"\nEstimated patch time: {plan.estimated_seconds:.1f}s"
+		f" ({plan.patches_without_history} patches without timing history)",
+		fg="yellow",
+	)
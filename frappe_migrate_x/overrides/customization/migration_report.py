@@ -0,0 +1,161 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Timing report of a migrate-x run.
+
+	`SiteMigrationX.run` keeps a `MigrationReport` in `frappe.flags` for the
+	duration of the migration. Phases (run_all, sync_for, sync_fixtures ...)
+	and items (each patch, each imported DocType file) are timed through
+	`phase_timer` / `item_timer`, which do nothing when no report is active.
+
+	The report is written to `sites/[site]/migrate_x/reports/` as JSON.
+"""
+import contextlib
+import time
+
+import click
+import frappe
+from frappe.utils import now
+
+from frappe_migrate_x.overrides.customization.migrate_state import get_state_path, save_state
+
+LAST_REPORT = "reports/last"
+
+
+class MigrationReport:
+	def __init__(self, site: str, apps: list, phase: str = None) -> None:
+		self.site = site
+		self.apps = apps
+		# "offline" / "online" part of a split migration, see `online_phase`
+		self.migration_phase = phase
+		# `SQLProfiler` of --profile-sql
+		self.sql_profiler = None
+		self.started_at = now()
+		self.start = time.perf_counter()
+		self.phases = []
+		self.items = []
+
+	@contextlib.contextmanager
+	def phase(self, name, **details):
+		with self.timed(self.phases, name, details):
+			yield
+
+	@contextlib.contextmanager
+	def item(self, kind, name, **details):
+		with self.timed(self.items, name, dict(kind=kind, **details)):
+			yield
+
+	@contextlib.contextmanager
+	def timed(self, entries, name, details):
+		entry = dict(name=name, **details)
+		start = time.perf_counter()
+		try:
+			yield entry
+			entry["status"] = "ok"
+		except BaseException:
+			entry["status"] = "failed"
+			raise
+		finally:
+			entry["seconds"] = round(time.perf_counter() - start, 4)
+			entries.append(entry)
+
+	def as_dict(self):
+		report = dict(
+			site=self.site,
+			apps=self.apps,
+			phase=self.migration_phase,
+			started_at=self.started_at,
+			finished_at=now(),
+			seconds=round(time.perf_counter() - self.start, 4),
+			phases=self.phases,
+			items=self.items,
+		)
+		if self.sql_profiler:
+			report["sql_profile"] = self.sql_profiler.get_profile()
+		return report
+
+	def write(self):
+		"""Write the report, returns its path"""
+		report = self.as_dict()
+		name = "reports/" + self.started_at.replace(" ", "_").replace(":", "-").split(".")[0]
+
+		save_state(name, report)
+		save_state(LAST_REPORT, report)
+		return get_state_path(f"{name}.json")
+
+	def print_summary(self, top=10):
+		label = {"offline": "Offline window", "online": "Online phase"}.get(self.migration_phase, "Migration")
+		click.secho(f"\n{label} took {time.perf_counter() - self.start:.2f}s", fg="cyan")
+
+		for phase in self.phases:
+			label = " ".join(str(v) for k, v in phase.items() if k not in ("name", "seconds", "status"))
+			color = "red" if phase["status"] == "failed" else None
+			click.secho(f"  {phase['seconds']:>10.3f}s  {phase['name']} {label}".rstrip(), fg=color)
+
+		slowest = sorted(self.items, key=lambda item: item["seconds"], reverse=True)[:top]
+		if slowest:
+			click.secho(f"\nTop {len(slowest)} slowest items", fg="cyan")
+			for item in slowest:
+				click.echo(f"  {item['seconds']:>10.3f}s  {item['kind']}: {item['name']}")
+
+		if self.sql_profiler:
+			self.print_sql_profile(top)
+
+	def print_sql_profile(self, top=10):
+		profile = self.sql_profiler.get_profile(top_items=top, top_statements=1)
+		if profile["items"]:
+			click.secho(f"\nTop {len(profile['items'])} items by SQL time", fg="cyan")
+			for item in profile["items"]:
+				click.echo(
+					f"  {item['seconds']:>10.3f}s  {item['queries']:>7} queries  {item['kind']}: {item['name']}"
+				)
+				for entry in item["top"]:
+					click.echo(f"      {entry['count']}x {entry['statement'][:120]}")
+
+		if profile["n_plus_one"]:
+			click.secho(f"\n{len(profile['n_plus_one'])} possible N+1 query patterns", fg="red")
+			for entry in profile["n_plus_one"][:top]:
+				click.echo(f"  {entry['count']:>7}x  {entry['kind']}: {entry['name']}: {entry['statement'][:120]}")
+
+
+def get_report() -> MigrationReport | None:
+	return frappe.flags.migrate_x_report
+
+
+@contextlib.contextmanager
+def phase_timer(name, **details):
+	report = get_report()
+	if not report:
+		yield
+		return
+
+	with report.phase(name, **details):
+		yield
+
+
+@contextlib.contextmanager
+def item_timer(kind, name, **details):
+	report = get_report()
+	if not report:
+		yield
+		return
+
+	with report.item(kind, name, **details):
+		if not report.sql_profiler:
+			yield
+			return
+
+		with report.sql_profiler.item(kind, name):
+			yield
+
+
+@contextlib.contextmanager
+def sql_profiler_paused():
+	"""Leave the bookkeeping queries of migrate-x out of the SQL profile"""
+	report = get_report()
+	if not report or not report.sql_profiler:
+		yield
+		return
+
+	with report.sql_profiler.paused():
+		yield
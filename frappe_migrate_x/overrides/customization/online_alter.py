@@ -0,0 +1,178 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Online schema change of large tables with a shadow table copy.
+
+	Instead of an ALTER TABLE that blocks writes while it rebuilds a table with
+	tens of millions of rows (the pt-osc / gh-ost approach):
+
+	1. a shadow table is created like the original and altered while empty
+	2. triggers on the original replay every insert, update and delete on it
+	3. rows are copied in keyset chunks of `name` with INSERT IGNORE, rows the
+	   triggers wrote are newer and are kept, every chunk is committed and
+	   followed by the same throttling as `chunked_update`
+	4. RENAME TABLE swaps both tables atomically, then the triggers and the
+	   old table are dropped
+
+	INSERT IGNORE would silently drop rows a new unique index rejects, the copy
+	fails instead when the shadow table ends up with fewer rows. Anything left
+	over from a failed run is dropped before it starts again.
+"""
+import hashlib
+import time
+
+import click
+import frappe
+from frappe.utils import update_progress_bar
+
+from frappe_migrate_x.utils.chunked_update import get_replica_db, wait_for_replica
+
+ONLINE_CHUNK_SIZE = 5000
+
+
+class OnlineSchemaChange:
+	def __init__(
+		self,
+		table,
+		body,
+		chunk_size=ONLINE_CHUNK_SIZE,
+		sleep=0,
+		max_replica_lag=None,
+		sql_ddl=None,
+		on_chunk=None,
+	) -> None:
+		self.table = table
+		self.body = body
+		self.chunk_size = chunk_size
+		self.sleep = sleep
+		self.max_replica_lag = max_replica_lag
+		self.sql_ddl = sql_ddl or frappe.db.sql_ddl
+		# called after every copied chunk, lets tests write while the copy runs
+		self.on_chunk = on_chunk
+
+		key = hashlib.md5(table.encode()).hexdigest()[:10]
+		self.shadow = f"_mx_new_{key}"
+		self.old = f"_mx_old_{key}"
+		self.triggers = {event: f"_mx_{key}_{event.lower()}" for event in ("INSERT", "UPDATE", "DELETE")}
+
+	def run(self):
+		start = time.monotonic()
+		self.cleanup()
+		try:
+			self.sql_ddl(f"CREATE TABLE `{self.shadow}` LIKE `{self.table}`")
+			self.sql_ddl(f"ALTER TABLE `{self.shadow}` {self.body}")
+			self.columns = [column for column in get_columns(self.shadow) if column in set(get_columns(self.table))]
+			self.create_triggers()
+			rows = self.copy_rows()
+			self.check_rows()
+			self.sql_ddl(
+				f"RENAME TABLE `{self.table}` TO `{self.old}`, `{self.shadow}` TO `{self.table}`"
+			)
+		except Exception:
+			self.cleanup()
+			raise
+
+		self.cleanup()
+		click.secho(
+			f"altered {self.table} online, copied {rows} rows in {time.monotonic() - start:.1f}s", fg="blue"
+		)
+
+	def create_triggers(self):
+		columns = ", ".join(f"`{column}`" for column in self.columns)
+		new_values = ", ".join(f"NEW.`{column}`" for column in self.columns)
+		replace = f"REPLACE INTO `{self.shadow}` ({columns}) VALUES ({new_values})"
+		delete = f"DELETE FROM `{self.shadow}` WHERE `name` = OLD.`name`"
+
+		for event, body in (
+			("INSERT", replace),
+			("UPDATE", f"BEGIN {delete}; {replace}; END"),
+			("DELETE", delete),
+		):
+			self.sql_ddl(
+				f"CREATE TRIGGER `{self.triggers[event]}` AFTER {event} ON `{self.table}` FOR EACH ROW {body}"
+			)
+
+	def copy_rows(self):
+		replica = get_replica_db() if self.max_replica_lag is not None else None
+		try:
+			return self.copy_chunks(replica)
+		finally:
+			if replica:
+				replica.close()
+
+	def copy_chunks(self, replica=None):
+		columns = ", ".join(f"`{column}`" for column in self.columns)
+		total = frappe.db.sql(f"select count(*) from `{self.table}`")[0][0]
+		copied = 0
+		last = None
+
+		while True:
+			keys = frappe.db.sql(
+				f"""select `name` from `{self.table}`
+				{"where `name` > %(last)s" if last is not None else ""}
+				order by `name` limit %(limit)s""",
+				{"last": last, "limit": self.chunk_size},
+				pluck=True,
+			)
+			if not keys:
+				if copied:
+					# print the progress bar on its own line
+					print()
+				return copied
+
+			frappe.db.sql(
+				f"""insert ignore into `{self.shadow}` ({columns})
+				select {columns} from `{self.table}`
+				where `name` >= %(first)s and `name` <= %(last)s
+				lock in share mode""",
+				{"first": keys[0], "last": keys[-1]},
+			)
+			frappe.db.commit()
+
+			copied += len(keys)
+			last = keys[-1]
+			update_progress_bar(f"Copying {self.table}", copied - 1, max(total, copied))
+
+			if self.on_chunk:
+				self.on_chunk(copied)
+			if self.sleep:
+				time.sleep(self.sleep)
+			if replica:
+				wait_for_replica(replica, self.max_replica_lag)
+
+	def check_rows(self):
+		rows = frappe.db.sql(f"select count(*) from `{self.table}`")[0][0]
+		copied = frappe.db.sql(f"select count(*) from `{self.shadow}`")[0][0]
+		if copied < rows:
+			frappe.throw(
+				f"Online alter of {self.table} copied {copied} of {rows} rows, "
+				"a changed unique index probably rejected duplicates"
+			)
+
+	def cleanup(self):
+		for trigger in self.triggers.values():
+			self.sql_ddl(f"DROP TRIGGER IF EXISTS `{trigger}`")
+		self.sql_ddl(f"DROP TABLE IF EXISTS `{self.shadow}`")
+		self.sql_ddl(f"DROP TABLE IF EXISTS `{self.old}`")
+
+
+def get_columns(table):
+	return frappe.db.sql(
+		"""select column_name from information_schema.columns
+		where table_schema = database() and table_name = %s
+		order by ordinal_position""",
+		table,
+		pluck=True,
+	)
+
+
+def has_name_key(table):
+	"""Only tables keyed on `name`, like every DocType table, can be copied in chunks"""
+	return bool(
+		frappe.db.sql(
+			"""select 1 from information_schema.key_column_usage
+			where table_schema = database() and table_name = %s
+			and constraint_name = 'PRIMARY' and column_name = 'name'""",
+			table,
+		)
+	)
@@ -0,0 +1,85 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Split of a migration into an offline window and an online phase.
+
+	`migrate-x --phase offline` only runs the work the site cannot serve
+	requests without: before_migrate hooks, pre model sync patches, DocType
+	sync, post model sync patches that are not online safe, customizations
+	and scheduled jobs. The apps it migrated are kept in
+	`sites/[site]/migrate_x/online_phase.json` until `migrate-x --phase online`
+	runs the rest with the site up.
+
+	Online safe are the steps of `ONLINE_STEPS`, the post model sync patches
+	listed in the `migrate_x_online_patches` hook and the steps listed in the
+	`migrate_x_online_steps` hook of an app, e.g. in its hooks.py:
+
+		migrate_x_online_patches = ["myapp.patches.v2_0.backfill_totals"]
+		migrate_x_online_steps = ["update_versions"]
+
+	after_migrate hooks expect the fixtures to be synced, they always run at
+	the end of the online phase.
+"""
+import click
+import frappe
+from frappe.utils import now
+
+from frappe_migrate_x.overrides.customization.migrate_state import clear_state, load_state, save_state
+
+ONLINE_PHASE = "online_phase"
+PHASES = ("offline", "online")
+# step names as in the checkpoint, without the app
+ONLINE_STEPS = ("sync_fixtures", "sync_dashboards", "sync_languages", "sync_portal_menu")
+# steps starting with these run after the online steps they depend on
+ONLINE_STEP_PREFIXES = ("after_migrate:",)
+
+
+def get_online_patches():
+	return set(frappe.get_hooks("migrate_x_online_patches"))
+
+
+def get_online_steps():
+	return set(ONLINE_STEPS) | set(frappe.get_hooks("migrate_x_online_steps"))
+
+
+def is_online_step(step, online_steps):
+	return step in online_steps or step.startswith(ONLINE_STEP_PREFIXES)
+
+
+def is_online_patch(patch, online_patches):
+	# `finally:` patches are queued by the patch that runs them
+	return patch.replace("finally:", "") in online_patches
+
+
+def defer_online_phase(apps, offline_seconds):
+	"""Keep the work of `apps` for the online phase, with the apps of an online
+	phase that did not run yet"""
+	pending = load_state(ONLINE_PHASE)
+	pending_apps = pending.get("apps") or []
+
+	save_state(
+		ONLINE_PHASE,
+		dict(
+			apps=pending_apps + [app for app in apps if app not in pending_apps],
+			offline_seconds=round(offline_seconds, 3),
+			offline_finished_at=now(),
+		),
+	)
+	click.secho(
+		f"Offline window took {offline_seconds:.2f}s, finish the migration with the site up:\n"
+		f"  bench --site {frappe.local.site} migrate-x --phase online",
+		fg="yellow",
+	)
+
+
+def get_deferred_online_phase():
+	return load_state(ONLINE_PHASE)
+
+
+def finish_online_phase(pending, online_seconds):
+	clear_state(ONLINE_PHASE)
+	click.secho(
+		f"Offline window took {pending.get('offline_seconds', 0):.2f}s,"
+		f" online phase {online_seconds:.2f}s",
+		fg="yellow",
+	)
@@ -0,0 +1,74 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Parse and diff DocType JSON files in worker processes.
+
+	Reading, hashing and parsing the files of an app is CPU bound. With
+	`--parse-jobs`, `sync_for` hands the pending files to a pool of worker
+	processes, which compare every DocType file with a snapshot of the
+	`migration_hash` of all doctypes, the same check `import_file_by_path`
+	does. Results stream back in file order while the main process keeps
+	importing the files that need it over its single database connection.
+
+	Files with other documents (Report, Page, Workspace ...) are left for
+	`import_file_by_path` to decide, it compares their `modified` with the
+	database.
+
+	Workers are started by a forkserver, not forked from the migrating process:
+	with `--app-jobs` the pool is created from a thread, and a fork would copy
+	the locks and database connections other threads hold. A worker only needs
+	the doctype hashes it is initialized with, no site or connection.
+"""
+import contextlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import frappe
+from frappe.modules.import_file import calculate_hash, read_doc_from_file
+
+PARSE_CHUNK_SIZE = 20
+
+# migration hash of every doctype, set in each worker process
+doctype_hashes = {}
+
+
+def init_worker(hashes):
+	global doctype_hashes
+	doctype_hashes = hashes
+
+
+def diff_doc_file(path):
+	"""Return the hash of the file at `path` and whether it needs to be
+	imported, `None` when only the database can tell"""
+	if not os.path.exists(path):
+		return None, None
+
+	file_hash = calculate_hash(path)
+	docs = read_doc_from_file(path)
+	if not isinstance(docs, list):
+		docs = [docs]
+
+	if not all(doc.get("doctype") == "DocType" for doc in docs):
+		return file_hash, None
+
+	return file_hash, any(doctype_hashes.get(doc.get("name")) != file_hash for doc in docs)
+
+
+@contextlib.contextmanager
+def parse_pool(jobs):
+	hashes = {d.name: d.migration_hash for d in frappe.get_all("DocType", fields=["name", "migration_hash"])}
+
+	with ProcessPoolExecutor(
+		max_workers=jobs,
+		mp_context=multiprocessing.get_context("forkserver"),
+		initializer=init_worker,
+		initargs=(hashes,),
+	) as executor:
+		yield executor
+
+
+def diff_doc_files(executor, paths):
+	"""Yield `(path, file_hash, needs_import)` in the order of `paths` as workers finish them"""
+	results = executor.map(diff_doc_file, paths, chunksize=PARSE_CHUNK_SIZE)
+	yield from ((path, *result) for path, result in zip(paths, results))
@@ -0,0 +1,145 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Cost of every patch run and ETA of the pending patches.
+
+	`measure_patch` records the rows a patch wrote (delta of the session
+	`Handler_write/update/delete` counters on MariaDB) and the largest table it
+	wrote to with its row count. Together with the wall time this is kept in
+	the patch history of the site (see `custom_patch_handler.PATCH_HISTORY`).
+	`PatchETA` prints the expected remaining time before each patch and
+	`export_patch_history` flattens the history of all sites of the bench.
+"""
+import contextlib
+import csv
+import io
+import json
+
+import click
+import frappe
+
+from frappe_migrate_x.overrides.customization.migration_report import sql_profiler_paused
+
+HANDLER_COUNTERS = ("Handler_write", "Handler_update", "Handler_delete")
+EXPORT_FIELDS = (
+	"site",
+	"patch",
+	"runs",
+	"last_seconds",
+	"max_seconds",
+	"last_rows",
+	"table",
+	"table_rows",
+	"last_run_at",
+)
+
+
+def get_handler_counters():
+	if frappe.db.db_type != "mariadb":
+		return None
+
+	return {
+		row[0]: int(row[1]) for row in frappe.db.sql("show session status like %s", "Handler_%")
+	}
+
+
+def get_table_rows(tables):
+	"""Approximate row count of `tables`, as known to the storage engine"""
+	if not tables or frappe.db.db_type != "mariadb":
+		return {}
+
+	return dict(
+		frappe.db.sql(
+			"""select table_name, table_rows from information_schema.tables
+			where table_schema = database() and table_name in %(tables)s""",
+			{"tables": list(tables)},
+		)
+	)
+
+
+@contextlib.contextmanager
+def measure_patch():
+	"""Yield a dict that holds `rows` and `table`/`table_rows` once the patch ran"""
+	stats = {}
+	with sql_profiler_paused():
+		before = get_handler_counters()
+
+	# collect the tables written by this patch only, frappe logs them while migrating
+	migration_tables = frappe.flags.touched_tables
+	patch_tables = frappe.flags.touched_tables = set()
+	try:
+		yield stats
+	finally:
+		frappe.flags.touched_tables = migration_tables
+		if migration_tables is not None:
+			migration_tables.update(patch_tables)
+
+	with contextlib.suppress(Exception), sql_profiler_paused():
+		# never fail a patch that ran because its statistics could not be read
+		after = get_handler_counters()
+		if before and after:
+			stats["rows"] = sum(after.get(name, 0) - before.get(name, 0) for name in HANDLER_COUNTERS)
+
+		table_rows = get_table_rows(patch_tables)
+		if table_rows:
+			stats["table"] = max(table_rows, key=lambda table: table_rows[table] or 0)
+			stats["table_rows"] = table_rows[stats["table"]]
+
+
+class PatchETA:
+	"""Expected remaining time of the pending patches, `estimates` being
+	`{patch: seconds or None}` in execution order"""
+
+	def __init__(self, estimates) -> None:
+		self.estimates = estimates
+		self.remaining = list(estimates)
+
+	def start(self, patch):
+		position = len(self.estimates) - len(self.remaining) + 1
+		if patch in self.remaining:
+			self.remaining.remove(patch)
+
+		estimate = self.estimates.get(patch)
+		remaining = [self.estimates[p] for p in self.remaining]
+		known = sum(seconds for seconds in remaining if seconds is not None)
+		unknown = len([seconds for seconds in remaining if seconds is None])
+
+		click.secho(
+			f"[{position}/{len(self.estimates)}] {patch}"
+			f" ({'no history' if estimate is None else f'~{estimate:.1f}s'},"
+			f" then ~{known:.0f}s{f' + {unknown} without history' if unknown else ''})",
+			fg="cyan",
+		)
+
+
+def export_patch_history(history_by_site, output_format="csv"):
+	"""One row per site and patch with the cost of its last and slowest run"""
+	rows = []
+	for site, history in sorted(history_by_site.items()):
+		for patch, runs in sorted(history.items()):
+			if not runs:
+				continue
+
+			last = runs[-1]
+			rows.append(
+				dict(
+					site=site,
+					patch=patch,
+					runs=len(runs),
+					last_seconds=last["seconds"],
+					max_seconds=max(run["seconds"] for run in runs),
+					last_rows=last.get("rows"),
+					table=last.get("table"),
+					table_rows=last.get("table_rows"),
+					last_run_at=last["at"],
+				)
+			)
+
+	if output_format == "json":
+		return json.dumps(rows, indent=1, default=str)
+
+	out = io.StringIO()
+	writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+	writer.writeheader()
+	writer.writerows(rows)
+	return out.getvalue()
@@ -0,0 +1,184 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Incremental website search index update after a migration.
+
+	Instead of rebuilding the index of every route, only the routes that
+	changed during the migration are indexed again:
+
+	- documents of web view doctypes (Web Page, Web Form, Blog Post ...)
+	  modified since the migration started
+	- www pages of the migrated apps whose files changed since the last
+	  migration, tracked in `sites/[site]/migrate_x/www_manifest.json`. The
+	  job saves the manifest once the routes are indexed, routes of a failed
+	  job are found again by the next migration
+
+	`update_search_index` runs as a background job on the long queue and
+	commits the index every `SEARCH_INDEX_BATCH` routes, the segments are
+	merged once at the end. Routes of removed www files and of web view
+	documents deleted during the migration (found in Deleted Document) are
+	removed from the index by path, as are routes that do not render anymore.
+	A site without an index gets a full rebuild.
+"""
+import os
+
+import click
+import frappe
+from frappe.search.website_search import INDEX_NAME, WebsiteSearch, build_index_for_all_routes
+
+from frappe_migrate_x.overrides.customization.migrate_state import ContentManifest
+
+WWW_MANIFEST = "www_manifest"
+SEARCH_INDEX_BATCH = 100
+WWW_EXTENSIONS = (".html", ".md", ".py")
+WEB_ROUTE_DOCTYPES = ("Web Page", "Web Form", "Blog Post", "Help Article")
+
+
+def get_www_route(www_path, path):
+	route = os.path.splitext(os.path.relpath(path, www_path))[0]
+	if os.path.basename(route) == "index":
+		route = os.path.dirname(route)
+	return route
+
+
+def get_changed_www_routes(apps):
+	"""Routes of the www files of `apps` added or changed and routes of the
+	files removed since the last indexed migration, and the unsaved changes of
+	the manifest"""
+	manifest = ContentManifest(WWW_MANIFEST)
+	routes = set()
+	deleted_routes = set()
+
+	for app in apps:
+		www_path = frappe.get_app_path(app, "www")
+		seen = set()
+		for root, _, names in os.walk(www_path):
+			for name in names:
+				if not name.endswith(WWW_EXTENSIONS) or name == "__init__.py":
+					continue
+
+				path = os.path.join(root, name)
+				seen.add(manifest.get_key(app, path))
+				if not manifest.is_unchanged(app, path):
+					manifest.record(app, path)
+					routes.add(get_www_route(www_path, path))
+
+		for key in set(manifest.entries.get(app, {})) - seen:
+			# removed since the last migration
+			path = os.path.join(frappe.get_app_path(app), key)
+			manifest.forget(app, path)
+			deleted_routes.add(get_www_route(www_path, path))
+
+	return routes, deleted_routes, manifest.changes
+
+
+def get_web_route_doctypes():
+	return set(WEB_ROUTE_DOCTYPES) | set(
+		frappe.get_all("DocType", {"has_web_view": 1, "istable": 0, "issingle": 0}, pluck="name")
+	)
+
+
+def get_changed_doc_routes(doctypes, since):
+	"""Routes of the web view documents modified since `since`"""
+	routes = set()
+	for doctype in doctypes:
+		if not frappe.db.table_exists(doctype) or not frappe.db.has_column(doctype, "route"):
+			continue
+
+		routes.update(
+			route
+			for route in frappe.get_all(doctype, {"modified": (">=", since)}, pluck="route")
+			if route
+		)
+
+	return routes
+
+
+def get_deleted_doc_routes(doctypes, since):
+	"""Routes of the web view documents deleted since `since`"""
+	routes = set()
+	for data in frappe.get_all(
+		"Deleted Document",
+		{"deleted_doctype": ("in", list(doctypes)), "creation": (">=", since)},
+		pluck="data",
+	):
+		route = frappe.parse_json(data).get("route")
+		if route:
+			routes.add(route)
+
+	return routes
+
+
+def queue_search_index_update(apps, since):
+	"""Enqueue the index update of the routes changed by the migration of `apps`
+	that started at `since`"""
+	www_routes, www_deleted_routes, www_changes = get_changed_www_routes(apps)
+	doctypes = get_web_route_doctypes()
+	routes = www_routes | get_changed_doc_routes(doctypes, since)
+	# a route deleted and served again by another file or document is indexed again
+	deleted_routes = sorted((www_deleted_routes | get_deleted_doc_routes(doctypes, since)) - routes)
+	routes = sorted(routes)
+	if not routes and not deleted_routes:
+		click.secho("No web route changed, search index is up to date", fg="blue")
+		return
+
+	frappe.enqueue(
+		"frappe_migrate_x.overrides.customization.search_index.update_search_index",
+		queue="long",
+		routes=routes,
+		deleted_routes=deleted_routes,
+		www_changes=www_changes,
+	)
+	click.secho(
+		f"Queued indexing of {len(routes)} changed and removal of {len(deleted_routes)} deleted web routes"
+		f" for {frappe.local.site}",
+		fg="blue",
+	)
+
+
+def update_search_index(routes, deleted_routes=None, www_changes=None, batch_size=SEARCH_INDEX_BATCH):
+	"""Index `routes` again and remove `deleted_routes`, then record the www
+	files they came from"""
+	search = WebsiteSearch(INDEX_NAME)
+	if os.path.exists(search.index_path):
+		index_routes(search, routes, deleted_routes, batch_size)
+	else:
+		build_index_for_all_routes()
+
+	if www_changes:
+		manifest = ContentManifest(WWW_MANIFEST)
+		manifest.changes = www_changes
+		manifest.save()
+
+
+def index_routes(search, routes, deleted_routes=None, batch_size=SEARCH_INDEX_BATCH):
+	from whoosh.writing import AsyncWriter
+
+	index = search.get_index()
+	if deleted_routes:
+		writer = AsyncWriter(index)
+		for route in deleted_routes:
+			writer.delete_by_term(search.id, route)
+		writer.commit()
+
+	for start in range(0, len(routes), batch_size):
+		with index.searcher():
+			writer = AsyncWriter(index)
+			for route in routes[start : start + batch_size]:
+				writer.delete_by_term(search.id, route)
+				document = get_document_to_index(search, route)
+				if document:
+					writer.add_document(**document)
+
+			# every batch adds a segment, they are merged once below
+			writer.commit()
+
+	AsyncWriter(index).commit(optimize=True)
+
+
+def get_document_to_index(search, route):
+	try:
+		return search.get_document_to_index(route)
+	except Exception:
+		# removed or unpublished routes do not render, they stay out of the index
+		return None
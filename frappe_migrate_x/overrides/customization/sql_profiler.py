@@ -0,0 +1,153 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	SQL profile of every patch and DocType import of a migration.
+
+	With `--profile-sql`, `frappe.db.sql` of the migration connection (and of
+	the `--app-jobs` worker connections) is wrapped by a `SQLProfiler`. Queries
+	sent while an item is timed (see `migration_report.item_timer`) are
+	normalized, literals and IN lists replaced by `?`, and counted per item
+	with their total time and the rows they examined (delta of the session
+	`Handler_read_*` counters on MariaDB, read around every query).
+
+	A normalized statement sent at least `N_PLUS_ONE_COUNT` times by one item
+	is flagged as an N+1 pattern. The top statements of the slowest items are
+	written to the migration report. Without `--profile-sql` nothing is
+	wrapped and queries cost nothing more.
+"""
+import contextlib
+import re
+import threading
+import time
+
+N_PLUS_ONE_COUNT = 20
+TOP_ITEMS = 20
+TOP_STATEMENTS = 5
+
+LITERAL_PATTERNS = (
+	(re.compile(r"'(?:[^'\\]|\\.|'')*'"), "?"),
+	(re.compile(r'"(?:[^"\\]|\\.)*"'), "?"),
+	(re.compile(r"%\(\w+\)s|%s"), "?"),
+	(re.compile(r"(?<![\w`])-?\d+(?:\.\d+)?(?![\w`])"), "?"),
+	(re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?+)"),
+	(re.compile(r"\s+"), " "),
+)
+
+
+def normalize_query(query):
+	"""Statement of `query` without its values, `name = 'x'` and `name = 'y'`
+	normalize to the same statement"""
+	query = str(query)
+	for pattern, replacement in LITERAL_PATTERNS:
+		query = pattern.sub(replacement, query)
+	return query.strip().lower()
+
+
+class SQLProfiler:
+	def __init__(self) -> None:
+		# {(kind, name): {statement: [count, seconds, rows examined]}}
+		self.items = {}
+		self.lock = threading.Lock()
+		self.local = threading.local()
+		self.installed = []
+
+	def install(self, db):
+		"""Profile the queries of the connection `db`"""
+		sql = db.sql
+		overhead = None
+		if db.db_type == "mariadb":
+			# reading the counters reads rows as well
+			first = get_rows_read(sql)
+			overhead = get_rows_read(sql) - first
+
+		def profiled_sql(query, *args, **kwargs):
+			return self.run(sql, overhead, query, *args, **kwargs)
+
+		db.sql = profiled_sql
+		self.installed.append((db, sql))
+
+	def uninstall(self):
+		for db, sql in self.installed:
+			db.sql = sql
+		self.installed = []
+
+	@contextlib.contextmanager
+	def item(self, kind, name):
+		previous = getattr(self.local, "item", None)
+		self.local.item = (kind, name)
+		try:
+			yield
+		finally:
+			self.local.item = previous
+
+	@contextlib.contextmanager
+	def paused(self):
+		"""Queries of migrate-x itself, e.g. the counters read around a patch,
+		are not counted for the item being timed"""
+		previous = getattr(self.local, "item", None)
+		self.local.item = None
+		try:
+			yield
+		finally:
+			self.local.item = previous
+
+	def run(self, sql, overhead, query, *args, **kwargs):
+		item = getattr(self.local, "item", None)
+		if item is None:
+			return sql(query, *args, **kwargs)
+
+		before = get_rows_read(sql) if overhead is not None else None
+		start = time.perf_counter()
+		try:
+			return sql(query, *args, **kwargs)
+		finally:
+			seconds = time.perf_counter() - start
+			rows = 0
+			# the error of a query on a lost connection must not be replaced
+			with contextlib.suppress(Exception):
+				if before is not None:
+					rows = get_rows_read(sql) - before - overhead
+			self.record(item, normalize_query(query), seconds, rows)
+
+	def record(self, item, statement, seconds, rows):
+		with self.lock:
+			stats = self.items.setdefault(item, {}).setdefault(statement, [0, 0.0, 0])
+			stats[0] += 1
+			stats[1] += seconds
+			stats[2] += max(rows, 0)
+
+	def get_profile(self, top_items=TOP_ITEMS, top_statements=TOP_STATEMENTS):
+		"""The `top_items` items that spent most time in queries, with their
+		`top_statements` statements, and every N+1 pattern"""
+		profile = []
+		n_plus_one = []
+		for (kind, name), statements in self.items.items():
+			entries = [
+				dict(
+					statement=statement,
+					count=count,
+					seconds=round(seconds, 4),
+					rows_examined=rows,
+					n_plus_one=count >= N_PLUS_ONE_COUNT,
+				)
+				for statement, (count, seconds, rows) in statements.items()
+			]
+			entries.sort(key=lambda entry: entry["seconds"], reverse=True)
+			profile.append(
+				dict(
+					kind=kind,
+					name=name,
+					queries=sum(entry["count"] for entry in entries),
+					seconds=round(sum(entry["seconds"] for entry in entries), 4),
+					top=entries[:top_statements],
+				)
+			)
+			n_plus_one.extend(dict(kind=kind, name=name, **entry) for entry in entries if entry["n_plus_one"])
+
+		profile.sort(key=lambda item: item["seconds"], reverse=True)
+		n_plus_one.sort(key=lambda entry: entry["count"], reverse=True)
+		return dict(items=profile[:top_items], n_plus_one=n_plus_one)
+
+
+def get_rows_read(sql):
+	return sum(int(row[1]) for row in sql("show session status like %s", "Handler\\_read%"))
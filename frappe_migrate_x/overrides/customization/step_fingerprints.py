@@ -0,0 +1,81 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Fingerprints of the inputs of the site wide post_schema_updates steps.
+
+	`sync_jobs`, `sync_languages`, `sync_portal_menu` and `update_versions` only
+	depend on hooks, the language master file and app versions. Their
+	fingerprint is compared with the one stored by the last migration of the
+	site and the step is skipped when nothing changed.
+"""
+import hashlib
+import json
+import os
+
+import frappe
+from frappe.modules.import_file import calculate_hash
+
+from frappe_migrate_x.overrides.customization.app_fingerprint import get_git_commit
+from frappe_migrate_x.overrides.customization.migrate_state import load_state, save_state
+
+STEP_FINGERPRINTS = "step_fingerprints"
+
+
+def get_scheduler_events():
+	return frappe.get_hooks("scheduler_events")
+
+
+def get_language_file():
+	path = frappe.get_app_path("frappe", "geo", "languages.json")
+	return calculate_hash(path) if os.path.exists(path) else None
+
+
+def get_portal_menu_hooks():
+	return frappe.get_hooks("standard_portal_menu_items")
+
+
+def get_app_versions():
+	"""Version and checked out commit of every installed app, without running git"""
+	versions = {}
+	for app in frappe.get_installed_apps():
+		# the commit, a pull on the checked out branch does not change `.git/HEAD`
+		versions[app] = dict(
+			version=getattr(frappe.get_module(app), "__version__", None), ref=get_git_commit(app)
+		)
+
+	return versions
+
+
+STEP_INPUTS = {
+	"sync_jobs": get_scheduler_events,
+	"sync_languages": get_language_file,
+	"sync_portal_menu": get_portal_menu_hooks,
+	"update_versions": get_app_versions,
+}
+
+
+def get_fingerprint(step):
+	data = json.dumps(STEP_INPUTS[step](), sort_keys=True, default=str)
+	return hashlib.md5(data.encode()).hexdigest()
+
+
+class StepFingerprints:
+	def __init__(self) -> None:
+		self.stored = load_state(STEP_FINGERPRINTS)
+		self.pending = {}
+
+	def is_unchanged(self, step):
+		"""Compute the fingerprint of `step`, kept until `save` when it changed"""
+		fingerprint = get_fingerprint(step)
+		if self.stored.get(step) == fingerprint:
+			return True
+
+		self.pending[step] = fingerprint
+		return False
+
+	def save(self):
+		"""Store the fingerprints of the steps that ran, once their changes are committed"""
+		if self.pending:
+			self.stored.update(self.pending)
+			self.pending = {}
+			save_state(STEP_FINGERPRINTS, self.stored)
@@ -0,0 +1,130 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Scoped cache invalidation after a DocType sync.
+
+	`SyncScope` collects the doctypes, documents and modules imported by
+	`sync_for`. `clear_scoped_cache` then only drops the cache entries of those
+	(and of the doctypes embedding the touched child tables), instead of
+	`frappe.clear_cache()` wiping the meta, boot info and website cache of the
+	whole site. The keys frappe's per doctype and per document invalidation
+	would delete one call at a time are collected and deleted in one redis
+	pipeline.
+
+	Every scope of a migration is also merged into `frappe.flags.migrate_x_touched`
+	for the phases that run after the sync.
+"""
+import frappe
+from frappe.cache_manager import clear_controller_cache, doctype_cache_keys, reset_metadata_version
+from frappe.model import table_fields
+from frappe.modules.import_file import read_doc_from_file
+from frappe.website.utils import clear_website_cache
+
+# documents of these doctypes are part of the boot info of every user
+BOOT_DOCTYPES = ("Workspace", "Page", "Report", "Module Def", "Module Onboarding", "Onboarding Step")
+WEBSITE_DOCTYPES = ("Web Page", "Web Form", "Web Template", "Website Theme")
+# global keys that map doctypes to modules and tables
+GLOBAL_CACHE_KEYS = ("is_table", "doctype_modules")
+# global keys derived from the code of the apps, stale once new code is deployed
+CODE_CACHE_KEYS = ("app_hooks", "installed_app_modules", "app_modules", "module_app", *GLOBAL_CACHE_KEYS)
+
+
+class SyncScope:
+	def __init__(self) -> None:
+		self.doctypes = set()
+		self.documents = set()
+		self.modules = set()
+
+	def track(self, path):
+		"""Remember what the DocType JSON at `path` contains"""
+		docs = read_doc_from_file(path)
+		if not isinstance(docs, list):
+			docs = [docs]
+
+		for doc in docs:
+			self.documents.add((doc.get("doctype"), doc.get("name")))
+			if doc.get("doctype") == "DocType":
+				self.doctypes.add(doc.get("name"))
+			if doc.get("module"):
+				self.modules.add(doc.get("module"))
+
+	def __bool__(self):
+		return bool(self.documents)
+
+
+def get_touched() -> SyncScope:
+	"""Everything synced so far in this migration"""
+	if frappe.flags.migrate_x_touched is None:
+		frappe.flags.migrate_x_touched = SyncScope()
+	return frappe.flags.migrate_x_touched
+
+
+def merge_touched(scope: SyncScope) -> None:
+	touched = get_touched()
+	touched.doctypes |= scope.doctypes
+	touched.documents |= scope.documents
+	touched.modules |= scope.modules
+
+
+def get_parent_doctypes(doctypes):
+	"""Doctypes whose meta embeds one of `doctypes` as a child table"""
+	if not doctypes:
+		return set()
+
+	filters = {"fieldtype": ("in", table_fields), "options": ("in", list(doctypes))}
+	parents = set(frappe.get_all("DocField", filters=filters, pluck="parent", distinct=True))
+	parents |= set(
+		frappe.get_all(
+			"Custom Field",
+			filters={"fieldtype": ("in", table_fields), "options": ("in", list(doctypes))},
+			pluck="dt",
+			distinct=True,
+		)
+	)
+	return parents
+
+
+def clear_code_cache() -> None:
+	"""Drop what is cached from the hooks and modules of the apps, the meta and
+	documents in the cache still match the database until they are synced"""
+	frappe.cache.delete_value(list(CODE_CACHE_KEYS))
+	if getattr(frappe.local, "cache", None):
+		frappe.local.cache = {}
+	frappe.setup_module_map()
+
+
+def clear_scoped_cache(scope: SyncScope) -> None:
+	"""What `frappe.clear_cache(doctype=)` and `frappe.clear_document_cache`
+	drop for every synced doctype and document, in one round trip"""
+	if not scope:
+		return
+
+	doctypes = scope.doctypes | get_parent_doctypes(scope.doctypes)
+	keys = list(GLOBAL_CACHE_KEYS)
+	keys += [frappe.get_document_cache_key(doctype, name) for doctype, name in scope.documents]
+	keys += [f"notification_count:{doctype}" for doctype in doctypes]
+	if any(doctype in BOOT_DOCTYPES for doctype, _ in scope.documents):
+		keys.append("bootinfo")
+
+	local_cache = getattr(frappe.local, "cache", None) or {}
+	pipeline = frappe.cache.pipeline()
+	if doctypes:
+		for name in doctype_cache_keys:
+			cache_key = frappe.cache.make_key(name)
+			for doctype in doctypes:
+				local_cache.get(cache_key, {}).pop(doctype, None)
+			pipeline.hdel(cache_key, *doctypes)
+
+	cache_keys = [frappe.cache.make_key(key) for key in keys]
+	for cache_key in cache_keys:
+		local_cache.pop(cache_key, None)
+	pipeline.unlink(*cache_keys)
+	pipeline.execute()
+
+	for doctype in doctypes:
+		clear_controller_cache(doctype)
+	if scope.doctypes:
+		reset_metadata_version()
+
+	if any(doctype in WEBSITE_DOCTYPES for doctype, _ in scope.documents):
+		clear_website_cache()
@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization.alter_batch import ALGORITHM_NOT_SUPPORTED, AlterBatch
+
+
+class AlterDB:
+    """Runs nothing, records the statements an `AlterBatch` sends"""
+
+    def __init__(self, unsupported=(), failing_tables=()):
+        self.statements = []
+        self.indexes = []
+        # algorithms MariaDB refuses, tables whose ALTER fails
+        self.unsupported = unsupported
+        self.failing_tables = failing_tables
+
+    def sql_ddl(self, query, *args, **kwargs):
+        if any(f"`{table}`" in query for table in self.failing_tables) and query.startswith("ALTER"):
+            raise Exception(1072, "Key column doesn't exist in table")
+        for algorithm in self.unsupported:
+            if f"ALGORITHM={algorithm}" in query:
+                raise Exception(ALGORITHM_NOT_SUPPORTED[0], "ALGORITHM is not supported")
+        self.statements.append(query)
+
+    def add_index(self, doctype, fields, index_name=None):
+        # the index needs the columns of the pending ALTER
+        self.indexes.append((doctype, list(self.statements)))
+
+    def add_unique(self, doctype, fields, constraint_name=None):
+        self.indexes.append((doctype, list(self.statements)))
+
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_alter_batch"""
+class TestAlterBatch(FrappeTestCase):
+
+    def run_batch(self, db, statements, on_failure=None):
+        with patch.object(frappe, "db", db), patch.object(frappe, "cache", MagicMock()):
+            with AlterBatch() as batch:
+                for source, query in statements:
+                    batch.source = source
+                    frappe.db.sql_ddl(query)
+                self.assertEqual(db.statements, [])
+                batch.flush(on_failure=on_failure)
+        return batch
+
+    def test_collect_and_flush_one_alter_per_table(self):
+        db = AlterDB()
+        calls = []
+        with patch.object(frappe, "db", db), patch.object(frappe, "cache", MagicMock()):
+            with AlterBatch() as batch:
+                frappe.db.sql_ddl("create table `tabNew` (name varchar(140))")
+                frappe.db.sql_ddl("alter table `tabA` add column `x` int")
+                frappe.db.sql_ddl("alter table `tabB` add column `y` int")
+                frappe.db.sql_ddl("alter table `tabA` add index `x_index`(`x`);")
+                batch.on_flush.append(lambda: calls.append("flushed"))
+                batch.flush()
+
+        self.assertEqual(
+            db.statements,
+            [
+                "create table `tabNew` (name varchar(140))",
+                "ALTER TABLE `tabA` add column `x` int, add index `x_index`(`x`), ALGORITHM=INSTANT",
+                "ALTER TABLE `tabB` add column `y` int, ALGORITHM=INSTANT",
+            ],
+        )
+        self.assertEqual(calls, ["flushed"])
+        self.assertEqual(db.sql_ddl, batch.sql_ddl)
+
+    def test_algorithm_fallback(self):
+        db = AlterDB(unsupported=("INSTANT",))
+        self.run_batch(db, [("a.json", "alter table `tabA` add index `x_index`(`x`)")])
+        self.assertEqual(db.statements, ["ALTER TABLE `tabA` add index `x_index`(`x`), ALGORITHM=INPLACE"])
+
+        db = AlterDB(unsupported=("INSTANT", "INPLACE"))
+        self.run_batch(db, [("a.json", "alter table `tabA` modify `x` bigint")])
+        self.assertEqual(db.statements, ["ALTER TABLE `tabA` modify `x` bigint"])
+
+    def test_failing_table_resets_its_sources_and_the_following_ones(self):
+        db = AlterDB(failing_tables=("tabB",))
+        reset = []
+        with self.assertRaises(Exception):
+            self.run_batch(
+                db,
+                [
+                    ("a.json", "alter table `tabA` add column `x` int"),
+                    ("b.json", "alter table `tabB` add column `y` int"),
+                    ("c.json", "alter table `tabC` add column `z` int"),
+                ],
+                on_failure=reset.append,
+            )
+
+        self.assertEqual(reset, [{"b.json", "c.json"}])
+
+    def test_pending_alter_runs_before_an_index_of_the_table(self):
+        db = AlterDB()
+        with patch.object(frappe, "db", db), patch.object(frappe, "cache", MagicMock()):
+            with AlterBatch() as batch:
+                frappe.db.sql_ddl("alter table `tabA` add column `x` int")
+                frappe.db.sql_ddl("alter table `tabB` add column `y` int")
+                # what an `on_doctype_update` hook does
+                frappe.db.add_index("A", ["x"])
+                self.assertEqual(list(batch.pending), ["tabB"])
+                batch.flush()
+
+        self.assertEqual(db.indexes, [("A", ["ALTER TABLE `tabA` add column `x` int, ALGORITHM=INSTANT"])])
+        self.assertEqual(len(db.statements), 2)
+
+    def test_online_alter_is_throttled(self):
+        from frappe_migrate_x.overrides.customization import alter_batch
+
+        db = AlterDB()
+        with patch.object(frappe, "db", db), patch.object(frappe, "cache", MagicMock()), patch.object(
+            AlterBatch, "is_online", return_value=True
+        ), patch.object(alter_batch, "OnlineSchemaChange") as online_schema_change:
+            with AlterBatch(online_rows=1000, online_sleep=0.5, online_max_replica_lag=10) as batch:
+                frappe.db.sql_ddl("alter table `tabA` add column `x` int")
+                batch.flush()
+
+        online_schema_change.assert_called_once_with(
+            "tabA", "add column `x` int", sleep=0.5, max_replica_lag=10, sql_ddl=db.sql_ddl
+        )
+        online_schema_change.return_value.run.assert_called_once_with()
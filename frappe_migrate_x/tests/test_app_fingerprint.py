@@ -0,0 +1,101 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import app_fingerprint
+from frappe_migrate_x.overrides.customization.app_fingerprint import (
+    APP_FINGERPRINTS,
+    get_app_fingerprints,
+    get_changed_apps,
+    get_git_commit,
+    record_app_fingerprints,
+)
+from frappe_migrate_x.overrides.customization.migrate_state import clear_state
+
+APP = "fingerprint_app"
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_app_fingerprint"""
+class TestAppFingerprint(FrappeTestCase):
+
+    def setUp(self):
+        clear_state(APP_FINGERPRINTS)
+        self.folder = tempfile.TemporaryDirectory()
+        self.app_path = os.path.join(self.folder.name, APP, APP)
+        self.doc_file = os.path.join(self.app_path, "module", "doctype", "thing", "thing.json")
+        os.makedirs(os.path.dirname(self.doc_file))
+        os.makedirs(os.path.join(self.app_path, "fixtures"))
+        for path in ("patches.txt", "hooks.py", "fixtures/role.json"):
+            self.write(os.path.join(self.app_path, path), "[]")
+        self.write(self.doc_file, "{}")
+
+        git_path = os.path.join(self.folder.name, APP, ".git")
+        self.write(os.path.join(git_path, "HEAD"), "ref: refs/heads/main\n")
+        self.write(os.path.join(git_path, "packed-refs"), "# pack-refs\naaaa refs/heads/main\n")
+
+        get_app_path = frappe.get_app_path
+
+        def get_test_app_path(app, *path):
+            return os.path.join(self.app_path, *path) if app == APP else get_app_path(app, *path)
+
+        self.patches = [
+            patch("frappe.get_app_path", get_test_app_path),
+            patch.object(app_fingerprint, "get_app_doc_files", lambda app, index=None: [self.doc_file]),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.folder.cleanup()
+        clear_state(APP_FINGERPRINTS)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_git_commit_without_git(self):
+        self.assertEqual(get_git_commit(APP), "aaaa")
+
+        # a loose ref wins over packed-refs, a detached HEAD is the commit itself
+        self.write(os.path.join(self.folder.name, APP, ".git", "refs", "heads", "main"), "bbbb\n")
+        self.assertEqual(get_git_commit(APP), "bbbb")
+        self.write(os.path.join(self.folder.name, APP, ".git", "HEAD"), "cccc\n")
+        self.assertEqual(get_git_commit(APP), "cccc")
+
+    def test_only_changed_apps_are_migrated(self):
+        fingerprints = get_app_fingerprints([APP])
+        self.assertEqual(get_changed_apps(fingerprints), [APP])
+
+        record_app_fingerprints(fingerprints)
+        self.assertEqual(get_changed_apps(get_app_fingerprints([APP])), [])
+
+        # a DocType file written by a checkout
+        stat = os.stat(self.doc_file)
+        os.utime(self.doc_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(get_changed_apps(get_app_fingerprints([APP])), [APP])
+
+    def test_new_commit_changes_the_fingerprint(self):
+        record_app_fingerprints(get_app_fingerprints([APP]))
+        self.write(os.path.join(self.folder.name, APP, ".git", "HEAD"), "dddd\n")
+        self.assertEqual(get_changed_apps(get_app_fingerprints([APP])), [APP])
+
+    def test_explicit_apps_are_migrated_without_changes(self):
+        from frappe_migrate_x.overrides.customization.custom_migrate import SiteMigrationX
+
+        class Started(Exception):
+            pass
+
+        for specific_apps, started in (([], False), ([APP], True)):
+            migration = SiteMigrationX(specific_apps=specific_apps, changed=True)
+            with patch.object(SiteMigrationX, "required_services_running", return_value=True), patch.object(
+                SiteMigrationX, "select_changed_apps", return_value=({}, [])
+            ), patch.object(SiteMigrationX, "create_report", side_effect=Started), patch("frappe.destroy"):
+                if started:
+                    self.assertRaises(Started, migration.run, site=None)
+                else:
+                    self.assertIsNone(migration.run(site=None))
@@ -0,0 +1,69 @@
+import contextlib
+import threading
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import cache_prewarm
+from frappe_migrate_x.overrides.customization.cache_prewarm import prewarm_cache
+from frappe_migrate_x.overrides.customization.sync_cache import SyncScope
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_cache_prewarm"""
+class TestCachePrewarm(FrappeTestCase):
+
+    def setUp(self):
+        self.warmed = []
+        self.lock = threading.Lock()
+        scope = SyncScope()
+        scope.doctypes = {"Note", "Note Item"}
+        self.touched = patch.dict(frappe.flags, {"migrate_x_touched": scope})
+        self.touched.start()
+
+    def tearDown(self):
+        self.touched.stop()
+
+    def get_meta(self, doctype):
+        if doctype == "Broken":
+            raise ValueError("broken meta")
+
+        with self.lock:
+            self.warmed.append(doctype)
+        return frappe._dict(istable=doctype == "Note Item", get_table_fields=lambda: [])
+
+    def prewarm(self, site_connection=None, existing=("Note", "Note Item", "Note Board")):
+        def get_all(doctype, filters, pluck):
+            # only the doctypes that still exist are warmed
+            return [name for name in filters["name"][1] if name in existing]
+
+        with patch.object(cache_prewarm, "get_parent_doctypes", return_value={"Note Board", "Broken", "Deleted"}), patch(
+            "frappe.get_all", side_effect=get_all
+        ), patch.object(
+            cache_prewarm, "site_connection", site_connection or (lambda site, sites_path: contextlib.nullcontext())
+        ), patch(
+            "frappe.get_meta", side_effect=self.get_meta
+        ), patch(
+            "frappe.desk.form.meta.get_meta"
+        ), patch(
+            "frappe.utils.global_search.get_doctypes_with_global_search"
+        ), patch(
+            "frappe.db.rollback"
+        ):
+            return prewarm_cache(workers=2)
+
+    def test_touched_doctypes_and_their_parents_are_warmed(self):
+        self.assertEqual(self.prewarm(), 3)
+        self.assertCountEqual(self.warmed, ["Note", "Note Item", "Note Board"])
+
+    def test_failures_do_not_fail_the_migration(self):
+        self.assertEqual(self.prewarm(existing=("Note", "Broken", "Note Board")), 3)
+        self.assertCountEqual(self.warmed, ["Note", "Note Board"])
+
+        @contextlib.contextmanager
+        def cannot_connect(site, sites_path):
+            raise ConnectionError("site is down")
+            yield
+
+        self.warmed = []
+        self.assertEqual(self.prewarm(site_connection=cannot_connect), 3)
+        self.assertEqual(self.warmed, [])
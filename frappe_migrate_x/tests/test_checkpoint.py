@@ -0,0 +1,84 @@
+import os
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import custom_patch_handler, custom_sync
+from frappe_migrate_x.overrides.customization.checkpoint import CHECKPOINT, Checkpoint
+from frappe_migrate_x.overrides.customization.custom_migrate import SiteMigrationX
+from frappe_migrate_x.overrides.customization.migrate_state import clear_state
+
+APPS = ["frappe_migrate_x"]
+
+
+def fail_once(name, calls):
+    """Record the calls and raise on the first call for `name`"""
+    def run(item, *args, **kwargs):
+        calls.append(item)
+        if item == name and calls.count(item) == 1:
+            raise Exception(f"{item} failed")
+        return True
+
+    return run
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_checkpoint"""
+class TestCheckpoint(FrappeTestCase):
+
+    def setUp(self):
+        clear_state(CHECKPOINT)
+
+    def tearDown(self):
+        clear_state(CHECKPOINT)
+
+    def test_resume_continues_after_the_last_completed_step(self):
+        calls = []
+        run = fail_once("b", calls)
+        migration = SiteMigrationX()
+
+        def run_steps():
+            for step in ("a", "b", "c"):
+                migration.checkpointed(step, run, step)
+
+        migration.checkpoint = Checkpoint(APPS)
+        self.assertRaises(Exception, run_steps)
+
+        migration.checkpoint = Checkpoint(APPS, resume=True)
+        self.assertEqual(migration.checkpoint.resumed_step, "b")
+        run_steps()
+
+        self.assertEqual(calls, ["a", "b", "b", "c"])
+
+    def test_resume_skips_imported_doctype_files(self):
+        folder = frappe.get_app_path("frappe_migrate_x", "frappe_migrate_x", "doctype")
+        files = [os.path.join(folder, name, f"{name}.json") for name in ("a", "b", "c")]
+        calls = []
+        import_file = fail_once(files[1], calls)
+
+        def sync(checkpoint):
+            with patch.object(custom_sync, "get_app_doc_files", return_value=files), patch.object(
+                custom_sync, "import_doc_file", lambda app, path, **kwargs: import_file(path)
+            ):
+                custom_sync.sync_for("frappe_migrate_x", checkpoint=checkpoint)
+
+        self.assertRaises(Exception, sync, Checkpoint(APPS))
+        sync(Checkpoint(APPS, resume=True))
+
+        self.assertEqual(calls, [files[0], files[1], files[1], files[2]])
+
+    def test_resume_skips_executed_patches(self):
+        patches = ["app.patches.a", "app.patches.b", "app.patches.c"]
+        calls = []
+        run_single = fail_once("app.patches.b", calls)
+
+        def run_all(checkpoint):
+            with patch.object(custom_patch_handler, "get_all_patches", return_value=patches), patch.object(
+                custom_patch_handler, "run_single", lambda patchmodule: run_single(patchmodule)
+            ), patch.object(custom_patch_handler, "update_state"):
+                # a fresh Patch Log read of a site where the patches were not logged
+                custom_patch_handler.run_all(specific_app="app", registry=set(), checkpoint=checkpoint)
+
+        self.assertRaises(Exception, run_all, Checkpoint(APPS))
+        run_all(Checkpoint(APPS, resume=True))
+
+        self.assertEqual(calls, patches[:2] + patches[1:])
@@ -0,0 +1,90 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization.migrate_state import load_state
+from frappe_migrate_x.utils.chunked_update import CHUNKED_UPDATES, chunked_update
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_chunked_update"""
+class TestChunkedUpdate(FrappeTestCase):
+
+    def setUp(self):
+        self.todos = [
+            frappe.get_doc(doctype="ToDo", description=f"chunked update {i}", priority="Low").insert().name
+            for i in range(7)
+        ]
+        frappe.db.commit()
+
+    def tearDown(self):
+        frappe.db.delete("ToDo", {"name": ("in", self.todos)})
+        frappe.db.commit()
+
+    def test_set_values_in_chunks(self):
+        rows = chunked_update(
+            "ToDo",
+            set_values={"priority": "High"},
+            filters={"name": ("in", self.todos)},
+            chunk_size=3,
+            job="test_set_values_in_chunks",
+        )
+
+        self.assertEqual(rows, 7)
+        self.assertEqual(frappe.db.count("ToDo", {"name": ("in", self.todos), "priority": "High"}), 7)
+        self.assertNotIn("test_set_values_in_chunks", load_state(CHUNKED_UPDATES))
+
+    def test_callback_receives_chunks(self):
+        chunks = []
+        chunked_update(
+            "ToDo",
+            callback=chunks.append,
+            filters={"name": ("in", self.todos)},
+            chunk_size=3,
+            job="test_callback_receives_chunks",
+        )
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(sorted(sum(chunks, [])), sorted(self.todos))
+
+    def test_unreadable_replica_lag_falls_back_to_a_fixed_sleep(self):
+        from unittest.mock import patch
+
+        from frappe_migrate_x.utils import chunked_update as module
+
+        class Replica:
+            def sql(self, query, as_dict=False):
+                raise Exception(1227, "Access denied; you need the REPLICATION CLIENT privilege")
+
+        replica = Replica()
+        with patch.object(module.time, "sleep") as sleep:
+            module.wait_for_replica(replica, 10)
+            module.wait_for_replica(replica, 10)
+
+        self.assertIsNone(module.get_replica_lag(replica))
+        self.assertEqual(sleep.call_count, 2)
+        sleep.assert_called_with(module.UNKNOWN_LAG_SLEEP_SECONDS)
+
+    def test_replica_credentials(self):
+        from unittest.mock import patch
+
+        from frappe_migrate_x.utils.chunked_update import get_replica_credentials
+
+        conf = frappe._dict(db_name="site_db", db_user="site_user", db_password="secret")
+        with patch.object(frappe.local, "conf", conf):
+            self.assertEqual(get_replica_credentials(), ("site_user", "secret"))
+
+            conf.update(different_credentials_for_replica=1, replica_db_name="reader", replica_db_password="r")
+            self.assertEqual(get_replica_credentials(), ("reader", "r"))
+
+    def test_replica_connection_is_closed(self):
+        from unittest.mock import MagicMock, patch
+
+        from frappe_migrate_x.utils import chunked_update as module
+
+        replica = MagicMock()
+        with patch.object(module, "get_replica_db", return_value=replica), patch.object(
+            module, "wait_for_replica"
+        ), patch("frappe.get_all", side_effect=Exception("lost connection")):
+            self.assertRaises(
+                Exception, module.chunked_update, "ToDo", set_values={"priority": "High"}, max_replica_lag=10
+            )
+
+        replica.close.assert_called_once_with()
@@ -0,0 +1,93 @@
+from unittest.mock import call, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import custom_fixtures
+from frappe_migrate_x.overrides.customization.custom_fixtures import clear_bulk_caches, diff_with_database
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_custom_fixtures"""
+class TestBulkFixtures(FrappeTestCase):
+
+    def diff(self, doctype, columns, rows, records):
+        with patch.object(frappe.db, "get_table_columns", return_value=columns), patch(
+            "frappe.get_all", return_value=[frappe._dict(row) for row in rows]
+        ):
+            return diff_with_database(doctype, records)
+
+    def test_diff_splits_inserts_updates_and_unchanged_records(self):
+        columns = ["name", "doc_type", "field_name", "property", "value", "modified"]
+        rows = [
+            dict(name="Note-title-bold", doc_type="Note", field_name="title", property="bold", value="1", modified="2024-01-01"),
+            dict(name="Note-title-label", doc_type="Note", field_name="title", property="label", value="Title", modified="2024-01-01"),
+        ]
+        records = [
+            # unchanged, only the ignored `modified` differs
+            dict(doctype="Property Setter", name="Note-title-bold", doc_type="Note", field_name="title", property="bold", value=1, modified="2025-01-01"),
+            dict(doctype="Property Setter", name="Note-title-label", doc_type="Note", field_name="title", property="label", value="Subject"),
+            dict(doctype="Property Setter", name="Note-title-hidden", doc_type="Note", field_name="title", property="hidden", value="1"),
+            dict(doctype="Property Setter", name="Note-title-fieldtype", doc_type="Note", field_name="title", property="fieldtype", value="Text"),
+        ]
+
+        changed, needs_controller = self.diff("Property Setter", columns, rows, records)
+
+        self.assertEqual([row["name"] for row in changed], ["Note-title-label", "Note-title-hidden"])
+        # `doctype` is not a column
+        self.assertNotIn("doctype", changed[0])
+        self.assertEqual([record["name"] for record in needs_controller], ["Note-title-fieldtype"])
+
+    def test_diff_applies_what_validate_changes(self):
+        columns = ["name", "desk_access", "search_bar", "timeline", "disabled"]
+        changed, _ = self.diff("Role", columns, [], [dict(doctype="Role", name="Portal Reader", desk_access=0, search_bar=1, timeline=1)])
+        self.assertEqual((changed[0]["search_bar"], changed[0]["timeline"]), (0, 0))
+
+        columns = ["name", "source_text", "translated_text", "language"]
+        records = [dict(doctype="Translation", name="t1", source_text="<b>Save</b>", translated_text="Sichern", language="de")]
+        changed, _ = self.diff("Translation", columns, [], records)
+        self.assertEqual(changed[0]["source_text"], "Save")
+
+    def test_replaced_property_setters_are_deleted(self):
+        rows = [dict(name="ps-new", doc_type="Note", field_name="title", property="bold", value="1")]
+        with patch.object(frappe.db, "delete") as delete:
+            custom_fixtures.delete_replaced_property_setters(rows)
+
+        delete.assert_called_once_with(
+            "Property Setter",
+            {"doc_type": "Note", "property": "bold", "name": ("!=", "ps-new"), "field_name": "title"},
+        )
+
+    def test_clear_bulk_caches(self):
+        with patch("frappe.clear_cache") as clear_cache, patch.object(frappe.db, "updatedb") as updatedb:
+            clear_bulk_caches("Custom Field", [dict(dt="Note", fieldname="a"), dict(dt="Note", fieldname="b")])
+            clear_bulk_caches("Property Setter", [dict(doc_type="ToDo"), dict(doc_type="Event")])
+            clear_bulk_caches("Role", [])
+
+        self.assertEqual(updatedb.call_args_list, [call("Note")])
+        self.assertCountEqual(
+            clear_cache.call_args_list, [call(doctype="Note"), call(doctype="ToDo"), call(doctype="Event")]
+        )
+
+        with patch.object(custom_fixtures, "clear_translation_cache") as clear_translation_cache:
+            clear_bulk_caches("Translation", [dict(name="t1")])
+        clear_translation_cache.assert_called_once_with()
+
+    def test_custom_field_structure_changes_use_the_controller(self):
+        columns = ["name", "dt", "fieldname", "fieldtype", "insert_after", "label"]
+        row = dict(name="Note-priority", dt="Note", fieldname="priority", fieldtype="Data", insert_after="title", label="Priority")
+        records = [
+            dict(row, doctype="Custom Field", label="Urgency"),
+            dict(row, doctype="Custom Field", name="Note-kind", fieldname="kind", label="Kind"),
+            dict(row, doctype="Custom Field", name="Note-size", fieldname="size", fieldtype="Int"),
+            dict(row, doctype="Custom Field", name="Note-owner", fieldname="owner_name", insert_after="priority"),
+        ]
+        rows = [
+            row,
+            dict(row, name="Note-size", fieldname="size"),
+            dict(row, name="Note-owner", fieldname="owner_name"),
+        ]
+
+        changed, needs_controller = self.diff("Custom Field", columns, rows, records)
+
+        # a new label and a new field are upserted
+        self.assertEqual([row["name"] for row in changed], ["Note-priority", "Note-kind"])
+        self.assertEqual([record["name"] for record in needs_controller], ["Note-size", "Note-owner"])
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import custom_fixtures
+from frappe_migrate_x.overrides.customization.custom_fixtures import (
+    FIXTURE_MANIFEST,
+    diff_fixture_file,
+    import_changed_fixtures,
+)
+from frappe_migrate_x.overrides.customization.migrate_state import clear_state, load_state, save_state
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_fixture_manifest"""
+class TestFixtureManifest(FrappeTestCase):
+
+    def setUp(self):
+        self.stored = load_state(FIXTURE_MANIFEST)
+        clear_state(FIXTURE_MANIFEST)
+        self.app_path = tempfile.mkdtemp(prefix="migrate_x_app_")
+        os.mkdir(os.path.join(self.app_path, "fixtures"))
+
+    def tearDown(self):
+        save_state(FIXTURE_MANIFEST, self.stored)
+        shutil.rmtree(self.app_path)
+
+    def write_fixture(self, fname, docs):
+        with open(os.path.join(self.app_path, "fixtures", fname), "w") as f:
+            json.dump(docs, f)
+
+    def import_changed(self):
+        """Run `import_changed_fixtures`, returns the records imported per file"""
+        imported = {}
+
+        def import_fixture_records(fname, docs, bulk=False):
+            imported[fname] = [doc["name"] for doc in docs]
+
+        with patch("frappe.get_app_path", side_effect=lambda app, *parts: os.path.join(self.app_path, *parts)), patch.object(
+            custom_fixtures, "import_fixture_records", side_effect=import_fixture_records
+        ):
+            import_changed_fixtures("migrate_x_app")
+        return imported
+
+    def test_diff_fixture_file(self):
+        self.write_fixture("role.json", [dict(doctype="Role", name="Reader"), dict(doctype="Role", name="Writer")])
+        file_path = os.path.join(self.app_path, "fixtures", "role.json")
+
+        file_hash, record_hashes, changed = diff_fixture_file(file_path)
+        self.assertEqual([doc["name"] for doc in changed], ["Reader", "Writer"])
+        self.assertEqual(list(record_hashes), ["Role::Reader", "Role::Writer"])
+
+        entry = {"hash": file_hash, "records": record_hashes}
+        self.assertEqual(diff_fixture_file(file_path, entry), (file_hash, record_hashes, []))
+
+        self.write_fixture("role.json", [dict(doctype="Role", name="Reader"), dict(doctype="Role", name="Writer", disabled=1)])
+        _, _, changed = diff_fixture_file(file_path, entry)
+        self.assertEqual([doc["name"] for doc in changed], ["Writer"])
+
+    def test_only_changed_records_are_imported(self):
+        self.write_fixture("role.json", [dict(doctype="Role", name="Reader"), dict(doctype="Role", name="Writer")])
+        self.write_fixture("custom_field.json", [dict(doctype="Custom Field", name="Note-priority", fieldname="priority")])
+
+        # a new file is imported in full
+        self.assertEqual(
+            self.import_changed(), {"role.json": ["Reader", "Writer"], "custom_field.json": ["Note-priority"]}
+        )
+        self.assertCountEqual(load_state(FIXTURE_MANIFEST)["migrate_x_app"], ["role.json", "custom_field.json"])
+
+        # unchanged files are skipped
+        self.assertEqual(self.import_changed(), {})
+
+        # only the changed record of a modified file is imported
+        self.write_fixture("role.json", [dict(doctype="Role", name="Reader", desk_access=0), dict(doctype="Role", name="Writer")])
+        self.write_fixture("property_setter.json", [dict(doctype="Property Setter", name="Note-title-bold", value="1")])
+        self.assertEqual(
+            self.import_changed(), {"role.json": ["Reader"], "property_setter.json": ["Note-title-bold"]}
+        )
+        self.assertEqual(self.import_changed(), {})
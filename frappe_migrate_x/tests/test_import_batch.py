@@ -0,0 +1,111 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization.import_batch import ImportBatch
+
+
+class RecordingDB:
+    """Records the transaction calls of an `ImportBatch`"""
+
+    def __init__(self, implicit_commit_at=()):
+        self.calls = []
+        self.savepoints = []
+        # files (by position) whose DDL commits implicitly and drops the savepoints
+        self.implicit_commit_at = set(implicit_commit_at)
+
+    def savepoint(self, save_point):
+        self.savepoints.append(save_point)
+        self.calls.append("savepoint")
+
+    def release_savepoint(self, save_point):
+        if len(self.savepoints) - 1 in self.implicit_commit_at:
+            raise Exception("SAVEPOINT does not exist")
+        self.calls.append("release")
+
+    def rollback(self, save_point=None):
+        self.calls.append(f"rollback {save_point}" if save_point else "rollback")
+
+    def commit(self):
+        self.calls.append("commit")
+
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_import_batch"""
+class TestImportBatch(FrappeTestCase):
+
+    def run_batch(self, batch, files, db):
+        committed = []
+        with patch.object(frappe, "db", db):
+            for i in range(files):
+                batch.add(lambda: None, on_commit=lambda i=i: committed.append(i))
+            batch.commit()
+        return committed
+
+    def test_commit_every_file_by_default(self):
+        db = RecordingDB()
+        committed = self.run_batch(ImportBatch(), 3, db)
+
+        self.assertEqual(db.calls, ["commit"] * 3)
+        self.assertEqual(committed, [0, 1, 2])
+
+    def test_commit_every(self):
+        db = RecordingDB()
+        batch = ImportBatch(commit_every=2)
+        committed = self.run_batch(batch, 5, db)
+
+        self.assertEqual(db.calls.count("commit"), 3)
+        self.assertEqual([timing.files for timing in batch.timings], [2, 2, 1])
+        self.assertEqual(committed, [0, 1, 2, 3, 4])
+
+    def test_commit_interval_alone_does_not_cap_the_batch(self):
+        db = RecordingDB()
+        batch = ImportBatch(commit_every=1, commit_interval=3600)
+        self.run_batch(batch, 5, db)
+
+        self.assertEqual(db.calls.count("commit"), 1)
+        self.assertEqual([timing.files for timing in batch.timings], [5])
+
+    def test_commit_interval_elapsed(self):
+        db = RecordingDB()
+        batch = ImportBatch(commit_interval=10)
+        clock = [0]
+
+        def import_file(seconds):
+            clock[0] += seconds
+
+        with patch.object(frappe, "db", db), patch(
+            "frappe_migrate_x.overrides.customization.import_batch.time.monotonic", lambda: clock[0]
+        ):
+            # the second file ends after the interval, the third one starts a new batch
+            for seconds in (1, 11, 1):
+                batch.add(lambda seconds=seconds: import_file(seconds))
+            batch.commit()
+
+        self.assertEqual([timing.files for timing in batch.timings], [2, 1])
+
+    def test_implicit_commit_ends_the_batch(self):
+        db = RecordingDB(implicit_commit_at=[1])
+        batch = ImportBatch(commit_every=10)
+        committed = self.run_batch(batch, 4, db)
+
+        self.assertEqual([timing.files for timing in batch.timings], [2, 2])
+        self.assertEqual([timing.implicit for timing in batch.timings], [True, False])
+        self.assertEqual(committed, [0, 1, 2, 3])
+
+    def test_failing_file_rolls_back_to_its_savepoint(self):
+        db = RecordingDB()
+        batch = ImportBatch(commit_every=10)
+        committed = []
+
+        def fail():
+            raise ValueError("broken file")
+
+        with patch.object(frappe, "db", db):
+            batch.add(lambda: None, on_commit=lambda: committed.append("ok"))
+            with self.assertRaises(ValueError):
+                batch.add(fail, on_commit=lambda: committed.append("failed"))
+
+        self.assertIn("rollback migrate_x_1", db.calls)
+        self.assertEqual(db.calls[-1], "commit")
+        self.assertEqual(committed, ["ok"])
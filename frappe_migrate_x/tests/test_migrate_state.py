@@ -0,0 +1,143 @@
+import os
+import tempfile
+import threading
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization.file_index import DOC_FILE_INDEX, DocFileIndex
+from frappe_migrate_x.overrides.customization.migrate_state import (
+    ContentManifest,
+    append_state,
+    clear_state,
+    get_state_path,
+    load_state,
+    load_state_log,
+    save_state,
+    update_state,
+)
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_migrate_state"""
+class TestMigrateState(FrappeTestCase):
+
+    state_name = "test_migrate_state"
+
+    def tearDown(self):
+        clear_state(self.state_name)
+
+    def test_load_missing_state_returns_default(self):
+        clear_state(self.state_name)
+        self.assertEqual(load_state(self.state_name), {})
+        self.assertEqual(load_state(self.state_name, []), [])
+
+    def test_save_and_load_state(self):
+        save_state(self.state_name, {"a": 1})
+        self.assertEqual(load_state(self.state_name), {"a": 1})
+
+    def test_state_log_ignores_truncated_line(self):
+        append_state(self.state_name, {"step": "a"})
+        append_state(self.state_name, {"step": "b"})
+        with open(get_state_path(f"{self.state_name}.jsonl"), "a") as f:
+            f.write('{"step": "c"')
+
+        self.assertEqual(load_state_log(self.state_name), [{"step": "a"}, {"step": "b"}])
+
+        clear_state(self.state_name)
+        self.assertEqual(load_state_log(self.state_name), [])
+
+    def test_manifest_detects_changed_file(self):
+        path = frappe.get_app_path("frappe_migrate_x", "modules.txt")
+
+        manifest = ContentManifest(self.state_name)
+        self.assertFalse(manifest.is_unchanged("frappe_migrate_x", path))
+
+        manifest.record("frappe_migrate_x", path)
+        manifest.save()
+
+        manifest = ContentManifest(self.state_name)
+        self.assertTrue(manifest.is_unchanged("frappe_migrate_x", path))
+
+        manifest.entries["frappe_migrate_x"][manifest.get_key("frappe_migrate_x", path)] = "stale"
+        self.assertFalse(manifest.is_unchanged("frappe_migrate_x", path))
+
+    def test_manifest_ignores_missing_file(self):
+        path = os.path.join(frappe.get_app_path("frappe_migrate_x"), "missing.json")
+        manifest = ContentManifest(self.state_name)
+        manifest.record("frappe_migrate_x", path)
+
+        self.assertFalse(manifest.is_unchanged("frappe_migrate_x", path))
+        self.assertEqual(manifest.entries, {})
+
+    def test_doc_file_index_rescans_changed_folders(self):
+        self.addCleanup(clear_state, DOC_FILE_INDEX)
+        clear_state(DOC_FILE_INDEX)
+
+        with tempfile.TemporaryDirectory() as folder:
+            def add_doc(name, with_json=True):
+                os.makedirs(os.path.join(folder, name))
+                if with_json:
+                    with open(os.path.join(folder, name, f"{name}.json"), "w") as f:
+                        f.write("{}")
+
+            add_doc("first")
+            add_doc("later", with_json=False)
+
+            index = DocFileIndex()
+            self.assertEqual(index.get_doc_files(folder), [os.path.join(folder, "first", "first.json")])
+            index.save()
+
+            # the json is added to an existing sub folder, the folder itself keeps its mtime
+            with open(os.path.join(folder, "later", "later.json"), "w") as f:
+                f.write("{}")
+            os.utime(os.path.join(folder, "later"), ns=(1, 1))
+
+            index = DocFileIndex()
+            self.assertEqual(
+                sorted(index.get_doc_files(folder)),
+                [os.path.join(folder, "first", "first.json"), os.path.join(folder, "later", "later.json")],
+            )
+
+        self.assertEqual(DocFileIndex().get_doc_files(folder), [])
+
+    def run_in_threads(self, *targets):
+        site, sites_path = frappe.local.site, frappe.local.sites_path
+        errors = []
+
+        def run(target):
+            frappe.init(site=site, sites_path=sites_path)
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                frappe.destroy()
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_manifests_keep_each_others_files(self):
+        clear_state(self.state_name)
+        path = frappe.get_app_path("frappe_migrate_x", "modules.txt")
+        # both loaded before either saved, like two apps synced by --app-jobs
+        first, second = ContentManifest(self.state_name), ContentManifest(self.state_name)
+        first.record("first_app", path)
+        second.record("second_app", path)
+
+        self.run_in_threads(first.save, second.save)
+
+        self.assertEqual(set(load_state(self.state_name)), {"first_app", "second_app"})
+
+    def test_concurrent_updates_are_not_lost(self):
+        clear_state(self.state_name)
+
+        def add_runs(writer):
+            for i in range(50):
+                update_state(self.state_name, lambda stored: {**stored, f"{writer}.{i}": i})
+
+        self.run_in_threads(lambda: add_runs("first"), lambda: add_runs("second"))
+
+        self.assertEqual(len(load_state(self.state_name)), 100)
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import migration_plan
+from frappe_migrate_x.overrides.customization.custom_patch_handler import PatchType
+from frappe_migrate_x.overrides.customization.migration_plan import MigrationPlanner
+
+
+class AlteringTable:
+    """Stands in for MariaDBTable, sends the statements a changed DocType needs"""
+
+    def __init__(self, doctype, meta):
+        self.table_name = f"tab{doctype}"
+
+    def validate(self):
+        pass
+
+    def sync(self):
+        frappe.db.sql_ddl(f"alter table `{self.table_name}` add column `priority` varchar(140)")
+        frappe.db.sql_ddl(f"alter table `{self.table_name}` modify column `title` text")
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_migration_plan"""
+class TestMigrationPlan(FrappeTestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.app_path = os.path.join(self.folder.name, "myapp")
+        self.doc_file = os.path.join(self.app_path, "notes", "doctype", "note", "note.json")
+        os.makedirs(os.path.dirname(self.doc_file))
+        with open(self.doc_file, "w") as f:
+            json.dump(dict(doctype="DocType", name="Note", fields=[]), f)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_plan_lists_the_work_without_running_it(self):
+        patches = {
+            PatchType.pre_model_sync: ["myapp.patches.add_priority", "myapp.patches.done"],
+            PatchType.post_model_sync: ["myapp.patches.fill_priority"],
+        }
+        history = {"myapp.patches.add_priority": [{"seconds": 4}, {"seconds": 2}, {"seconds": 3}]}
+        doctypes = [frappe._dict(name="Note", modified="2024-01-01", migration_hash="outdated")]
+
+        with patch("frappe.get_installed_apps", return_value=["myapp"]), patch(
+            "frappe.get_app_path", side_effect=lambda app, *parts: os.path.join(self.app_path, *parts)
+        ), patch("frappe.get_hooks", return_value=[]), patch("frappe.get_all", return_value=doctypes), patch.object(
+            migration_plan, "PatchRegistry", return_value={"myapp.patches.done"}
+        ), patch.object(
+            migration_plan, "get_all_patches", side_effect=lambda patch_type, specific_app: patches[patch_type]
+        ), patch.object(
+            migration_plan, "get_bench_patch_history", return_value=history
+        ), patch.object(
+            migration_plan, "DocFileIndex", MagicMock()
+        ), patch.object(
+            migration_plan, "get_app_doc_files", return_value=[self.doc_file]
+        ), patch.object(
+            migration_plan, "MariaDBTable", AlteringTable
+        ), patch.object(
+            migration_plan, "Meta"
+        ), patch.object(
+            migration_plan, "get_table_rows", return_value={"tabNote": 50000}
+        ), patch.object(
+            frappe.db, "sql_ddl"
+        ) as sql_ddl:
+            plan = MigrationPlanner(["myapp"], skip_fixtures=True, full_sync=True).get_plan()
+
+        app_plan = plan.apps[0]
+        self.assertEqual(
+            [(pending.patch, pending.patch_type, pending.estimated_seconds) for pending in app_plan.patches],
+            [
+                ("myapp.patches.add_priority", "pre_model_sync", 3),
+                ("myapp.patches.fill_priority", "post_model_sync", None),
+            ],
+        )
+        self.assertEqual((plan.estimated_seconds, plan.patches_without_history), (3, 1))
+
+        self.assertEqual(app_plan.pending_doc_files, [os.path.join("notes", "doctype", "note", "note.json")])
+        self.assertEqual(
+            app_plan.alters, [frappe._dict(table="tabNote", changes=2, algorithm="COPY", rows=50000)]
+        )
+        self.assertEqual(app_plan.fixtures, [])
+        # the ALTER statements are only collected
+        sql_ddl.assert_not_called()
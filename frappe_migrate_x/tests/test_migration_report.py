@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import migration_report
+from frappe_migrate_x.overrides.customization.migration_report import MigrationReport, item_timer, phase_timer
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_migration_report"""
+class TestMigrationReport(FrappeTestCase):
+
+    def setUp(self):
+        self.report = MigrationReport("test_site", ["frappe", "myapp"])
+
+    def active(self, report):
+        return patch.dict(frappe.flags, {"migrate_x_report": report})
+
+    def test_timers_record_status_and_nesting(self):
+        with self.active(self.report):
+            with phase_timer("sync_for", app="myapp"):
+                with item_timer("doctype", "Note", app="myapp"):
+                    pass
+
+            with self.assertRaises(ValueError), phase_timer("run_all", app="myapp"):
+                with item_timer("patch", "myapp.patches.broken"):
+                    raise ValueError
+
+        self.assertEqual(
+            [(phase["name"], phase["app"], phase["status"]) for phase in self.report.phases],
+            [("sync_for", "myapp", "ok"), ("run_all", "myapp", "failed")],
+        )
+        self.assertEqual(
+            [(item["kind"], item["name"], item["status"]) for item in self.report.items],
+            [("doctype", "Note", "ok"), ("patch", "myapp.patches.broken", "failed")],
+        )
+        # the item is timed inside its phase
+        self.assertLessEqual(self.report.items[0]["seconds"], self.report.phases[0]["seconds"])
+        self.assertEqual(self.report.as_dict()["apps"], ["frappe", "myapp"])
+
+    def test_timers_do_nothing_without_a_report(self):
+        with self.active(None):
+            with phase_timer("sync_for"), item_timer("doctype", "Note"):
+                pass
+
+            with self.assertRaises(ValueError), item_timer("patch", "myapp.patches.broken"):
+                raise ValueError
+
+        self.assertEqual((self.report.phases, self.report.items), ([], []))
+
+    def test_summary_lists_the_slowest_items(self):
+        self.report = MigrationReport("test_site", ["myapp"], phase="offline")
+        self.report.phases = [dict(name="sync_for", app="myapp", status="ok", seconds=4.0)]
+        self.report.items = [
+            dict(kind="patch", name=f"myapp.patches.p{i}", status="ok", seconds=float(i)) for i in range(5)
+        ]
+
+        with patch.object(migration_report.click, "secho") as secho, patch.object(migration_report.click, "echo") as echo:
+            self.report.print_summary(top=3)
+
+        lines = [args.args[0] for args in secho.call_args_list + echo.call_args_list]
+        self.assertTrue(lines[0].strip().startswith("Offline window took"))
+        self.assertIn("Top 3 slowest items", [line.strip() for line in lines])
+        self.assertIn("       4.000s  sync_for myapp", lines)
+        self.assertEqual(
+            [line.split(": ")[1] for line in lines if "patch: " in line],
+            ["myapp.patches.p4", "myapp.patches.p3", "myapp.patches.p2"],
+        )
@@ -0,0 +1,12 @@
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x import discover_monkey_patches, load_monkey_patches, loaded_apps
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_monkey_patches"""
+class TestMonkeyPatches(FrappeTestCase):
+
+    def test_discover_monkey_patches(self):
+        self.assertIn("frappe_migrate_x.monkey_patches.site", discover_monkey_patches("frappe_migrate_x"))
+
+        load_monkey_patches()
+        self.assertIn("frappe_migrate_x", loaded_apps)
@@ -0,0 +1,62 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization.online_alter import OnlineSchemaChange, get_columns
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_online_alter"""
+class TestOnlineAlter(FrappeTestCase):
+
+    table = "tabMigrate X Online Alter"
+
+    def setUp(self):
+        frappe.db.sql_ddl(f"drop table if exists `{self.table}`")
+        frappe.db.sql_ddl(
+            f"""create table `{self.table}` (
+                `name` varchar(140) not null primary key,
+                `value` int not null default 0
+            ) engine=InnoDB"""
+        )
+        for i in range(10):
+            frappe.db.sql(f"insert into `{self.table}` (`name`, `value`) values (%s, %s)", (f"row-{i:02}", i))
+        frappe.db.commit()
+
+    def tearDown(self):
+        frappe.db.sql_ddl(f"drop table if exists `{self.table}`")
+
+    def test_alter_copies_rows_and_concurrent_writes(self):
+        def write_during_copy(copied):
+            if copied == 3:
+                # rows already copied and rows still to copy, replayed by the triggers
+                frappe.db.sql(f"update `{self.table}` set `value` = 100 where `name` in ('row-01', 'row-08')")
+                frappe.db.sql(f"delete from `{self.table}` where `name` in ('row-02', 'row-09')")
+                frappe.db.sql(f"insert into `{self.table}` (`name`, `value`) values ('row-00a', 50)")
+                frappe.db.commit()
+
+        OnlineSchemaChange(
+            self.table,
+            "add column `note` varchar(140) default 'new', add index `value_index`(`value`)",
+            chunk_size=3,
+            on_chunk=write_during_copy,
+        ).run()
+
+        self.assertEqual(get_columns(self.table), ["name", "value", "note"])
+        rows = dict(frappe.db.sql(f"select `name`, `value` from `{self.table}`"))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows["row-01"], 100)
+        self.assertEqual(rows["row-08"], 100)
+        self.assertEqual(rows["row-00a"], 50)
+        self.assertNotIn("row-02", rows)
+        self.assertNotIn("row-09", rows)
+        self.assertFalse(
+            frappe.db.sql("select 1 from information_schema.triggers where event_object_table = %s", self.table)
+        )
+
+    def test_rows_rejected_by_unique_index_keep_the_table(self):
+        frappe.db.sql(f"update `{self.table}` set `value` = 1")
+        frappe.db.commit()
+
+        with self.assertRaises(frappe.ValidationError):
+            OnlineSchemaChange(self.table, "add unique index `value_unique`(`value`)", chunk_size=4).run()
+
+        self.assertEqual(frappe.db.sql(f"select count(*) from `{self.table}`")[0][0], 10)
+        self.assertFalse(frappe.db.sql("show tables like %s", "\\_mx\\_%"))
@@ -0,0 +1,36 @@
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization.custom_migrate import SiteMigrationX
+from frappe_migrate_x.overrides.customization.migrate_state import clear_state
+from frappe_migrate_x.overrides.customization.online_phase import (
+    ONLINE_PHASE,
+    ONLINE_STEPS,
+    defer_online_phase,
+    get_deferred_online_phase,
+)
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_online_phase"""
+class TestOnlinePhase(FrappeTestCase):
+
+    def test_phase_steps(self):
+        offline = SiteMigrationX(phase="offline")
+        online = SiteMigrationX(phase="online")
+        offline.online_steps = online.online_steps = set(ONLINE_STEPS)
+
+        self.assertTrue(offline.in_phase("sync_customizations"))
+        self.assertFalse(offline.in_phase("sync_fixtures"))
+        self.assertTrue(online.in_phase("sync_fixtures"))
+        self.assertFalse(online.in_phase("sync_jobs"))
+        # after_migrate hooks run after the fixtures deferred to the online phase
+        self.assertFalse(offline.in_phase("after_migrate:frappe.utils.install.after_migrate"))
+        self.assertTrue(online.in_phase("after_migrate:frappe.utils.install.after_migrate"))
+        self.assertTrue(SiteMigrationX().in_phase("sync_fixtures"))
+
+    def test_defer_online_phase_keeps_pending_apps(self):
+        clear_state(ONLINE_PHASE)
+        try:
+            defer_online_phase(["frappe", "erpnext"], 1.5)
+            defer_online_phase(["frappe", "myapp"], 2)
+            self.assertEqual(get_deferred_online_phase()["apps"], ["frappe", "erpnext", "myapp"])
+        finally:
+            clear_state(ONLINE_PHASE)
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import frappe
+from frappe.modules.import_file import calculate_hash
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import parse_pool
+from frappe_migrate_x.overrides.customization.parse_pool import diff_doc_file, diff_doc_files
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_parse_pool"""
+class TestParsePool(FrappeTestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.files = {}
+        for name, doc in (
+            ("in_sync", dict(doctype="DocType", name="In Sync")),
+            ("changed", dict(doctype="DocType", name="Changed")),
+            ("new", dict(doctype="DocType", name="New")),
+            ("report", dict(doctype="Report", name="Report")),
+        ):
+            path = os.path.join(self.folder.name, f"{name}.json")
+            with open(path, "w") as f:
+                json.dump(doc, f)
+            self.files[name] = path
+
+        self.hashes = {"In Sync": calculate_hash(self.files["in_sync"]), "Changed": "outdated"}
+
+    def tearDown(self):
+        self.folder.cleanup()
+        parse_pool.init_worker({})
+
+    def test_diff_doc_file(self):
+        parse_pool.init_worker(self.hashes)
+
+        self.assertEqual(diff_doc_file(self.files["in_sync"]), (self.hashes["In Sync"], False))
+        self.assertTrue(diff_doc_file(self.files["changed"])[1])
+        self.assertTrue(diff_doc_file(self.files["new"])[1])
+        # only the database knows whether other documents changed
+        self.assertIsNone(diff_doc_file(self.files["report"])[1])
+        self.assertEqual(diff_doc_file(os.path.join(self.folder.name, "missing.json")), (None, None))
+
+    def test_workers_keep_the_file_order(self):
+        paths = list(self.files.values()) * 15
+        doctypes = [frappe._dict(name=name, migration_hash=value) for name, value in self.hashes.items()]
+
+        with patch("frappe.get_all", return_value=doctypes), parse_pool.parse_pool(2) as executor:
+            results = list(diff_doc_files(executor, paths))
+
+        self.assertEqual([path for path, _, _ in results], paths)
+        self.assertEqual([needs_import for _, _, needs_import in results[:4]], [False, True, True, None])
+
+    def test_pool_started_from_an_app_job_thread(self):
+        doctypes = [frappe._dict(name=name, migration_hash=value) for name, value in self.hashes.items()]
+        results = []
+
+        def sync_app():
+            with parse_pool.parse_pool(2) as executor:
+                results.extend(diff_doc_files(executor, list(self.files.values())))
+
+        with patch("frappe.get_all", return_value=doctypes):
+            with ThreadPoolExecutor(max_workers=2) as threads:
+                threads.submit(sync_app).result()
+
+        self.assertEqual([needs_import for _, _, needs_import in results], [False, True, True, None])
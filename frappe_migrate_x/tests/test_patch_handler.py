@@ -0,0 +1,37 @@
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import custom_patch_handler
+from frappe_migrate_x.overrides.customization.custom_patch_handler import PatchRegistry, run_all
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_patch_handler"""
+class TestPatchRegistry(FrappeTestCase):
+
+    def test_patch_log_is_read_once_and_updated_in_memory(self):
+        ran = []
+        patches = {"app_a": ["app_a.patches.done", "app_a.patches.new"], "app_b": ["app_b.patches.new"]}
+
+        with patch("frappe.get_all", return_value=["app_a.patches.done"]) as get_all:
+            registry = PatchRegistry()
+
+        def run_single(patchmodule):
+            ran.append(patchmodule)
+            return True
+
+        with patch("frappe.get_all") as get_all_during_run, patch.object(
+            custom_patch_handler, "get_all_patches", side_effect=lambda patch_type, specific_app: patches[specific_app]
+        ), patch.object(custom_patch_handler, "run_single", run_single), patch.object(
+            custom_patch_handler, "update_state"
+        ):
+            for app in patches:
+                run_all(specific_app=app, registry=registry)
+            # a second pass finds every patch in the registry
+            for app in patches:
+                run_all(specific_app=app, registry=registry)
+
+        get_all.assert_called_once()
+        self.assertEqual(get_all.call_args.args[0], "Patch Log")
+        self.assertFalse([call for call in get_all_during_run.call_args_list if call.args[:1] == ("Patch Log",)])
+        self.assertEqual(ran, ["app_a.patches.new", "app_b.patches.new"])
+        self.assertIn("app_b.patches.new", registry)
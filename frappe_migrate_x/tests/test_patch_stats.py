@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import patch_stats
+from frappe_migrate_x.overrides.customization.custom_patch_handler import estimate_patch_seconds
+from frappe_migrate_x.overrides.customization.migrate_state import STATE_FOLDER, load_bench_state
+from frappe_migrate_x.overrides.customization.patch_stats import PatchETA, measure_patch
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_patch_stats"""
+class TestPatchStats(FrappeTestCase):
+
+    def test_estimate_is_the_median_run(self):
+        history = {"app.patches.a": [{"seconds": 9.0}, {"seconds": 1.0}, {"seconds": 2.0}]}
+        self.assertEqual(estimate_patch_seconds(history, "app.patches.a"), 2.0)
+        self.assertIsNone(estimate_patch_seconds(history, "app.patches.b"))
+
+    def test_eta_of_the_remaining_patches(self):
+        eta = PatchETA({"a": 10.0, "b": None, "c": 5.0})
+        with patch.object(patch_stats.click, "secho") as secho:
+            eta.start("a")
+            eta.start("b")
+
+        self.assertEqual(
+            [line.args[0] for line in secho.call_args_list],
+            ["[1/3] a (~10.0s, then ~5s + 1 without history)", "[2/3] b (no history, then ~5s)"],
+        )
+
+    def test_measure_patch_rows_and_table_delta(self):
+        counters = iter([
+            {"Handler_write": 10, "Handler_update": 5, "Handler_delete": 0, "Handler_read_key": 100},
+            {"Handler_write": 110, "Handler_update": 25, "Handler_delete": 3, "Handler_read_key": 900},
+        ])
+        migration_tables = frappe.flags.touched_tables = {"tabUser"}
+        try:
+            with patch.object(patch_stats, "get_handler_counters", side_effect=lambda: next(counters)), patch.object(
+                patch_stats, "get_table_rows", side_effect=lambda tables: {"tabToDo": 40, "tabNote": 2000}
+            ) as get_table_rows:
+                with measure_patch() as stats:
+                    frappe.flags.touched_tables.update({"tabToDo", "tabNote"})
+        finally:
+            frappe.flags.touched_tables = None
+
+        # reads are not writes
+        self.assertEqual(stats["rows"], 123)
+        self.assertEqual((stats["table"], stats["table_rows"]), ("tabNote", 2000))
+        get_table_rows.assert_called_once_with({"tabToDo", "tabNote"})
+        # the tables of the patch are still part of the migration
+        self.assertEqual(migration_tables, {"tabUser", "tabToDo", "tabNote"})
+
+    def test_bench_state_without_an_initialized_site(self):
+        with tempfile.TemporaryDirectory() as sites_path:
+            for site, history in (("one.local", {"a": []}), ("two.local", None)):
+                os.makedirs(os.path.join(sites_path, site, STATE_FOLDER))
+                with open(os.path.join(sites_path, site, "site_config.json"), "w") as f:
+                    f.write("{}")
+                if history is not None:
+                    with open(os.path.join(sites_path, site, STATE_FOLDER, "patch_history.json"), "w") as f:
+                        json.dump(history, f)
+
+            self.assertEqual(load_bench_state("patch_history", sites_path=sites_path), {"one.local": {"a": []}})
@@ -0,0 +1,98 @@
+import json
+import sys
+import types
+from unittest.mock import MagicMock, patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import search_index
+from frappe_migrate_x.overrides.customization.search_index import get_deleted_doc_routes, get_www_route, index_routes
+
+
+class RecordingWriter:
+    """Stands in for whoosh's AsyncWriter, records what is written"""
+
+    log = []
+
+    def __init__(self, index):
+        self.log.append(("open",))
+
+    def delete_by_term(self, fieldname, text):
+        self.log.append(("delete", text))
+
+    def add_document(self, **document):
+        self.log.append(("add", document["path"]))
+
+    def commit(self, optimize=False):
+        self.log.append(("commit", optimize))
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_search_index"""
+class TestSearchIndex(FrappeTestCase):
+
+    def setUp(self):
+        RecordingWriter.log = []
+
+    def index(self, routes, deleted_routes=None, batch_size=2):
+        search = MagicMock(id="path")
+        search.get_document_to_index.side_effect = lambda route: None if route == "gone" else {"path": route}
+        whoosh_writing = types.ModuleType("whoosh.writing")
+        whoosh_writing.AsyncWriter = RecordingWriter
+        with patch.dict(sys.modules, {"whoosh": types.ModuleType("whoosh"), "whoosh.writing": whoosh_writing}):
+            index_routes(search, routes, deleted_routes, batch_size)
+        return [entry for entry in RecordingWriter.log if entry != ("open",)]
+
+    def test_batches_are_committed_and_optimized_once(self):
+        log = self.index(["about", "blog/post", "gone"])
+
+        self.assertEqual(
+            log,
+            [
+                ("delete", "about"),
+                ("add", "about"),
+                ("delete", "blog/post"),
+                ("add", "blog/post"),
+                ("commit", False),
+                # does not render anymore
+                ("delete", "gone"),
+                ("commit", False),
+                ("commit", True),
+            ],
+        )
+
+    def test_deleted_routes_are_removed_by_path(self):
+        log = self.index(["about"], deleted_routes=["old-page", "blog/removed"])
+
+        self.assertEqual(
+            log[:3], [("delete", "old-page"), ("delete", "blog/removed"), ("commit", False)]
+        )
+        self.assertNotIn(("add", "old-page"), log)
+
+    def test_deleted_document_routes(self):
+        deleted = [json.dumps({"name": "old-page", "route": "old-page"}), json.dumps({"name": "draft"})]
+        with patch("frappe.get_all", return_value=deleted) as get_all:
+            self.assertEqual(get_deleted_doc_routes({"Web Page"}, "2024-01-01 10:00:00"), {"old-page"})
+
+        self.assertEqual(
+            get_all.call_args.args[1],
+            {"deleted_doctype": ("in", ["Web Page"]), "creation": (">=", "2024-01-01 10:00:00")},
+        )
+
+    def test_routes_served_again_are_not_deleted(self):
+        with patch.object(
+            search_index, "get_changed_www_routes", return_value=({"docs"}, {"docs", "faq"}, {})
+        ), patch.object(search_index, "get_web_route_doctypes", return_value={"Web Page"}), patch.object(
+            search_index, "get_changed_doc_routes", return_value={"pricing"}
+        ), patch.object(
+            search_index, "get_deleted_doc_routes", return_value={"old-page"}
+        ), patch(
+            "frappe.enqueue"
+        ) as enqueue:
+            search_index.queue_search_index_update(["frappe"], since="2024-01-01 10:00:00")
+
+        self.assertEqual(enqueue.call_args.kwargs["routes"], ["docs", "pricing"])
+        self.assertEqual(enqueue.call_args.kwargs["deleted_routes"], ["faq", "old-page"])
+
+    def test_www_routes(self):
+        self.assertEqual(get_www_route("/app/www", "/app/www/about.html"), "about")
+        self.assertEqual(get_www_route("/app/www", "/app/www/docs/index.md"), "docs")
+        self.assertEqual(get_www_route("/app/www", "/app/www/docs/setup.py"), "docs/setup")
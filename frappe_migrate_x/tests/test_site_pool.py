@@ -0,0 +1,35 @@
+import os
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.commands import site_pool
+
+
+def migrate_site(site, selected_apps, migration_options):
+    # runs in the forked worker instead of a real migration
+    if site == "dies":
+        # like an OOM kill, the worker is gone without a result
+        os._exit(1)
+    return frappe._dict(site=site, passed=site != "fails", duration=0, error="broken", log="")
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_site_pool"""
+class TestSitePool(FrappeTestCase):
+
+    def migrate(self, sites, jobs, fail_fast):
+        with patch.object(site_pool, "migrate_site", migrate_site), patch.object(site_pool, "print_summary"):
+            results = site_pool.migrate_sites(sites, [], {}, jobs=jobs, fail_fast=fail_fast)
+        return {result.site: result.passed for result in results}
+
+    def test_fail_fast_does_not_start_more_sites(self):
+        results = self.migrate(["fails", "a", "b", "c"], jobs=1, fail_fast=True)
+        self.assertEqual(results, {"fails": False, "a": None, "b": None, "c": None})
+
+    def test_failing_site_does_not_stop_the_others(self):
+        results = self.migrate(["fails", "a", "b", "c"], jobs=2, fail_fast=False)
+        self.assertEqual(results, {"fails": False, "a": True, "b": True, "c": True})
+
+    def test_dead_worker_does_not_stop_the_other_sites(self):
+        results = self.migrate(["a", "dies", "b", "c"], jobs=1, fail_fast=False)
+        self.assertEqual(results, {"a": True, "dies": False, "b": True, "c": True})
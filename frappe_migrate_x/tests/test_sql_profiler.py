@@ -0,0 +1,49 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization.migration_report import MigrationReport
+from frappe_migrate_x.overrides.customization.patch_stats import measure_patch
+from frappe_migrate_x.overrides.customization.sql_profiler import N_PLUS_ONE_COUNT, SQLProfiler, normalize_query
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_sql_profiler"""
+class TestSQLProfiler(FrappeTestCase):
+
+    def test_normalize_query(self):
+        self.assertEqual(
+            normalize_query("select `name` from `tabItem 2`\n where name = 'ITEM-001' and qty > 10"),
+            normalize_query("SELECT `name` FROM `tabItem 2` WHERE name = 'x' AND qty > 3.5"),
+        )
+        self.assertEqual(
+            normalize_query("select * from `tabToDo` where name in ('a', 'b', 'c')"),
+            "select * from `tabtodo` where name in (?+)",
+        )
+
+    def test_sql_profiler_flags_repeated_queries(self):
+        profiler = SQLProfiler()
+        profiler.install(frappe.db)
+        try:
+            with profiler.item("patch", "test.patch"):
+                for i in range(N_PLUS_ONE_COUNT):
+                    frappe.db.sql("select name from `tabDocType` where name = %s", f"DocType {i}")
+            frappe.db.sql("select 1")
+        finally:
+            profiler.uninstall()
+
+        profile = profiler.get_profile()
+        self.assertEqual(profile["items"][0]["queries"], N_PLUS_ONE_COUNT)
+        self.assertEqual(profile["n_plus_one"][0]["count"], N_PLUS_ONE_COUNT)
+        self.assertEqual(profile["n_plus_one"][0]["name"], "test.patch")
+
+    def test_sql_profiler_leaves_out_patch_bookkeeping(self):
+        report = MigrationReport(frappe.local.site, [])
+        report.sql_profiler = SQLProfiler()
+        report.sql_profiler.install(frappe.db)
+        frappe.flags.migrate_x_report = report
+        try:
+            with report.sql_profiler.item("patch", "test.patch"), measure_patch():
+                frappe.db.sql("select 1")
+        finally:
+            frappe.flags.migrate_x_report = None
+            report.sql_profiler.uninstall()
+
+        self.assertEqual(report.sql_profiler.get_profile()["items"][0]["queries"], 1)
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization import step_fingerprints
+from frappe_migrate_x.overrides.customization.checkpoint import CHECKPOINT, Checkpoint
+from frappe_migrate_x.overrides.customization.custom_migrate import SiteMigrationX
+from frappe_migrate_x.overrides.customization.migrate_state import clear_state, load_state, save_state
+from frappe_migrate_x.overrides.customization.step_fingerprints import STEP_FINGERPRINTS, StepFingerprints
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_step_fingerprints"""
+class TestStepFingerprints(FrappeTestCase):
+
+    def setUp(self):
+        self.stored = load_state(STEP_FINGERPRINTS)
+        clear_state(STEP_FINGERPRINTS)
+        clear_state(CHECKPOINT)
+        self.inputs = {"scheduler_events": {"daily": ["app.tasks.daily"]}}
+        self.ran = []
+
+    def tearDown(self):
+        save_state(STEP_FINGERPRINTS, self.stored)
+        clear_state(CHECKPOINT)
+
+    def migrate(self, fail=False):
+        """One migration running the `sync_jobs` step, returns whether it ran"""
+        def sync_jobs():
+            self.ran.append("sync_jobs")
+            if fail:
+                raise Exception("sync_jobs failed")
+
+        migration = SiteMigrationX()
+        migration.step_fingerprints = StepFingerprints()
+        migration.checkpoint = Checkpoint(["frappe"])
+        ran = len(self.ran)
+        with patch.dict(step_fingerprints.STEP_INPUTS, {"sync_jobs": lambda: self.inputs["scheduler_events"]}):
+            migration.run_step("sync_jobs", sync_jobs)
+            # as `run` does once the steps are committed
+            migration.step_fingerprints.save()
+        return len(self.ran) > ran
+
+    def test_step_is_skipped_while_its_inputs_are_unchanged(self):
+        self.assertTrue(self.migrate())
+        self.assertFalse(self.migrate())
+
+        self.inputs["scheduler_events"] = {"hourly": ["app.tasks.hourly"]}
+        self.assertTrue(self.migrate())
+        self.assertFalse(self.migrate())
+
+    def test_failed_step_runs_again(self):
+        self.assertRaises(Exception, self.migrate, fail=True)
+        self.assertTrue(self.migrate())
+
+    def test_app_versions_follow_the_checked_out_commit(self):
+        with patch("frappe.get_installed_apps", return_value=["frappe_migrate_x"]), patch.object(
+            step_fingerprints, "get_git_commit", return_value="aaaa"
+        ) as get_git_commit:
+            before = step_fingerprints.get_fingerprint("update_versions")
+            get_git_commit.return_value = "bbbb"
+            after = step_fingerprints.get_fingerprint("update_versions")
+
+        self.assertNotEqual(before, after)
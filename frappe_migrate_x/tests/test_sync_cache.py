@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_migrate_x.overrides.customization.custom_migrate import SiteMigrationX
+from frappe_migrate_x.overrides.customization.sync_cache import SyncScope, clear_scoped_cache
+
+"""bench --site <sitename> run-tests --module frappe_migrate_x.tests.test_sync_cache"""
+class TestSyncCache(FrappeTestCase):
+
+    def setUp(self):
+        self.todo = frappe.get_doc(doctype="ToDo", description="cached").insert()
+        frappe.db.commit()
+
+    def tearDown(self):
+        frappe.delete_doc("ToDo", self.todo.name, force=True)
+        frappe.db.commit()
+
+    def test_touched_document_is_not_cached_anymore(self):
+        self.assertEqual(frappe.get_cached_doc("ToDo", self.todo.name).description, "cached")
+        # written the way an imported DocType file is, without the document controller
+        frappe.db.sql("update `tabToDo` set description = 'imported' where name = %s", self.todo.name)
+        frappe.db.commit()
+
+        scope = SyncScope()
+        scope.documents.add(("ToDo", self.todo.name))
+        clear_scoped_cache(scope)
+
+        self.assertEqual(frappe.get_cached_doc("ToDo", self.todo.name).description, "imported")
+
+    def test_setup_only_clears_the_whole_cache_with_full_clear_cache(self):
+        module = "frappe_migrate_x.overrides.customization.custom_migrate"
+        for full_clear_cache in (False, True):
+            with patch(f"{module}.clear_global_cache") as clear_global_cache, patch(
+                "frappe.clear_cache"
+            ) as clear_cache:
+                try:
+                    SiteMigrationX(full_clear_cache=full_clear_cache).setUp()
+                finally:
+                    frappe.flags.in_migrate = False
+
+            self.assertEqual(clear_global_cache.called, full_clear_cache)
+            self.assertEqual(clear_cache.called, full_clear_cache)
+
+    def test_keys_are_deleted_in_one_pipeline(self):
+        from unittest.mock import MagicMock
+
+        from frappe_migrate_x.overrides.customization import sync_cache
+
+        cache = MagicMock()
+        cache.make_key.side_effect = lambda key: f"site|{key}"
+        scope = SyncScope()
+        scope.doctypes.add("ToDo Item")
+        scope.documents.update({("DocType", "ToDo Item"), ("Report", "ToDo Report")})
+
+        with patch.object(frappe, "cache", cache), patch.object(
+            sync_cache, "get_parent_doctypes", return_value={"ToDo"}
+        ), patch.object(sync_cache, "reset_metadata_version") as reset_metadata_version, patch.object(
+            sync_cache, "clear_controller_cache"
+        ), patch.object(frappe, "get_document_cache_key", side_effect=lambda dt, name: f"document_cache::{dt}::{name}"):
+            clear_scoped_cache(scope)
+
+        pipeline = cache.pipeline.return_value
+        pipeline.execute.assert_called_once_with()
+        for hdel in pipeline.hdel.call_args_list:
+            self.assertCountEqual(hdel.args[1:], ["ToDo Item", "ToDo"])
+        unlinked = pipeline.unlink.call_args.args
+        self.assertIn("site|document_cache::Report::ToDo Report", unlinked)
+        self.assertIn("site|bootinfo", unlinked)
+        reset_metadata_version.assert_called_once_with()
@@ -0,0 +1,195 @@
+# Copyright (c) 2024, ruzai92 and contributors
+# License: MIT. See LICENSE
+"""
+	Chunked data migrations for patches over very large tables.
+
+	Instead of one UPDATE over a multi million row table, `chunked_update`
+	walks the table in keyset paginated chunks (`key > last key`, ordered by
+	`key`), updates or calls back per chunk and commits after every chunk, so
+	locks are short and the undo log stays small. Between chunks it sleeps
+	and/or waits for the replica to catch up.
+
+	The last committed key is stored in `sites/[site]/migrate_x/chunked_updates.json`,
+	a patch that crashed continues after the last committed chunk when it runs
+	again. Updates must therefore be idempotent for the rows of one chunk.
+
+	Example patch:
+
+		from frappe_migrate_x.utils.chunked_update import chunked_update
+
+		def execute():
+			chunked_update(
+				"GL Entry",
+				set_values={"is_cancelled": 0},
+				filters={"is_cancelled": ("is", "not set")},
+				chunk_size=5000,
+				max_replica_lag=10,
+			)
+"""
+import hashlib
+import json
+import time
+
+import frappe
+from frappe.utils import update_progress_bar
+
+from frappe_migrate_x.overrides.customization.migrate_state import load_state, update_state
+
+CHUNKED_UPDATES = "chunked_updates"
+REPLICA_LAG_POLL_SECONDS = 1
+# throttle when the site user may not read the replica status
+UNKNOWN_LAG_SLEEP_SECONDS = 2
+# ER_DBACCESS_DENIED_ERROR, ER_ACCESS_DENIED_ERROR, ER_TABLEACCESS_DENIED_ERROR, ER_SPECIFIC_ACCESS_DENIED_ERROR
+ACCESS_DENIED = (1044, 1045, 1142, 1227)
+
+
+def chunked_update(
+	doctype,
+	set_values=None,
+	callback=None,
+	filters=None,
+	chunk_size=1000,
+	key="name",
+	sleep=0,
+	max_replica_lag=None,
+	job=None,
+):
+	"""Update the rows of `doctype` matching `filters` in chunks of `chunk_size`.
+
+	Every chunk either gets `set_values` ({column: value}) or is passed to
+	`callback(keys)` as the list of its `key` values, then is committed.
+	`sleep` seconds are waited after each chunk, with `max_replica_lag` the next
+	chunk waits until the replica (`replica_host` in site config) is at most
+	that many seconds behind. `job` names the resume state, by default it is
+	derived from the arguments. Returns the number of rows processed.
+	"""
+	if bool(set_values) == bool(callback):
+		frappe.throw("Pass either set_values or callback to chunked_update")
+
+	job = job or get_job_name(doctype, set_values, callback, filters, key)
+	progress = load_state(CHUNKED_UPDATES).get(job) or {"last": None, "rows": 0}
+	if progress["last"] is not None:
+		print(f"{job}: resuming after {key} {progress['last']} ({progress['rows']} rows done)")
+
+	total = progress["rows"] + frappe.db.count(doctype, get_chunk_filters(filters, key, progress["last"]))
+	replica = get_replica_db() if max_replica_lag is not None else None
+	table = frappe.qb.DocType(doctype)
+
+	try:
+		while True:
+			keys = frappe.get_all(
+				doctype,
+				filters=get_chunk_filters(filters, key, progress["last"]),
+				pluck=key,
+				order_by=f"{key} asc",
+				limit=chunk_size,
+			)
+			if not keys:
+				break
+
+			if callback:
+				callback(keys)
+			else:
+				query = frappe.qb.update(table)
+				for column, value in set_values.items():
+					query = query.set(table[column], value)
+				query.where(table[key].isin(keys)).run()
+
+			frappe.db.commit()
+			progress["last"] = keys[-1]
+			progress["rows"] += len(keys)
+			# patches of other apps may run chunked updates at the same time (--app-jobs)
+			update_state(CHUNKED_UPDATES, lambda stored: {**stored, job: progress})
+
+			update_progress_bar(job, progress["rows"] - 1, max(total, progress["rows"]))
+
+			if sleep:
+				time.sleep(sleep)
+			if replica:
+				wait_for_replica(replica, max_replica_lag)
+	finally:
+		if replica:
+			replica.close()
+
+	if progress["rows"]:
+		# print the progress bar on its own line
+		print()
+
+	update_state(CHUNKED_UPDATES, lambda stored: {name: value for name, value in stored.items() if name != job})
+	return progress["rows"]
+
+
+def get_job_name(doctype, set_values, callback, filters, key):
+	arguments = json.dumps(
+		[set_values, callback and f"{callback.__module__}.{callback.__qualname__}", filters, key],
+		sort_keys=True,
+		default=str,
+	)
+	return f"{doctype}:{hashlib.md5(arguments.encode()).hexdigest()[:10]}"
+
+
+def get_chunk_filters(filters, key, last):
+	if last is None:
+		return filters
+
+	if isinstance(filters, (list, tuple)):
+		return [*filters, [key, ">", last]]
+
+	return {**(filters or {}), key: (">", last)}
+
+
+def get_replica_credentials():
+	"""User and password of the replica, resolved like `frappe.connect_replica`"""
+	conf = frappe.conf
+	if conf.different_credentials_for_replica:
+		return conf.replica_db_name, conf.replica_db_password
+	return conf.db_user or conf.db_name, conf.db_password
+
+
+def get_replica_db():
+	"""Separate connection to the replica of the site, None without one"""
+	from frappe.database import get_db
+
+	if not frappe.conf.replica_host:
+		return None
+
+	user, password = get_replica_credentials()
+	return get_db(
+		host=frappe.conf.replica_host,
+		user=user,
+		password=password,
+		port=frappe.conf.replica_db_port,
+	)
+
+
+def get_replica_lag(replica):
+	"""Seconds the replica is behind, None when the site user may not read it"""
+	try:
+		status = replica.sql("show slave status", as_dict=True)
+	except Exception as e:
+		# SHOW SLAVE STATUS needs REPLICATION CLIENT / SLAVE MONITOR
+		if e.args and e.args[0] in ACCESS_DENIED:
+			return None
+		raise
+
+	if not status or status[0].get("Seconds_Behind_Master") is None:
+		# replication stopped or not configured, do not wait forever
+		return 0
+	return status[0]["Seconds_Behind_Master"]
+
+
+def wait_for_replica(replica, max_lag):
+	while True:
+		lag = get_replica_lag(replica)
+		if lag is None:
+			if not getattr(replica, "migrate_x_lag_unknown", False):
+				replica.migrate_x_lag_unknown = True
+				print(f"replica lag cannot be read, sleeping {UNKNOWN_LAG_SLEEP_SECONDS}s after every chunk instead")
+			time.sleep(UNKNOWN_LAG_SLEEP_SECONDS)
+			return
+
+		if lag <= max_lag:
+			return
+
+		print(f"replica is {lag}s behind, waiting")
+		time.sleep(REPLICA_LAG_POLL_SECONDS)